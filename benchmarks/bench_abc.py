@@ -0,0 +1,112 @@
+"""
+Benchmarks for cafeteria.abc.AbstractClass structural subclass checks.
+
+Run with: python benchmarks/bench_abc.py
+"""
+
+from abc import ABCMeta, abstractmethod
+from timeit import repeat
+
+from harness import report
+
+from cafeteria.abc import AbstractClass
+
+
+class LegacyAbstractClass(object, metaclass=ABCMeta):
+    """
+    The previous subclass hook, walking the mro of the candidate for each
+    abstract method on every call, with the metaclass applied.
+    """
+
+    # noinspection PyUnresolvedReferences
+    @classmethod
+    def __subclasshook__(cls, other_class):
+        return super(LegacyAbstractClass, cls).__subclasshook__(other_class) and all(
+            any(x in B.__dict__ for B in other_class.__mro__)
+            for x in cls.__abstractmethods__
+        )
+
+
+def interface(base):
+    namespace = {
+        name: abstractmethod(lambda self: None)
+        for name in ("open", "close", "read", "write", "flush", "seek")
+    }
+    return type("Interface", (base,), namespace)
+
+
+Legacy = interface(LegacyAbstractClass)
+Cached = interface(AbstractClass)
+
+
+class Root(object):
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class Middle(Root):
+    def read(self):
+        pass
+
+    def write(self):
+        pass
+
+
+class Candidate(Middle):
+    def flush(self):
+        pass
+
+    def seek(self):
+        pass
+
+
+class Other(Middle):
+    pass
+
+
+def bench_hook(number=200_000):
+    for name, cls in (("legacy", Legacy), ("cached", Cached)):
+        report(
+            "{} __subclasshook__".format(name),
+            repeat(lambda: cls.__subclasshook__(Candidate), number=number, repeat=3),
+            number,
+        )
+
+
+def bench_isinstance(number=1_000_000):
+    candidate, other = Candidate(), Other()
+    for name, cls in (("legacy", Legacy), ("cached", Cached)):
+        for label, instance in (("conforming", candidate), ("other", other)):
+            report(
+                "{} isinstance, {}".format(name, label),
+                repeat(lambda: isinstance(instance, cls), number=number, repeat=3),
+                number,
+            )
+
+
+def bench_invalidated(number=100_000):
+    """
+    isinstance when the caches of ABCMeta are invalidated between checks, as
+    when classes are registered while messages are dispatched.
+    """
+    candidate = Candidate()
+    for name, cls in (("legacy", Legacy), ("cached", Cached)):
+
+        def check():
+            cls._abc_caches_clear()
+            return isinstance(candidate, cls)
+
+        report(
+            "{} isinstance, ABCMeta caches cleared".format(name),
+            repeat(check, number=number, repeat=3),
+            number,
+        )
+
+
+if __name__ == "__main__":
+    bench_hook()
+    bench_isinstance()
+    bench_invalidated()
@@ -0,0 +1,138 @@
+"""
+Benchmarks for cafeteria.datastructs.dict.
+
+Run with: python benchmarks/bench_datastructs_dict.py
+"""
+
+from timeit import repeat
+
+from harness import report
+
+from cafeteria.datastructs.dict import (
+    DeepAttributeDict,
+    DeepMergingDict,
+    LazyDeepAttributeDict,
+    MergingDict,
+    json_adopt,
+    json_invalidate,
+)
+
+
+class ReflectiveMergingDict(MergingDict):
+    """
+    MergingDict using the previous per assignment merge method resolution, kept
+    as a reference point for the merge strategy cache.
+    """
+
+    def _merge_method(self, key):
+        if key in self:
+            obj = self[key]
+            if isinstance(obj, self.disabled_types):
+                return None
+            for method in ["update", "append"]:
+                if hasattr(obj, method):
+                    return method
+        return None
+
+    def _merge(self, key, value):
+        method = self._merge_method(key)
+        if method is not None and isinstance(self[key], type(value)):
+            if method == "update" and isinstance(value, str):
+                value = [value]
+            if (
+                method == "append"
+                and isinstance(self[key], list)
+                and isinstance(value, list)
+            ):
+                method = "extend"
+            getattr(self[key], method)(value)
+            return
+        dict.__setitem__(self, key, value)
+
+
+def deep_document(depth=6, width=8):
+    document = {"leaf": 1}
+    for level in range(depth):
+        document = {"level{}".format(i): document for i in range(width)}
+        document["depth"] = level
+    return document
+
+
+def wide_document(width=100_000):
+    return {"key{}".format(i): {"value": i, "nested": {"i": i}} for i in range(width)}
+
+
+def bench_construction():
+    documents = {
+        "deep": deep_document(),
+        "wide": wide_document(),
+    }
+    for label, document in documents.items():
+        for cls in (DeepAttributeDict, LazyDeepAttributeDict):
+            timings = repeat(lambda: cls(document), number=5, repeat=3)
+            report("{}({} document)".format(cls.__name__, label), timings, 5)
+
+
+def bench_access():
+    document = wide_document(10_000)
+    for cls in (DeepAttributeDict, LazyDeepAttributeDict):
+        d = cls(document)
+        timings = repeat(lambda: d.key10.nested.i, number=100_000, repeat=3)
+        report("{} repeated attribute access".format(cls.__name__), timings, 100_000)
+
+
+def config_layers(count=30, width=200):
+    return [
+        {
+            "section{}".format(i): {
+                "options": {"opt{}".format(j): layer for j in range(10)},
+                "tags": [layer],
+            }
+            for i in range(width)
+        }
+        for layer in range(count)
+    ]
+
+
+def bench_merge_layers():
+    layers = config_layers()
+
+    def sequential():
+        d = DeepMergingDict(layers[0])
+        for layer in layers[1:]:
+            d.update(layer)
+
+    timings = repeat(sequential, number=3, repeat=3)
+    report("DeepMergingDict sequential update (30 layers)", timings, 3)
+    timings = repeat(lambda: DeepMergingDict.merge_many(*layers), number=3, repeat=3)
+    report("DeepMergingDict.merge_many (30 layers)", timings, 3)
+
+
+def bench_merge_assignment():
+    for cls in (ReflectiveMergingDict, MergingDict):
+        d = cls(numbers=[], tags=set(), count=0)
+
+        def assign():
+            d["numbers"] = [1]
+            d["tags"] = {1}
+            d["count"] = 1
+
+        timings = repeat(assign, number=100_000, repeat=3)
+        report("{} 3 assignments".format(cls.__name__), timings, 100_000)
+        d.replace("numbers", [])
+
+
+def bench_json_serialization():
+    d = json_adopt(wide_document(10_000))
+    timings = repeat(lambda: json_invalidate(d) or str(d), number=5, repeat=3)
+    report("JSONAttributeDict str (uncached)", timings, 5)
+    timings = repeat(lambda: str(d), number=5, repeat=3)
+    report("JSONAttributeDict str (cached)", timings, 5)
+
+
+if __name__ == "__main__":
+    bench_construction()
+    bench_access()
+    bench_merge_layers()
+    bench_merge_assignment()
+    bench_json_serialization()
@@ -0,0 +1,41 @@
+"""
+Benchmarks for cafeteria.datastructs.units.
+
+Run with: python benchmarks/bench_datastructs_units.py
+"""
+
+from threading import Lock
+from timeit import repeat
+
+from harness import report
+
+from cafeteria.datastructs.units.meter import RateMeter
+
+
+class LockedCounter(object):
+    def __init__(self):
+        self.lock = Lock()
+        self.total = 0
+
+    def record(self, nbytes):
+        with self.lock:
+            self.total += nbytes
+
+
+def bench_rate_meter_record():
+    number = 1_000_000
+
+    def noop(nbytes):
+        pass
+
+    for name, record in [
+        ("function call baseline", noop),
+        ("locked counter record()", LockedCounter().record),
+        ("RateMeter.record()", RateMeter().record),
+    ]:
+        timings = repeat(lambda: record(4096), number=number, repeat=3)
+        report(name, timings, number)
+
+
+if __name__ == "__main__":
+    bench_rate_meter_record()
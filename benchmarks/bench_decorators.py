@@ -0,0 +1,104 @@
+"""
+Benchmarks for cafeteria.decorators, against functools.lru_cache.
+
+Run with: python benchmarks/bench_decorators.py
+"""
+
+from functools import lru_cache
+from timeit import repeat
+
+from harness import report
+
+from cafeteria.decorators import cached_classproperty, classproperty, memoize
+
+
+def compute(x, y=1):
+    return x * y
+
+
+class Plain(object):
+    @classproperty
+    def registry(cls):
+        return {name: value for name, value in vars(cls).items()}
+
+
+class Cached(object):
+    @cached_classproperty
+    def registry(cls):
+        return {name: value for name, value in vars(cls).items()}
+
+
+def bench_classproperty(number=1_000_000):
+    for cls in (Plain, Cached):
+        report(
+            "{}.registry".format(cls.__name__),
+            repeat(lambda: cls.registry, number=number, repeat=3),
+            number,
+        )
+
+
+def bench_hits(number=1_000_000):
+    implementations = [
+        ("lru_cache", lru_cache(maxsize=128)(compute)),
+        ("memoize", memoize(maxsize=128)(compute)),
+        ("memoize, ttl", memoize(maxsize=128, ttl=60)(compute)),
+        ("memoize, paths", memoize(paths=[0, "y"])(compute)),
+    ]
+    for name, func in implementations:
+        func(1)
+        report(
+            "{} hit".format(name),
+            repeat(lambda: func(1), number=number, repeat=3),
+            number,
+        )
+
+
+def bench_misses(number=200_000):
+    keys = list(range(number))
+    for name, decorator in (
+        ("lru_cache", lru_cache(maxsize=128)),
+        ("memoize", memoize(maxsize=128)),
+    ):
+
+        def run():
+            func = decorator(compute)
+            for key in keys:
+                func(key)
+
+        report(
+            "{} miss + eviction".format(name), repeat(run, number=1, repeat=3), number
+        )
+
+
+def bench_unhashable(number=200_000):
+    request = {"user": {"id": 1, "tags": ["a", "b"]}, "limit": 10}
+
+    @memoize(paths=[(0, "user", "id"), (0, "limit")])
+    def by_path(r):
+        return r["limit"]
+
+    @lru_cache(maxsize=128)
+    def by_key(user_id, limit):
+        return limit
+
+    report(
+        "memoize, paths into a dict",
+        repeat(lambda: by_path(request), number=number, repeat=3),
+        number,
+    )
+    report(
+        "lru_cache, key extracted by the caller",
+        repeat(
+            lambda: by_key(request["user"]["id"], request["limit"]),
+            number=number,
+            repeat=3,
+        ),
+        number,
+    )
+
+
+if __name__ == "__main__":
+    bench_classproperty()
+    bench_hits()
+    bench_misses()
+    bench_unhashable()
@@ -0,0 +1,222 @@
+"""
+Benchmarks for cafeteria.logging.
+
+Run with: python benchmarks/bench_logging.py
+"""
+
+import logging
+import os
+from logging import getLogger
+from tempfile import mkstemp
+from time import perf_counter, sleep
+from timeit import repeat
+
+from harness import report
+
+from cafeteria.logging import LoggedObject, LoggingManager, timing
+from cafeteria.logging.filters import (
+    DuplicateFilter,
+    RateLimitFilter,
+    SamplingFilter,
+    ThrottledLoggerAdapter,
+)
+from cafeteria.logging.queued import QueuedLogging
+from cafeteria.logging.timing import Histogram, timed
+from cafeteria.logging.trace import TRACE
+from cafeteria.patterns.mixins import ContextMixin
+
+
+class LegacyLoggedObject(ContextMixin):
+    """
+    LoggedObject resolving its logger on every instantiation and checking the
+    level on every trace call, as before loggers were cached per class.
+    """
+
+    def __new__(cls, *args, **kwargs):
+        cls.logger = getLogger("{}.{}".format(cls.__module__, cls.__name__))
+        cls.logger.trace("Instantiating %s.%s", cls.__module__, cls.__qualname__)
+        return super(LegacyLoggedObject, cls).__new__(cls)
+
+    def __enter__(self):
+        self.logger.trace(
+            "Entering context for %s.%s", self.__module__, self.__class__.__qualname__
+        )
+        return super(LegacyLoggedObject, self).__enter__()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.logger.trace(
+            "Exiting context for %s.%s", self.__module__, self.__class__.__qualname__
+        )
+        super(LegacyLoggedObject, self).__exit__(exc_type, exc_val, exc_tb)
+
+
+class Legacy(LegacyLoggedObject):
+    pass
+
+
+class Cached(LoggedObject):
+    pass
+
+
+class Plain(ContextMixin):
+    pass
+
+
+def enter(cls):
+    instance = cls()
+
+    def run():
+        with instance:
+            pass
+
+    return run
+
+
+def bench_logged_object(number=500_000):
+    for cls in (Plain, Legacy, Cached):
+        report(
+            "{} instantiation".format(cls.__name__),
+            repeat(cls, number=number, repeat=3),
+            number,
+        )
+        report(
+            "{} context entry and exit".format(cls.__name__),
+            repeat(enter(cls), number=number, repeat=3),
+            number,
+        )
+
+
+class SlowStream(object):
+    """
+    A stream with a fixed latency per write, like a remote or congested sink.
+    """
+
+    def __init__(self, latency=0.0001):
+        self.latency = latency
+        self.size = 0
+
+    def write(self, s):
+        sleep(self.latency)
+        self.size += len(s)
+
+    def flush(self):
+        pass
+
+
+def bench_queued_logging(name, handler, number):
+    """
+    Time spent on the calling thread logging directly and through
+    QueuedLogging, and including the time to drain the queue.
+    """
+    logger = getLogger("bench.queued")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+
+    logger.addHandler(handler)
+    start = perf_counter()
+    for index in range(number):
+        logger.info("request %d served", index)
+    report("{} direct".format(name), [perf_counter() - start], number)
+    logger.removeHandler(handler)
+
+    queued = QueuedLogging([handler], maxsize=number)
+    queued.start()
+    logger.addHandler(queued.handler)
+    start = perf_counter()
+    for index in range(number):
+        logger.info("request %d served", index)
+    report("{} queued, caller".format(name), [perf_counter() - start], number)
+    queued.stop()
+    report("{} queued, caller + drain".format(name), [perf_counter() - start], number)
+    logger.removeHandler(queued.handler)
+    handler.close()
+
+
+def bench_queued():
+    fd, path = mkstemp()
+    os.close(fd)
+    try:
+        bench_queued_logging("FileHandler", logging.FileHandler(path), 200_000)
+    finally:
+        os.unlink(path)
+    bench_queued_logging("Slow stream", logging.StreamHandler(SlowStream()), 20_000)
+
+
+def bench_timed(number=1_000_000):
+    def plain():
+        pass
+
+    decorated = timed("bench.decorated")(plain)
+
+    def block():
+        with timed("bench.block"):
+            pass
+
+    histogram = Histogram()
+    for enabled in (False, True):
+        (timing.enable if enabled else timing.disable)()
+        state = "enabled" if enabled else "disabled"
+        for name, func in (
+            ("plain call", plain),
+            ("@timed call, {}".format(state), decorated),
+            ("with timed(), {}".format(state), block),
+        ):
+            report(name, repeat(func, number=number, repeat=3), number)
+    timing.disable()
+    report(
+        "Histogram.record()",
+        repeat(lambda: histogram.record(12345), number=number, repeat=3),
+        number,
+    )
+
+
+def bench_filters(number=200_000):
+    """
+    An error logged in a hot loop to a file, unfiltered, through filters on
+    the logger and through a ThrottledLoggerAdapter.
+    """
+    fd, path = mkstemp()
+    os.close(fd)
+    logger = getLogger("bench.filters")
+    logger.propagate = False
+    handler = logging.FileHandler(path)
+    logger.addHandler(handler)
+
+    def hot_loop(log):
+        start = perf_counter()
+        for index in range(number):
+            log.error("failed to process item %d", index % 8)
+        return [perf_counter() - start]
+
+    try:
+        report("unfiltered", hot_loop(logger), number)
+        for name, factory in (
+            ("RateLimitFilter", lambda: RateLimitFilter(rate=100, burst=100)),
+            ("SamplingFilter", lambda: SamplingFilter(n=1000)),
+            ("DuplicateFilter", lambda: DuplicateFilter(interval=1)),
+        ):
+            logger.addFilter(factory())
+            report("{} on logger".format(name), hot_loop(logger), number)
+            logger.filters = []
+            if name != "DuplicateFilter":
+                adapter = ThrottledLoggerAdapter(logger, factory())
+                report("{} adapter".format(name), hot_loop(adapter), number)
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    bench_filters()
+    bench_timed()
+    bench_queued()
+
+    logging.basicConfig(handlers=[logging.NullHandler()])
+    LoggingManager.set_level(logging.INFO)
+    print("TRACE disabled")
+    bench_logged_object()
+
+    LoggingManager.set_level(TRACE)
+    print("TRACE enabled, NullHandler")
+    bench_logged_object(number=50_000)
@@ -0,0 +1,110 @@
+"""
+Benchmarks for cafeteria.patterns.borg.
+
+Run with: python benchmarks/bench_patterns_borg.py
+"""
+
+from threading import Event, Lock, Thread
+from time import perf_counter
+
+from harness import report
+
+from cafeteria.datastructs.dict import BorgDict
+from cafeteria.datastructs.shared import SharedBorgDict
+from cafeteria.patterns.borg import Borg, SnapshotBorg
+
+
+class LockedBorg(Borg):
+    """
+    A Borg guarding its state with a lock on every access, the usual
+    alternative to copy-on-write snapshots.
+    """
+
+    lock = Lock()
+
+    def read(self):
+        with self.lock:
+            return self.value
+
+    def write(self, value):
+        with self.lock:
+            self.value = value
+
+
+class SharedSnapshotBorg(SnapshotBorg):
+    def read(self):
+        return self.value
+
+    def write(self, value):
+        self.value = value
+
+
+def bench_contention(cls, readers=4, reads=200_000):
+    cls().write(0)
+    stop = Event()
+
+    def writer():
+        borg, i = cls(), 0
+        while not stop.wait(0.0001):
+            i += 1
+            borg.write(i)
+
+    def reader():
+        borg = cls()
+        for _ in range(reads):
+            borg.read()
+
+    threads = [Thread(target=reader) for _ in range(readers)]
+    writer_thread = Thread(target=writer)
+    writer_thread.start()
+    start = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - start
+    stop.set()
+    writer_thread.join()
+    report(
+        "{} read, {} readers + 1 writer".format(cls.__name__, readers),
+        elapsed,
+        readers * reads,
+    )
+
+
+def bench_instantiation(number=200_000):
+    for cls in (Borg, SnapshotBorg):
+        start = perf_counter()
+        for _ in range(number):
+            cls()
+        report("{} instantiation".format(cls.__name__), perf_counter() - start, number)
+
+
+class BenchSharedBorgDict(SharedBorgDict):
+    SEGMENT_NAME = "cafeteria-bench-shared-borg-dict"
+
+
+def bench_shared_dict(number=200_000):
+    payload = bytes(4096)
+    try:
+        for d in (BorgDict(), BenchSharedBorgDict()):
+            d.update(value=1, payload=payload)
+            name = d.__class__.__name__
+            for key in ("value", "payload"):
+                start = perf_counter()
+                for _ in range(number):
+                    d[key]
+                report("{} read {}".format(name, key), perf_counter() - start, number)
+            start = perf_counter()
+            for i in range(number // 100):
+                d["value"] = i
+            report("{} write".format(name), perf_counter() - start, number // 100)
+    finally:
+        BenchSharedBorgDict.unlink()
+
+
+if __name__ == "__main__":
+    bench_instantiation()
+    bench_shared_dict()
+    bench_contention(LockedBorg)
+    bench_contention(SharedSnapshotBorg)
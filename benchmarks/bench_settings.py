@@ -0,0 +1,51 @@
+"""
+Benchmarks for cafeteria.settings, against cafeteria.utilities.resolve_setting.
+
+Run with: python benchmarks/bench_settings.py
+"""
+
+from timeit import repeat
+
+from harness import report
+
+from cafeteria.datastructs.memory import Memory
+from cafeteria.settings import Setting, Settings
+from cafeteria.utilities import resolve_setting
+
+
+class AppSettings(Settings):
+    ENV_PREFIX = "BENCH_"
+
+    workers = Setting(4, int)
+    memory_limit = Setting("512 MB", Memory)
+
+
+def bench_reads(number=1_000_000):
+    settings = AppSettings()
+    snapshot = settings.snapshot
+    config = {"workers": 4}
+
+    def per_call():
+        return int(resolve_setting(4, None, "BENCH_WORKERS", config.get("workers")))
+
+    report("resolve_setting", repeat(per_call, number=number, repeat=3), number)
+    report(
+        "Settings attribute",
+        repeat(lambda: settings.workers, number=number, repeat=3),
+        number,
+    )
+    report(
+        "snapshot attribute",
+        repeat(lambda: snapshot.workers, number=number, repeat=3),
+        number,
+    )
+
+
+def bench_refresh(number=10_000):
+    settings = AppSettings()
+    report("refresh", repeat(settings.refresh, number=number, repeat=3), number)
+
+
+if __name__ == "__main__":
+    bench_reads()
+    bench_refresh()
@@ -0,0 +1,87 @@
+"""
+Benchmarks for cafeteria.streaming.pmap, against Executor.map.
+
+Run with: python benchmarks/bench_streaming.py
+"""
+
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from operator import neg
+from time import perf_counter
+
+from harness import report
+
+from cafeteria.streaming import pmap
+
+WORKERS = 4
+
+
+def measure(name, run, number, trace=False):
+    """
+    Time iterating over the results returned by run, including the time to
+    submit the tasks.
+    """
+    if trace:
+        tracemalloc.start()
+    start = perf_counter()
+    first = None
+    for _ in run():
+        if first is None:
+            first = perf_counter() - start
+    elapsed = perf_counter() - start
+    peak = None
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    note = None if peak is None else "{:>10.1f} MB peak".format(peak / 2**20)
+    report("{}, per item".format(name), elapsed, number, note)
+    report("{}, first result".format(name), first, 1)
+
+
+def bench_threads(number=200_000, trace=True):
+    with ThreadPoolExecutor(WORKERS) as executor:
+        measure(
+            "threads, Executor.map",
+            lambda: executor.map(neg, range(number)),
+            number,
+            trace,
+        )
+    for chunksize in (1, 64):
+        measure(
+            "threads, pmap chunksize={}".format(chunksize),
+            lambda: pmap(neg, range(number), workers=WORKERS, chunksize=chunksize),
+            number,
+            trace,
+        )
+    measure(
+        "threads, pmap unordered chunksize=64",
+        lambda: pmap(neg, range(number), workers=WORKERS, chunksize=64, ordered=False),
+        number,
+        trace,
+    )
+
+
+def bench_processes(number=100_000):
+    with ProcessPoolExecutor(WORKERS) as executor:
+        # warm up the workers
+        list(executor.map(neg, range(WORKERS)))
+        measure(
+            "processes, Executor.map",
+            lambda: executor.map(neg, range(number)),
+            number,
+        )
+        measure(
+            "processes, Executor.map chunksize=64",
+            lambda: executor.map(neg, range(number), chunksize=64),
+            number,
+        )
+        measure(
+            "processes, pmap chunksize=64",
+            lambda: pmap(neg, range(number), executor=executor),
+            number,
+        )
+
+
+if __name__ == "__main__":
+    bench_threads()
+    bench_processes()
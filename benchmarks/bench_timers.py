@@ -0,0 +1,133 @@
+"""
+Benchmarks for cafeteria.timers, against the timers of the asyncio loop and,
+if installed, the Twisted reactor.
+
+Run with: python benchmarks/bench_timers.py
+"""
+
+import asyncio
+from random import Random
+from time import perf_counter
+
+from harness import report
+
+from cafeteria.timers import AsyncioTimingWheel, TimingWheel
+
+try:
+    # noinspection PyPackageRequirements,PyUnresolvedReferences
+    from twisted.internet import reactor
+
+    from cafeteria.twisted import ReactorTimingWheel
+except ImportError:
+    reactor = None
+
+TIMERS = 1_000_000
+
+
+def noop():
+    pass
+
+
+def delays(count=TIMERS, low=1.0, high=60.0):
+    rnd = Random(0)
+    return [rnd.uniform(low, high) for _ in range(count)]
+
+
+def bench_schedule_cancel(name, call_later, timers=TIMERS):
+    """
+    Schedule a timer per connection, then cancel them all, as timeouts that
+    do not fire.
+    """
+    values = delays(timers)
+    start = perf_counter()
+    handles = [call_later(delay, noop) for delay in values]
+    report(
+        "{} schedule, {} pending".format(name, timers), perf_counter() - start, timers
+    )
+
+    start = perf_counter()
+    for handle in handles:
+        handle.cancel()
+    report("{} cancel".format(name), perf_counter() - start, timers)
+
+
+def bench_churn(name, call_later, pending=TIMERS, number=200_000):
+    """
+    Reschedule timeouts with a large number of timers pending, eg: an idle
+    timeout reset on every request.
+    """
+    handles = [call_later(delay, noop) for delay in delays(pending)]
+    values = delays(number)
+    start = perf_counter()
+    for index, delay in enumerate(values):
+        handles[index].cancel()
+        handles[index] = call_later(delay, noop)
+    report(
+        "{} cancel + schedule, {} pending".format(name, pending),
+        perf_counter() - start,
+        number,
+    )
+    for handle in handles:
+        handle.cancel()
+
+
+def bench_asyncio_fire(timers=TIMERS, horizon=0.5):
+    """
+    Fire all timers, spread over horizon seconds, on a running asyncio loop.
+    """
+
+    async def run(call_later):
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        remaining = [timers]
+
+        def fire():
+            remaining[0] -= 1
+            if not remaining[0]:
+                done.set_result(None)
+
+        start = perf_counter()
+        for delay in delays(timers, 0.0, horizon):
+            call_later(delay, fire)
+        await done
+        return perf_counter() - start
+
+    async def loop_timers():
+        return await run(asyncio.get_running_loop().call_later)
+
+    async def wheel_timers():
+        return await run(AsyncioTimingWheel(tick=0.001).call_later)
+
+    for name, main in (("loop.call_later", loop_timers), ("wheel", wheel_timers)):
+        elapsed = asyncio.run(main())
+        report(
+            "asyncio {} schedule + fire, {}s spread".format(name, horizon),
+            elapsed,
+            timers,
+        )
+
+
+def main():
+    loop = asyncio.new_event_loop()
+    implementations = [
+        ("asyncio loop.call_later", loop.call_later),
+        ("TimingWheel", TimingWheel(tick=0.01).call_later),
+        ("AsyncioTimingWheel", AsyncioTimingWheel(tick=0.01, loop=loop).call_later),
+    ]
+    if reactor is not None:
+        implementations += [
+            ("reactor.callLater", reactor.callLater),
+            ("ReactorTimingWheel", ReactorTimingWheel(tick=0.01).callLater),
+        ]
+
+    for name, call_later in implementations:
+        bench_schedule_cancel(name, call_later)
+    for name, call_later in implementations:
+        bench_churn(name, call_later)
+    loop.close()
+
+    bench_asyncio_fire()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+A self-contained timeit harness for the benchmark suite, with JSON results and
+comparison against a baseline.
+
+Benchmarks are registered with `benchmark` as factories: the factory does the
+setup and returns the callable to time, so setup is never measured.
+
+    @benchmark("get_by_path, depth 4")
+    def _():
+        d = nested(4)
+        return lambda: get_by_path(d, "a", "a", "a", "a")
+
+Each callable is run in a loop of `number` calls, calibrated so that a loop
+lasts at least `min_time` seconds, and the loop is repeated `repeat` times.
+The minimum time per call is the figure compared, the least noisy one.
+
+Memory benchmarks are registered with kind="memory", their factory returns a
+callable building a value and the number of items in it. The figure compared
+is the memory held by the value per item.
+
+    @benchmark("Record, 10000 records", kind="memory")
+    def _():
+        rows = dicts(10000)
+        return lambda: User.from_dicts(rows), len(rows)
+"""
+
+import argparse
+import gc
+import json
+import platform
+import re
+import statistics
+import sys
+import tracemalloc
+from datetime import datetime, timezone
+from timeit import default_timer
+
+_REGISTRY = []
+
+DEFAULT_THRESHOLD = 0.1
+
+# name, figure, unit
+_LINE = "{:<60} {:>14.3f} {}"
+
+
+_KINDS = ("time", "memory")
+
+
+class Benchmark(object):
+    __slots__ = ("name", "factory", "group", "kind")
+
+    def __init__(self, name, factory, group=None, kind="time"):
+        self.name = name
+        self.factory = factory
+        self.group = group
+        self.kind = kind
+
+
+def register(name, factory, group=None, kind="time"):
+    """
+    Register a benchmark.
+
+    :param factory: Callable doing the setup and returning the callable to
+            time, or for memory benchmarks a (build, count) tuple.
+    :param kind: "time" or "memory".
+    """
+    if kind not in _KINDS:
+        raise ValueError("Unknown kind of benchmark {!r}".format(kind))
+    if any(existing.name == name for existing in _REGISTRY):
+        raise ValueError("Duplicate benchmark {!r}".format(name))
+    _REGISTRY.append(Benchmark(name, factory, group, kind))
+
+
+def benchmark(name, group=None, kind="time"):
+    """
+    Decorator registering a benchmark factory.
+    """
+
+    def decorator(factory):
+        register(name, factory, group, kind)
+        return factory
+
+    return decorator
+
+
+def benchmarks(pattern=None):
+    """
+    Return the registered benchmarks whose name or group matches pattern.
+
+    :type pattern: str or None
+    :rtype: list
+    """
+    if pattern is None:
+        return list(_REGISTRY)
+    regex = re.compile(pattern)
+    return [b for b in _REGISTRY if regex.search(b.name) or regex.search(b.group or "")]
+
+
+def _loop(func, number):
+    start = default_timer()
+    for _ in range(number):
+        func()
+    return default_timer() - start
+
+
+def calibrate(func, min_time):
+    """
+    Return the number of calls, a power of 10, lasting at least min_time.
+
+    :rtype: int
+    """
+    number = 1
+    while True:
+        if _loop(func, number) >= min_time or number >= 10**8:
+            return number
+        number *= 10
+
+
+def measure(func, min_time=0.2, repeat=5):
+    """
+    Time func, returning statistics in seconds per call.
+
+    :rtype: dict
+    """
+    number = calibrate(func, min_time)
+    timings = [_loop(func, number) / number for _ in range(repeat)]
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def measure_memory(build, count):
+    """
+    Measure the memory allocated by build and held by the value it returns,
+    returning statistics in bytes per item.
+
+    :param count: Number of items in the value.
+    :rtype: dict
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        value = build()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del value
+    return {"bytes": size / count, "count": count}
+
+
+def _figure(stats):
+    # figure compared and its unit, results of older runs only hold timings
+    if "bytes" in stats:
+        return stats["bytes"], "bytes"
+    return stats["min"] * 1e6, "us"
+
+
+def environment():
+    """
+    :rtype: dict
+    """
+    try:
+        from importlib.metadata import version
+
+        cafeteria = version("cafeteria")
+    except Exception:
+        cafeteria = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cafeteria": cafeteria,
+        "date": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def run(selected, min_time=0.2, repeat=5, out=sys.stdout):
+    """
+    Run benchmarks, printing each result as it completes.
+
+    :return: Results document, with statistics by benchmark name.
+    :rtype: dict
+    """
+    results = {}
+    for b in selected:
+        if b.kind == "memory":
+            stats = measure_memory(*b.factory())
+        else:
+            stats = measure(b.factory(), min_time, repeat)
+        results[b.name] = stats
+        print(_LINE.format(b.name, *_figure(stats)), file=out, flush=True)
+    return {"environment": environment(), "benchmarks": results}
+
+
+def report(name, timings, number, note=None, out=sys.stdout):
+    """
+    Print the time per call of a loop of number calls timed outside of the
+    suite, eg: by the bench_*.py scripts, in the format of `run`.
+
+    :param timings: Seconds taken by the loop, or a list of the seconds taken
+            by repeated loops (eg: from timeit.repeat), of which the fastest
+            is reported.
+    :param note: Text appended to the line.
+    """
+    seconds = min(timings) if isinstance(timings, list) else timings
+    line = _LINE.format(name, seconds / number * 1e6, "us")
+    print(line + " " + note if note else line, file=out, flush=True)
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare results against a baseline document.
+
+    :param threshold: Relative slow down above which a benchmark regressed,
+            eg: 0.1 for 10%.
+    :return: Tuples of (name, baseline figure, current figure, ratio, status,
+            unit) for the benchmarks present in both, status being
+            "regressed", "improved" or "ok". Figures are microseconds per
+            call, or bytes per item for memory benchmarks.
+    :rtype: list
+    """
+    rows = []
+    current, previous = results["benchmarks"], baseline["benchmarks"]
+    for name, stats in current.items():
+        if name not in previous:
+            continue
+        (before, unit), (after, _) = _figure(previous[name]), _figure(stats)
+        ratio = after / before if before else float("inf")
+        if ratio > 1 + threshold:
+            status = "regressed"
+        elif ratio < 1 / (1 + threshold):
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append((name, before, after, ratio, status, unit))
+    return rows
+
+
+def print_comparison(rows, out=sys.stdout):
+    print(
+        "\n{:<60} {:>12} {:>12} {:>5} {:>8}".format(
+            "benchmark", "baseline", "current", "unit", "ratio"
+        ),
+        file=out,
+    )
+    for name, before, after, ratio, status, unit in rows:
+        print(
+            "{:<60} {:>12.3f} {:>12.3f} {:>5} {:>7.2f}x {}".format(
+                name, before, after, unit, ratio, "" if status == "ok" else status
+            ),
+            file=out,
+        )
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(document, path):
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv=None):
+    """
+    Command line entry point.
+
+    :return: Exit status, 1 if any benchmark regressed against the baseline.
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-k", "--filter", help="Regex selecting benchmarks by name")
+    parser.add_argument("--list", action="store_true", help="List benchmarks")
+    parser.add_argument("--save", metavar="PATH", help="Save results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="Baseline to compare to")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Relative slow down counted as a regression (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.2,
+        help="Minimum seconds per timing loop (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Timing loops (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="Short loops, for smoke testing"
+    )
+    args = parser.parse_args(argv)
+
+    selected = benchmarks(args.filter)
+    if args.list:
+        for b in selected:
+            print(b.name)
+        return 0
+    if args.quick:
+        args.min_time, args.repeat = 0.001, 1
+
+    results = run(selected, args.min_time, args.repeat)
+    if args.save:
+        save(results, args.save)
+    if args.baseline:
+        rows = compare(results, load(args.baseline), args.threshold)
+        print_comparison(rows)
+        regressed = [row[0] for row in rows if row[4] == "regressed"]
+        if regressed:
+            print(
+                "\n{} benchmark(s) regressed by more than {:.0%}".format(
+                    len(regressed), args.threshold
+                )
+            )
+            return 1
+    return 0
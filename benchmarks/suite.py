@@ -0,0 +1,482 @@
+"""
+Benchmark suite of the hot paths of cafeteria, run with the harness in
+harness.py. Unlike the bench_*.py scripts, which compare implementations,
+the suite tracks the performance of the package across releases.
+
+Run with:
+    python benchmarks/suite.py --save results.json
+    python benchmarks/suite.py --baseline baseline.json --threshold 0.15
+
+See `python benchmarks/suite.py --help` for the options.
+"""
+
+import json
+import logging
+import os
+import sys
+from functools import partial
+
+from cafeteria.datastructs.dict import (
+    AttributeDict,
+    BorgDict,
+    DeepAttributeDict,
+    DeepMergingDict,
+    JSONAttributeDict,
+    LazyDeepAttributeDict,
+    MergingDict,
+    json_invalidate,
+)
+from cafeteria.datastructs.memory import Memory
+from cafeteria.datastructs.records import RecordTable, record_class
+from cafeteria.datastructs.units.data import DataRateUnit, DataUnit
+from cafeteria.decorators import memoize
+from cafeteria.logging import LoggedObject
+from cafeteria.logging.filters import RateLimitFilter
+from cafeteria.logging.timing import timed
+from cafeteria.patterns.borg import Borg, SnapshotBorg
+from cafeteria.patterns.dict import compile_path, get_by_path
+from cafeteria.settings import Setting, Settings
+from cafeteria.timers import TimingWheel
+from cafeteria.utilities import resolve_setting
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import benchmark, main, register  # noqa: E402
+
+
+def nested(depth, key="a", leaf=1):
+    document = leaf
+    for _ in range(depth):
+        document = {key: document}
+    return document
+
+
+def deep_document(depth, width=4):
+    document = {"leaf": 1}
+    for level in range(depth):
+        document = {"level{}".format(i): document for i in range(width)}
+        document["depth"] = level
+    return document
+
+
+def flat_document(size):
+    return {"key{}".format(i): i for i in range(size)}
+
+
+# get_by_path
+
+
+def _get_by_path(depth):
+    def factory():
+        d, path = nested(depth), ("a",) * depth
+        return lambda: get_by_path(d, *path)
+
+    return factory
+
+
+def _compiled_path(depth):
+    def factory():
+        d, accessor = nested(depth), compile_path(*("a",) * depth)
+        return lambda: accessor(d)
+
+    return factory
+
+
+for _depth in (1, 4, 8):
+    register(
+        "get_by_path, depth {}".format(_depth), _get_by_path(_depth), "patterns.dict"
+    )
+register("compile_path accessor, depth 8", _compiled_path(8), "patterns.dict")
+
+
+# AttributeDict and DeepAttributeDict
+
+
+@benchmark("AttributeDict construction, 100 keys", "datastructs.dict")
+def _():
+    document = flat_document(100)
+    return lambda: AttributeDict(document)
+
+
+@benchmark("AttributeDict attribute read", "datastructs.dict")
+def _():
+    d = AttributeDict(flat_document(100))
+    return lambda: d.key50
+
+
+@benchmark("DeepAttributeDict construction, depth 4 width 4", "datastructs.dict")
+def _():
+    document = deep_document(4)
+    return lambda: DeepAttributeDict(document)
+
+
+@benchmark("LazyDeepAttributeDict construction, depth 4 width 4", "datastructs.dict")
+def _():
+    document = deep_document(4)
+    return lambda: LazyDeepAttributeDict(document)
+
+
+@benchmark("DeepAttributeDict attribute read, depth 4", "datastructs.dict")
+def _():
+    d = DeepAttributeDict(deep_document(4))
+    return lambda: d.level0.level1.level2.level3.leaf
+
+
+# MergingDict and DeepMergingDict
+
+
+def _merging_update(size):
+    def factory():
+        d = MergingDict({"key{}".format(i): {"value": i} for i in range(size)})
+        update = {"key{}".format(i): {"other": i} for i in range(size)}
+        return lambda: d.update(update)
+
+    return factory
+
+
+def _deep_merging_update(depth):
+    def factory():
+        d = DeepMergingDict(deep_document(depth))
+        update = deep_document(depth)
+        return lambda: d.update(update)
+
+    return factory
+
+
+for _size in (10, 100, 1000):
+    register(
+        "MergingDict.update, {} keys".format(_size),
+        _merging_update(_size),
+        "datastructs.dict",
+    )
+for _depth in (2, 4, 6):
+    register(
+        "DeepMergingDict.update, depth {} width 4".format(_depth),
+        _deep_merging_update(_depth),
+        "datastructs.dict",
+    )
+
+
+@benchmark("DeepMergingDict.merge_many, 10 layers depth 4", "datastructs.dict")
+def _():
+    layers = [deep_document(4) for _ in range(10)]
+    return lambda: DeepMergingDict.merge_many(*layers)
+
+
+# JSONAttributeDict
+
+
+def _json_load(size):
+    def factory():
+        source = json.dumps(
+            {"key{}".format(i): {"value": i, "tags": ["a", "b"]} for i in range(size)}
+        )
+        return lambda: JSONAttributeDict(source)
+
+    return factory
+
+
+def _json_dump(size):
+    def factory():
+        d = JSONAttributeDict({"key{}".format(i): {"value": i} for i in range(size)})
+
+        def dump():
+            json_invalidate(d)
+            return str(d)
+
+        return dump
+
+    return factory
+
+
+for _size in (10, 1000):
+    register(
+        "JSONAttributeDict load, {} keys".format(_size),
+        _json_load(_size),
+        "datastructs.dict",
+    )
+    register(
+        "JSONAttributeDict dump, {} keys".format(_size),
+        _json_dump(_size),
+        "datastructs.dict",
+    )
+
+
+@benchmark("JSONAttributeDict dump, cached", "datastructs.dict")
+def _():
+    d = JSONAttributeDict({"key{}".format(i): {"value": i} for i in range(1000)})
+    return lambda: str(d)
+
+
+# records
+
+
+Row = record_class("Row", ("id", "name", "score"))
+User = record_class("User", ("id", "name", "score", "active", "group", "created"))
+USER_TYPECODES = {"id": "q", "score": "d", "created": "q"}
+
+
+def user_rows(count):
+    return [
+        {
+            "id": i,
+            "name": "user{}".format(i),
+            "score": i / 3,
+            "active": i % 2 == 0,
+            "group": i % 10,
+            "created": 1_600_000_000 + i,
+        }
+        for i in range(count)
+    ]
+
+
+@benchmark("Record attribute read", "datastructs.records")
+def _():
+    row = Row(1, "name", 0.5)
+    return lambda: row.name
+
+
+@benchmark("Record item read", "datastructs.records")
+def _():
+    row = Row(1, "name", 0.5)
+    return lambda: row["name"]
+
+
+@benchmark("Record.from_dicts, 1000 records", "datastructs.records")
+def _():
+    rows = [{"id": i, "name": "row", "score": i / 2} for i in range(1000)]
+    return lambda: Row.from_dicts(rows)
+
+
+@benchmark("Record.to_dicts, 1000 records", "datastructs.records")
+def _():
+    users = User.from_dicts(user_rows(1000))
+    return lambda: User.to_dicts(users)
+
+
+@benchmark("Record.from_json, 1000 records", "datastructs.records")
+def _():
+    source = json.dumps(user_rows(1000))
+    return lambda: User.from_json(source)
+
+
+@benchmark("AttributeDict from dicts, 1000 records", "datastructs.records")
+def _():
+    rows = user_rows(1000)
+    return lambda: [AttributeDict(row) for row in rows]
+
+
+@benchmark("RecordTable.from_records, 1000 records", "datastructs.records")
+def _():
+    rows = [Row(i, "row", i / 2) for i in range(1000)]
+    return lambda: RecordTable.from_records(Row, rows, typecodes={"id": "q"})
+
+
+# memory per record of 6 fields; the values are allocated beforehand, so that
+# only the containers are counted, unless loaded from JSON
+
+_RECORDS = 10_000
+
+
+def _memory(build_from):
+    def factory():
+        rows = user_rows(_RECORDS)
+        return build_from(rows), _RECORDS
+
+    return factory
+
+
+def _memory_loaded(build_from):
+    def factory():
+        source = json.dumps(user_rows(_RECORDS))
+        return build_from(source), _RECORDS
+
+    return factory
+
+
+for _name, _build_from in (
+    ("dict", lambda rows: lambda: [dict(row) for row in rows]),
+    ("AttributeDict", lambda rows: lambda: [AttributeDict(row) for row in rows]),
+    ("Record", lambda rows: lambda: User.from_dicts(rows)),
+    (
+        "RecordTable, lists",
+        lambda rows: partial(RecordTable.from_records, User, User.from_dicts(rows)),
+    ),
+    (
+        "RecordTable, typed arrays",
+        lambda rows: partial(
+            RecordTable.from_records,
+            User,
+            User.from_dicts(rows),
+            typecodes=USER_TYPECODES,
+        ),
+    ),
+):
+    register(
+        "{} memory per record".format(_name),
+        _memory(_build_from),
+        "datastructs.records",
+        kind="memory",
+    )
+
+for _name, _build_from in (
+    (
+        "AttributeDict",
+        lambda source: partial(json.loads, source, object_hook=AttributeDict),
+    ),
+    ("Record", lambda source: partial(User.from_json, source)),
+    (
+        "RecordTable, typed arrays",
+        lambda source: partial(
+            RecordTable.from_json, User, source, typecodes=USER_TYPECODES
+        ),
+    ),
+):
+    register(
+        "{} memory per record loaded from JSON".format(_name),
+        _memory_loaded(_build_from),
+        "datastructs.records",
+        kind="memory",
+    )
+
+
+# units
+
+
+@benchmark("DataUnit parse", "datastructs.units")
+def _():
+    return lambda: DataUnit("1.5 GiB")
+
+
+@benchmark("DataRateUnit parse", "datastructs.units")
+def _():
+    return lambda: DataRateUnit("100 Mbps")
+
+
+@benchmark("DataUnit conversion", "datastructs.units")
+def _():
+    value = DataUnit("1.5 GiB")
+    return lambda: value.MB
+
+
+@benchmark("DataUnit.parse_many, 1000 values", "datastructs.units")
+def _():
+    values = ["{} MiB".format(i) for i in range(1000)]
+    return lambda: DataUnit.parse_many(values)
+
+
+@benchmark("Memory parse", "datastructs.memory")
+def _():
+    return lambda: Memory("512 MB")
+
+
+# Borg
+
+
+class State(Borg):
+    pass
+
+
+class Snapshot(SnapshotBorg):
+    pass
+
+
+@benchmark("Borg instantiation", "patterns.borg")
+def _():
+    return State
+
+
+@benchmark("Borg state read", "patterns.borg")
+def _():
+    state = State()
+    state.value = 1
+    return lambda: State().value
+
+
+@benchmark("SnapshotBorg state read", "patterns.borg")
+def _():
+    state = Snapshot()
+    state.value = 1
+    return lambda: Snapshot().value
+
+
+@benchmark("BorgDict item read", "patterns.borg")
+def _():
+    d = BorgDict(key=1)
+    return lambda: d["key"]
+
+
+# logging
+
+
+class Traced(LoggedObject):
+    pass
+
+
+@benchmark("LoggedObject instantiation", "logging")
+def _():
+    return Traced
+
+
+@benchmark("timed() block, disabled", "logging")
+def _():
+    def block():
+        with timed("suite.block"):
+            pass
+
+    return block
+
+
+@benchmark("RateLimitFilter.admit", "logging")
+def _():
+    rate_limit = RateLimitFilter(rate=1e9, burst=1e9)
+    return lambda: rate_limit.admit("key")
+
+
+# settings
+
+
+@benchmark("resolve_setting, environment variable unset", "settings")
+def _():
+    return lambda: resolve_setting(4, env_var="CAFETERIA_SUITE_UNSET")
+
+
+@benchmark("resolve_setting, environment variable set", "settings")
+def _():
+    os.environ["CAFETERIA_SUITE_SET"] = "8"
+    return lambda: resolve_setting(4, env_var="CAFETERIA_SUITE_SET")
+
+
+class SuiteSettings(Settings):
+    workers = Setting(4, int)
+
+
+@benchmark("Settings snapshot read", "settings")
+def _():
+    snapshot = SuiteSettings(environ={}).snapshot
+    return lambda: snapshot.workers
+
+
+# decorators and timers
+
+
+@benchmark("memoize hit", "decorators")
+def _():
+    func = memoize(abs)
+    func(1)
+    return lambda: func(1)
+
+
+@benchmark("TimingWheel call_later + cancel", "timers")
+def _():
+    wheel = TimingWheel(tick=0.01)
+
+    def noop():
+        pass
+
+    return lambda: wheel.call_later(30.0, noop).cancel()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(handlers=[logging.NullHandler()], level=logging.INFO)
+    sys.exit(main())
@@ -1,13 +1,118 @@
 from abc import ABCMeta
+from threading import RLock
+from weakref import WeakKeyDictionary, WeakSet
 
+_lock = RLock()
+# candidate class: names defined along its mro
+_names = WeakKeyDictionary()
+# abstract classes whose conformance results are cached
+_abstract_classes = WeakSet()
 
-class AbstractClass(object):
-    __metaclass__ = ABCMeta
+
+def _defined_names(other_class):
+    with _lock:
+        names = _names.get(other_class)
+        if names is None:
+            names = _names[other_class] = frozenset(
+                name for klass in other_class.__mro__ for name in vars(klass)
+            )
+        return names
+
+
+def invalidate_conformance():
+    """
+    Discard all cached structural conformance results, and the subclass check
+    caches of ABCMeta, eg: after methods were added to or removed from a
+    candidate class.
+    """
+    with _lock:
+        _names.clear()
+        for cls in list(_abstract_classes):
+            cls._conformance.clear()
+            cls._abc_caches_clear()
+
+
+class AbstractClassMeta(ABCMeta):
+    """
+    ABCMeta invalidating the structural conformance results of AbstractClass
+    when abstract classes are modified or virtual subclasses registered.
+    """
+
+    def __init__(cls, name, bases, namespace, **kwargs):
+        super(AbstractClassMeta, cls).__init__(name, bases, namespace, **kwargs)
+        cls._conformance = WeakKeyDictionary()
+        _abstract_classes.add(cls)
+
+    def register(cls, subclass):
+        subclass = super(AbstractClassMeta, cls).register(subclass)
+        invalidate_conformance()
+        return subclass
+
+    def __setattr__(cls, key, value):
+        super(AbstractClassMeta, cls).__setattr__(key, value)
+        if not key.startswith("_abc_") and key != "_conformance":
+            invalidate_conformance()
+
+    def __delattr__(cls, key):
+        super(AbstractClassMeta, cls).__delattr__(key)
+        invalidate_conformance()
+
+
+class AbstractClass(object, metaclass=AbstractClassMeta):
+    """
+    Base class of abstract classes checked structurally: a class defining all
+    the abstract methods of an AbstractClass subclass, along its mro, is
+    considered a subclass of it by issubclass and isinstance, without
+    inheriting from it or being registered.
+
+    Conformance is computed once per abstract class and candidate class, and
+    cached on top of the caches of ABCMeta. Caches are invalidated when
+    abstract classes are modified or subclasses registered; call
+    `invalidate_conformance` after modifying other classes.
+    """
 
     # noinspection PyUnresolvedReferences
     @classmethod
     def __subclasshook__(cls, other_class):
-        return super(AbstractClass, cls).__subclasshook__(other_class) and all(
-            any(x in B.__dict__ for B in other_class.__mro__)
-            for x in cls.__abstractmethods__
-        )
+        result = super(AbstractClass, cls).__subclasshook__(other_class)
+        if result is False or not cls.__abstractmethods__:
+            # only abstract classes are checked structurally
+            return result
+        return True if cls.conforms(other_class) else NotImplemented
+
+    @classmethod
+    def conforms(cls, other_class):
+        """
+        Whether other_class defines all the abstract methods of this class.
+
+        :rtype: bool
+        """
+        try:
+            return cls._conformance[other_class]
+        except KeyError:
+            pass
+        with _lock:
+            result = cls.__abstractmethods__ <= _defined_names(other_class)
+            cls._conformance[other_class] = result
+        return result
+
+    @classmethod
+    def missing(cls, other_class):
+        """
+        Return the abstract methods of this class other_class does not define.
+
+        :rtype: frozenset
+        """
+        return cls.__abstractmethods__ - _defined_names(other_class)
+
+    @classmethod
+    def conforms_many(cls, classes):
+        """
+        Check many classes at once, eg: to validate a plugin registry at start
+        up, caching the results.
+
+        :return: Whether each class conforms, by class.
+        :rtype: dict
+        """
+        with _lock:
+            return {other_class: cls.conforms(other_class) for other_class in classes}
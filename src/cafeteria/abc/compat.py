@@ -0,0 +1,8 @@
+try:
+    # noinspection PyUnresolvedReferences
+    from abc import abstractclassmethod
+except ImportError:  # pragma: no cover
+    from abc import abstractmethod
+
+    def abstractclassmethod(func):
+        return classmethod(abstractmethod(func))
@@ -1,8 +1,34 @@
+from collections import ChainMap
 from copy import deepcopy
-from json import dumps, load, loads
+from functools import wraps
+from json import JSONEncoder, detect_encoding, dumps, load, loads
+from mmap import ACCESS_READ, mmap
 from os.path import isfile
 
-from cafeteria.patterns.borg import Borg
+from cafeteria.patterns.borg import Borg, SnapshotBorg
+
+
+def json_decode(data):
+    """
+    Decode a JSON document using the standard library. Other buffers than str,
+    bytes and bytearray (eg: a memoryview of a memory mapped file) are decoded
+    to str straight from the buffer, without an intermediate copy to bytes.
+
+    :type data: str or bytes or bytearray or memoryview or mmap
+    """
+    if not isinstance(data, (str, bytes, bytearray)):
+        view = memoryview(data)
+        if view.format != "B":
+            view = view.cast("B")
+        data = str(view, detect_encoding(view[:4].tobytes()), "surrogatepass")
+    return loads(data)
+
+
+try:
+    # noinspection PyPackageRequirements,PyUnresolvedReferences
+    from orjson import loads as default_json_decoder
+except ImportError:
+    default_json_decoder = json_decode
 
 
 class AttributeDict(dict):
@@ -40,13 +66,65 @@ class DeepAttributeDict(AttributeDict):
                 self[key] = DeepAttributeDict(value)
 
 
+class LazyDeepAttributeDict(DeepAttributeDict):
+    """
+    A LazyDeepAttributeDict behaves like a DeepAttributeDict, except that
+    nested dict objects are only converted when first accessed via item or
+    attribute access. The converted value replaces the original one, so
+    subsequent access does not re-wrap. Iterating via keys/values/items exposes
+    the values as currently stored.
+    """
+
+    def _deep_init(self):
+        pass
+
+    def __getitem__(self, key):
+        value = super(LazyDeepAttributeDict, self).__getitem__(key)
+        if isinstance(value, dict) and not isinstance(value, AttributeDict):
+            value = LazyDeepAttributeDict(value)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+
+def _merge_update(current, value):
+    # strings are special, update methods like set.update looks for iterables
+    current.update([value] if isinstance(value, str) else value)
+
+
+def _merge_append(current, value):
+    if isinstance(current, list) and isinstance(value, list):
+        # if rvalue is a list and given object is a list, we expect all values
+        # to be appended
+        current.extend(value)
+    else:
+        current.append(value)
+
+
 class MergingDict(AttributeDict):
     """
     A MergingDict is an AttributeDict whose attribute/item values are always
     merged if the rvalue implements an update or append method. If the rvalue
     is not merge-able, it is simply replaced.
+
+    Merge behaviour for specific types can be customised using the module
+    level `register_merge_strategy`, which does not shadow keys under
+    attribute access. Strategies are resolved once per type and cached,
+    `disabled_types` is hence expected not to change for a class.
     """
 
+    _merge_strategies = ChainMap()
+    _merge_strategy_cache = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super(MergingDict, cls).__init_subclass__(**kwargs)
+        cls._merge_strategies = cls._merge_strategies.new_child()
+        cls._merge_strategy_cache = {}
+
     @property
     def disabled_types(self):
         return tuple()
@@ -87,24 +165,37 @@ class MergingDict(AttributeDict):
         for key in kwargs:
             self._merge(key, kwargs[key])
 
-    def _merge_method(self, key):
+    def _merge_strategy(self, value_type):
         """
-        Identify a merge compatible method available in self[key]. Currently we
-        support 'update' and 'append'.
-
-        :param key: Attribute name or item key
-        :return: Method name usable to merge a value into the instance mapped
-                by key
-        :rtype: str
+        Identify the strategy used to merge a value into an existing value of
+        the given type. Registered strategies take precedence, otherwise
+        values implementing 'update' or 'append' are merged using those.
+
+        :param value_type: Type of the existing value.
+        :type value_type: type
+        :return: Callable merging a value into an existing value, or None if
+                values of this type are not merged.
+        :rtype: callable or None
         """
-        if key in self:
-            obj = self[key]
-            if isinstance(obj, self.disabled_types):
-                return None
-            for method in ["update", "append"]:
-                if hasattr(obj, method):
-                    return method
-        return None
+        try:
+            return self._merge_strategy_cache[value_type]
+        except KeyError:
+            pass
+
+        strategy = None
+        if not issubclass(value_type, self.disabled_types):
+            for base in value_type.__mro__:
+                if base in self._merge_strategies:
+                    strategy = self._merge_strategies[base]
+                    break
+            else:
+                if hasattr(value_type, "update"):
+                    strategy = _merge_update
+                elif hasattr(value_type, "append"):
+                    strategy = _merge_append
+
+        self._merge_strategy_cache[value_type] = strategy
+        return strategy
 
     def _merge(self, key, value):
         """
@@ -117,22 +208,12 @@ class MergingDict(AttributeDict):
         :type value: object
         :rtype: None
         """
-        method = self._merge_method(key)
-        if method is not None and isinstance(self[key], type(value)):
-            # strings are special, update methods like set.update looks for
-            # iterables
-            if method == "update" and isinstance(value, str):
-                value = [value]
-            if (
-                method == "append"
-                and isinstance(self[key], list)
-                and isinstance(value, list)
-            ):
-                # if rvalue is a list and given object is a list, we expect all
-                # values to be appended
-                method = "extend"
-            getattr(self[key], method)(value)
-            return
+        if key in self:
+            current = self[key]
+            strategy = self._merge_strategy(type(current))
+            if strategy is not None and isinstance(current, type(value)):
+                strategy(current, value)
+                return
 
         super(MergingDict, self).__setitem__(key, value)
 
@@ -143,6 +224,27 @@ class MergingDict(AttributeDict):
         self._merge(key, value)
 
 
+def register_merge_strategy(cls, value_type, strategy):
+    """
+    Register a strategy used to merge values into existing values of a given
+    type (or its subclasses) for a MergingDict class and its children.
+
+    :param cls: MergingDict or a subclass.
+    :param value_type: Type of the existing value.
+    :type value_type: type
+    :param strategy: Callable invoked as strategy(current, value), merging
+            value into current in place. None disables merging.
+    :type strategy: callable or None
+    :rtype: None
+    """
+    cls._merge_strategies[value_type] = strategy
+    classes = [cls]
+    while classes:
+        clz = classes.pop()
+        clz._merge_strategy_cache.clear()
+        classes.extend(clz.__subclasses__())
+
+
 class DeepMergingDict(MergingDict):
     """
     A DeepMergingDict is a MergingDict of which dict objects at all depths are
@@ -172,6 +274,117 @@ class DeepMergingDict(MergingDict):
             other = self.__class__(other)
         super(DeepMergingDict, self).update(other, **kwargs)
 
+    @classmethod
+    def merge_many(cls, *layers):
+        """
+        Merge multiple layers into a new instance in a single pass. The result
+        is equal to creating an instance from the first layer and updating it
+        with each of the remaining layers in order. Nested dicts are only
+        converted once, for the final tree, and the given layers are not
+        modified.
+
+        :param layers: dict objects to merge, lowest priority first.
+        :rtype: DeepMergingDict
+        """
+        merger = _LayerMerger(cls)
+        root = _MergeNode()
+        for index, layer in enumerate(layers):
+            merger.merge(root, layer, cast=index == 0 or cls._should_cast(layer))
+        return merger.build(root)
+
+
+class _MergeNode(dict):
+    """
+    Intermediate nested dict owned by a _LayerMerger, standing in for an
+    instance of the target class until the merge is complete.
+    """
+
+
+class _LayerMerger(object):
+    """
+    Single pass merge engine backing DeepMergingDict.merge_many. It follows the
+    rules of MergingDict._merge and the merge strategies registered for the
+    target class, but keeps nested dicts as _MergeNode objects
+    and only converts them to the target class in build(). Objects taken over
+    from layers are deep copied before they are first modified in place.
+    """
+
+    def __init__(self, cls):
+        self.cls = cls
+        self.merge_strategy = cls()._merge_strategy
+        self.node_strategy = self.merge_strategy(cls)
+        self.owned = {}
+
+    def merge(self, node, layer, cast):
+        """
+        Merge a layer into a node. When `cast` is set, nested dicts in the layer
+        are treated as instances of the target class, as DeepMergingDict.update
+        would have converted them.
+        """
+        if not isinstance(layer, dict):
+            node.update(layer)
+            return
+
+        should_cast = self.cls._should_cast
+        for key in layer:
+            value = layer[key]
+            if key in node:
+                node[key] = self._merge_value(node[key], value, cast)
+            elif cast and should_cast(value):
+                node[key] = self._node(value)
+            else:
+                node[key] = value
+
+    def build(self, node):
+        result = self.cls()
+        dict.update(
+            result,
+            (
+                (key, self.build(value) if isinstance(value, _MergeNode) else value)
+                for key, value in node.items()
+            ),
+        )
+        return result
+
+    def _node(self, value):
+        node = _MergeNode()
+        self.merge(node, value, cast=True)
+        return node
+
+    def _merge_value(self, current, value, cast):
+        value_is_node = cast and self.cls._should_cast(value)
+        value_type = self.cls if value_is_node else type(value)
+
+        if self.node_strategy is _merge_update and (
+            isinstance(current, _MergeNode) or type(current) is self.cls
+        ):
+            if issubclass(self.cls, value_type):
+                if not isinstance(current, _MergeNode):
+                    current = _MergeNode(current)
+                self.merge(current, value, cast=self.cls._should_cast(value))
+                return current
+        else:
+            if isinstance(current, _MergeNode):
+                current = self.build(current)
+                self.owned[id(current)] = current
+            strategy = self.merge_strategy(type(current))
+            if strategy is not None and isinstance(current, value_type):
+                if value_is_node:
+                    value = self.build(self._node(value))
+                current = self._own(current)
+                strategy(current, value)
+                return current
+
+        return self._node(value) if value_is_node else value
+
+    def _own(self, obj):
+        # merge strategies may modify nested containers in place, such as the
+        # sets of a MergingDict, so objects taken from layers are deep copied
+        if id(obj) not in self.owned:
+            obj = deepcopy(obj)
+            self.owned[id(obj)] = obj
+        return obj
+
 
 class BorgDict(Borg, dict):
     """
@@ -221,11 +434,279 @@ class BorgDict(Borg, dict):
         return self.__dict__.pop(*args, **kwargs)
 
 
-class JSONAttributeDict(AttributeDict):
+class SnapshotBorgDict(SnapshotBorg, dict):
+    """
+    A BorgDict variant backed by the copy-on-write state of SnapshotBorg.
+    Reads use the latest published snapshot without locking, each write
+    publishes a new snapshot. As with BorgDict, the dict itself is not used.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(SnapshotBorgDict, self).__init__()
+        if args or kwargs:
+            self.update(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __getitem__(self, key):
+        return self.snapshot[key]
+
+    def __delitem__(self, key):
+        self._write(lambda state: state.__delitem__(key))
+
+    def __repr__(self):
+        return self.snapshot.__repr__()
+
+    def __str__(self):
+        return self.snapshot.__str__()
+
+    def __iter__(self):
+        return iter(self.snapshot)
+
+    def __len__(self):
+        return len(self.snapshot)
+
+    def __contains__(self, k):
+        return self.snapshot.__contains__(k)
+
+    def __eq__(self, other):
+        return self.snapshot == other
+
+    def keys(self):
+        return self.snapshot.keys()
+
+    def values(self):
+        return self.snapshot.values()
+
+    def items(self):
+        return self.snapshot.items()
+
+    def get(self, *args, **kwargs):
+        return self.snapshot.get(*args, **kwargs)
+
+    def pop(self, *args, **kwargs):
+        return self._write(lambda state: state.pop(*args, **kwargs))
+
+
+def _invalidating(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._changed()
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def _inserting(method, position=None):
+    # as _invalidating, for methods inserting the value at the given position
+    # of their arguments, or any number of values if position is None
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._changed()
+        result = method(self, *args, **kwargs)
+        if position is None:
+            self._share_all()
+        else:
+            _share(args[position], self._roots)
+        return result
+
+    return wrapper
+
+
+def _share(value, roots):
+    """
+    Make the tracked values in value, including value itself, report changes
+    to the given documents as well, eg: when a value reached through one
+    document is assigned to another. Documents are not removed again when the
+    value is, which at worst invalidates their cache needlessly.
+    """
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if type(value) in _TRACKED_TYPES:
+            own = value._roots
+            added = tuple(r for r in roots if not any(r is o for o in own))
+            if not added:
+                continue
+            value._roots = own + added
+        elif type(value) not in _TRACKING_TYPES:
+            continue
+        stack.extend(
+            dict.values(value) if isinstance(value, dict) else list.__iter__(value)
+        )
+
+
+class _TrackingDict(dict):
+    """
+    A dict reporting modifications to the JSONAttributeDicts it belongs to.
+    Nested dict and list objects are replaced by tracking versions when they
+    are first reached, so that changes at any depth are reported.
+    """
+
+    __slots__ = ()
+
+    _tracked_all = False
+
+    def _changed(self):
+        object.__setattr__(self, "_tracked_all", False)
+        for root in self._roots:
+            root._changed()
+
+    def _track(self, key, value):
+        tracking_type = _TRACKING_TYPES.get(type(value))
+        if tracking_type is not None:
+            value = tracking_type(value, self._roots)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def _track_all(self):
+        if not self._tracked_all:
+            for key, value in list(dict.items(self)):
+                self._track(key, value)
+            object.__setattr__(self, "_tracked_all", True)
+
+    def _share_all(self):
+        for value in dict.values(self):
+            _share(value, self._roots)
+
+    def __getitem__(self, key):
+        return self._track(key, dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def values(self):
+        self._track_all()
+        return dict.values(self)
+
+    def items(self):
+        self._track_all()
+        return dict.items(self)
+
+    __setitem__ = _inserting(dict.__setitem__, 1)
+    __delitem__ = _invalidating(dict.__delitem__)
+    clear = _invalidating(dict.clear)
+    pop = _invalidating(dict.pop)
+    popitem = _invalidating(dict.popitem)
+    update = _inserting(dict.update)
+    if hasattr(dict, "__ior__"):
+        __ior__ = _inserting(dict.__ior__)
+
+
+class _TrackedDict(_TrackingDict):
+    __slots__ = ("_roots", "_tracked_all")
+
+    def __init__(self, source, roots):
+        super(_TrackedDict, self).__init__(source)
+        self._roots = roots
+        self._tracked_all = False
+
+    def __reduce_ex__(self, protocol):
+        return dict, (dict(self),)
+
+
+class _TrackedList(list):
+    """
+    A list reporting modifications to the JSONAttributeDicts it belongs to.
+    """
+
+    __slots__ = ("_roots", "_tracked_all")
+
+    def __init__(self, source, roots):
+        super(_TrackedList, self).__init__(source)
+        self._roots = roots
+        self._tracked_all = False
+
+    def __reduce_ex__(self, protocol):
+        return list, (list(self),)
+
+    def _changed(self):
+        self._tracked_all = False
+        for root in self._roots:
+            root._changed()
+
+    def _track(self, index, value):
+        tracking_type = _TRACKING_TYPES.get(type(value))
+        if tracking_type is not None:
+            value = tracking_type(value, self._roots)
+            list.__setitem__(self, index, value)
+        return value
+
+    def _track_all(self):
+        if not self._tracked_all:
+            for index in range(len(self)):
+                self._track(index, list.__getitem__(self, index))
+            self._tracked_all = True
+
+    def _share_all(self):
+        for value in list.__iter__(self):
+            _share(value, self._roots)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            self._track_all()
+            return list.__getitem__(self, index)
+        return self._track(index, list.__getitem__(self, index))
+
+    def __iter__(self):
+        self._track_all()
+        return list.__iter__(self)
+
+    def __setitem__(self, index, value):
+        self._changed()
+        list.__setitem__(self, index, value)
+        if isinstance(index, slice):
+            self._share_all()
+        else:
+            _share(value, self._roots)
+
+    __delitem__ = _invalidating(list.__delitem__)
+    __iadd__ = _inserting(list.__iadd__)
+    __imul__ = _invalidating(list.__imul__)
+    append = _inserting(list.append, 0)
+    extend = _inserting(list.extend)
+    insert = _inserting(list.insert, 1)
+    pop = _invalidating(list.pop)
+    remove = _invalidating(list.remove)
+    clear = _invalidating(list.clear)
+    sort = _invalidating(list.sort)
+    reverse = _invalidating(list.reverse)
+
+
+_TRACKING_TYPES = {dict: _TrackedDict, list: _TrackedList}
+_TRACKED_TYPES = frozenset(_TRACKING_TYPES.values())
+
+
+class JSONAttributeDict(_TrackingDict, AttributeDict):
     """
     :type source: str or dict or cafeteria.datastructs.dict.JSONAttributeDict
+
+    Documents loaded via `json_from_file` and `json_from_bytes` are decoded
+    using the `_decoder` of the class, which defaults to orjson if available
+    and the standard library json module otherwise.
+
+    Serialized representations are cached until the document is modified, at
+    any depth. Nested values are replaced by tracking copies when first
+    reached, except in adopted documents (see `json_adopt`), which hand them
+    out as is. Once they did, a cached representation of an adopted document
+    is only used after comparing the document with a decoded snapshot of it,
+    which is much cheaper than serializing it again.
+
+    Functionality beyond the JSON representations is provided by module level
+    functions rather than methods, so that it does not shadow keys of the
+    document under attribute access.
     """
 
+    _decoder = staticmethod(default_json_decoder)
+
     def __init__(self, source):
         super(JSONAttributeDict, self).__init__()
 
@@ -238,12 +719,173 @@ class JSONAttributeDict(AttributeDict):
             else:
                 raise ValueError(source)
 
+    @property
+    def _roots(self):
+        return (self,)
+
+    def _track(self, key, value):
+        if "_adopted" not in self.__dict__:
+            return super(JSONAttributeDict, self)._track(key, value)
+        if type(value) in _TRACKING_TYPES:
+            self._expose()
+        return value
+
+    def _track_all(self):
+        if "_adopted" not in self.__dict__:
+            super(JSONAttributeDict, self)._track_all()
+        else:
+            self._expose()
+
+    def _expose(self):
+        # untracked nested values of an adopted document were handed out, from
+        # now on cached representations are checked against a snapshot
+        if "_exposed" not in self.__dict__:
+            self.__dict__["_exposed"] = True
+            self._invalidate()
+
+    def _changed(self):
+        self._invalidate()
+        object.__setattr__(self, "_tracked_all", False)
+
+    def _invalidate(self):
+        self.__dict__.pop("_serialized", None)
+        self.__dict__.pop("_snapshot", None)
+
+    def _cached(self, form):
+        cache = self.__dict__.get("_serialized")
+        if not cache:
+            return None
+        if "_exposed" in self.__dict__ and not dict.__eq__(
+            self, self.__dict__["_snapshot"]
+        ):
+            self._invalidate()
+            return None
+        return cache.get(form)
+
+    def _serialize(self, form, serializer):
+        serialized = self._cached(form)
+        if serialized is None:
+            # encoders call items() on dict subclasses, which would expose
+            # adopted documents; a plain copy of the top level is serialized
+            serialized = serializer(dict(self))
+            if "_exposed" in self.__dict__ and "_snapshot" not in self.__dict__:
+                # values not surviving a round trip through JSON (eg: tuples)
+                # never compare equal, so such documents are not cached
+                self.__dict__["_snapshot"] = self._decoder(serialized)
+            self.__dict__.setdefault("_serialized", {})[form] = serialized
+        return serialized
+
+    def __reduce_ex__(self, protocol):
+        return json_adopt, (dict(self), self.__class__)
+
     @property
     def pretty(self):
-        return dumps(self, indent=2)
+        return self._serialize("pretty", lambda d: dumps(d, indent=2))
 
     def __str__(self):
         return self.pretty
 
     def __repr__(self):
         return self.pretty
+
+
+def json_adopt(source, cls=JSONAttributeDict):
+    """
+    Create a JSONAttributeDict taking ownership of the given dict, without
+    copying nested values. The caller must not modify source afterwards.
+
+    Nested values are handed out as is, not as tracking copies, so changes
+    made through them are detected by comparing the document with a snapshot
+    when a cached serialized representation is used.
+
+    :type source: dict
+    :param cls: JSONAttributeDict or a subclass.
+    :rtype: JSONAttributeDict
+    """
+    instance = cls.__new__(cls)
+    dict.update(instance, source)
+    instance.__dict__["_adopted"] = True
+    return instance
+
+
+def json_from_bytes(data, decoder=None, cls=JSONAttributeDict):
+    """
+    Create a JSONAttributeDict from an encoded JSON document.
+
+    :type data: bytes or bytearray or memoryview or str
+    :param decoder: Callable decoding data, defaults to the `_decoder` of cls.
+    :param cls: JSONAttributeDict or a subclass.
+    :rtype: JSONAttributeDict
+    """
+    return json_adopt((decoder or cls._decoder)(data), cls)
+
+
+def json_from_file(path, decoder=None, cls=JSONAttributeDict):
+    """
+    Create a JSONAttributeDict from a JSON file. The file is memory mapped and
+    the mapped buffer is handed to the decoder.
+
+    :type path: str
+    :param decoder: Callable decoding data, defaults to the `_decoder` of cls.
+    :param cls: JSONAttributeDict or a subclass.
+    :rtype: JSONAttributeDict
+    """
+    with open(path, "rb") as sf:
+        try:
+            buffer = mmap(sf.fileno(), 0, access=ACCESS_READ)
+        except ValueError:
+            # empty files cannot be mapped
+            return json_from_bytes(sf.read(), decoder, cls)
+        with buffer, memoryview(buffer) as view:
+            return json_from_bytes(view, decoder, cls)
+
+
+def json_invalidate(d):
+    """
+    Discard the cached serialized representations of a JSONAttributeDict.
+    Modifications are detected without it, this only frees the cache.
+
+    :type d: JSONAttributeDict
+    """
+    d._invalidate()
+
+
+def json_compact(d):
+    """
+    Compact UTF-8 encoded JSON representation of a JSONAttributeDict, eg: for
+    wire output, cached until the document is modified.
+
+    :type d: JSONAttributeDict
+    :rtype: bytes
+    """
+    return d._serialize(
+        "compact", lambda doc: dumps(doc, separators=(",", ":")).encode("utf-8")
+    )
+
+
+def json_dump_to(d, fp, indent=None, buffer_size=65536):
+    """
+    Write the JSON representation of a JSONAttributeDict to a text file object
+    incrementally, instead of building the whole document as one string. A
+    cached pretty representation is written as is.
+
+    :type d: JSONAttributeDict
+    :param fp: File like object implementing write.
+    :param indent: Indentation as accepted by json.dumps.
+    :param buffer_size: Number of characters buffered between writes.
+    :rtype: None
+    """
+    if indent == 2:
+        pretty = d._cached("pretty")
+        if pretty is not None:
+            fp.write(pretty)
+            return
+
+    buffer, size = [], 0
+    for chunk in JSONEncoder(indent=indent).iterencode(dict(d)):
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            fp.write("".join(buffer))
+            buffer, size = [], 0
+    fp.write("".join(buffer))
@@ -1,7 +1,18 @@
+import logging
 from enum import Enum
+from os import O_RDONLY
+from os import close as osclose
+from os import open as osopen
+from os import pread, sysconf
+from os.path import join
 from re import match
+from threading import Event, Thread
+from time import monotonic
 
 from cafeteria.compat import long
+from cafeteria.patterns.mixins import ContextMixin
+
+logger = logging.getLogger(__name__)
 
 BYTES = 1
 KB = 1024 * BYTES
@@ -36,3 +47,292 @@ class Memory(long):
             x = x * unit.value
         # noinspection PyTypeChecker
         return super(Memory, cls).__new__(cls, x)
+
+
+# cgroup v1 reports "no limit" as a very large page aligned value
+CGROUP_V1_UNLIMITED = 2**60
+
+
+class MemorySample(object):
+    """
+    A point in time reading of process and cgroup memory. Values that are not
+    available (eg: outside of a cgroup with the memory controller, or no limit
+    set) are None.
+    """
+
+    __slots__ = ("time", "rss", "rss_peak", "cgroup_usage", "cgroup_limit")
+
+    def __init__(self, time, rss, rss_peak=None, cgroup_usage=None, cgroup_limit=None):
+        self.time = time
+        self.rss = rss
+        self.rss_peak = rss_peak
+        self.cgroup_usage = cgroup_usage
+        self.cgroup_limit = cgroup_limit
+
+    @property
+    def usage(self):
+        """
+        Memory usage accounted against the OOM killer: cgroup usage if
+        available, process RSS otherwise.
+
+        :rtype: Memory
+        """
+        return self.cgroup_usage if self.cgroup_usage is not None else self.rss
+
+    def __repr__(self):
+        return "{}({})".format(
+            self.__class__.__name__,
+            ", ".join("{}={}".format(s, getattr(self, s)) for s in self.__slots__),
+        )
+
+
+def _bytes(value):
+    return Memory(value, MemoryUnit.BYTES)
+
+
+class MemorySampler(ContextMixin):
+    """
+    Samples process and cgroup memory usage. The proc and cgroup files are
+    opened once and re-read using pread, making each sample cheap enough to
+    take frequently. Use `sample` for a synchronous reading, or `start` a
+    background thread taking a sample every `interval` seconds; the latest
+    sample is available as `latest` and each sample is passed to listeners
+    (eg: a MemoryWatchdog). Used as a context manager, the background thread is
+    started on entry and stopped on exit.
+
+    Both cgroup v1 and v2 are supported. Files are opened relative to
+    `proc_root` and `cgroup_root`, allowing fake trees to be used in tests.
+    Since /proc/self is resolved on open, a sampler should not be shared with
+    forked processes.
+
+    :param interval: Seconds between samples taken by the background thread.
+    :param proc_root: Mount point of procfs.
+    :param cgroup_root: Mount point of the cgroup filesystem.
+    """
+
+    def __init__(
+        self,
+        interval=1.0,
+        proc_root="/proc",
+        cgroup_root="/sys/fs/cgroup",
+        clock=monotonic,
+    ):
+        self.interval = interval
+        self.latest = None
+        self._clock = clock
+        self._listeners = []
+        self._thread = None
+        self._stopped = Event()
+        self._page_size = sysconf("SC_PAGE_SIZE")
+
+        self._statm = self._open(join(proc_root, "self", "statm"))
+        self._status = self._open(join(proc_root, "self", "status"))
+        self._cgroup_usage, self._cgroup_limit = self._open_cgroup(
+            proc_root, cgroup_root
+        )
+
+    @staticmethod
+    def _open(path):
+        try:
+            return osopen(path, O_RDONLY)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _read(fd):
+        return pread(fd, 4096, 0).decode("ascii")
+
+    def _open_cgroup(self, proc_root, cgroup_root):
+        """
+        Locate the memory usage and limit files of the cgroup this process is a
+        member of, falling back to the cgroup root (as seen in containers).
+        """
+        v1_path = v2_path = None
+        try:
+            with open(join(proc_root, "self", "cgroup")) as cf:
+                for line in cf:
+                    _, controllers, path = line.rstrip("\n").split(":", 2)
+                    if "memory" in controllers.split(","):
+                        v1_path = path
+                    elif controllers == "":
+                        v2_path = path
+        except OSError:
+            pass
+
+        if v1_path is not None:
+            root = join(cgroup_root, "memory")
+            files = ("memory.usage_in_bytes", "memory.limit_in_bytes")
+            path = v1_path
+        else:
+            root, files, path = cgroup_root, ("memory.current", "memory.max"), v2_path
+
+        for directory in ([join(root, path.lstrip("/"))] if path else []) + [root]:
+            usage = self._open(join(directory, files[0]))
+            if usage is not None:
+                return usage, self._open(join(directory, files[1]))
+        return None, None
+
+    def sample(self):
+        """
+        Take a sample and notify listeners.
+
+        :rtype: MemorySample
+        """
+        rss = rss_peak = usage = limit = None
+        if self._statm is not None:
+            rss = _bytes(int(self._read(self._statm).split()[1]) * self._page_size)
+        if self._status is not None:
+            for line in self._read(self._status).splitlines():
+                if line.startswith("VmHWM:"):
+                    rss_peak = Memory(int(line.split()[1]), MemoryUnit.KB)
+                    break
+        if self._cgroup_usage is not None:
+            usage = _bytes(int(self._read(self._cgroup_usage)))
+        if self._cgroup_limit is not None:
+            value = self._read(self._cgroup_limit).strip()
+            if value != "max" and int(value) < CGROUP_V1_UNLIMITED:
+                limit = _bytes(int(value))
+
+        self.latest = sample = MemorySample(self._clock(), rss, rss_peak, usage, limit)
+        for listener in self._listeners:
+            listener(sample)
+        return sample
+
+    def add_listener(self, listener):
+        """
+        Register a callable invoked with every sample taken.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.sample()
+            except Exception:
+                logger.exception("Failed to sample memory usage")
+
+    def start(self):
+        """
+        Start sampling on a background daemon thread.
+        """
+        if self._thread is None:
+            self._stopped.clear()
+            self.sample()
+            self._thread = Thread(target=self._run, name="MemorySampler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background thread, if running.
+        """
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        """
+        Stop sampling and close all open files.
+        """
+        self.stop()
+        for fd in (self._statm, self._status, self._cgroup_usage, self._cgroup_limit):
+            if fd is not None:
+                osclose(fd)
+        self._statm = self._status = self._cgroup_usage = self._cgroup_limit = None
+
+    def __enter__(self):
+        self.start()
+        return super(MemorySampler, self).__enter__()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        super(MemorySampler, self).__exit__(exc_type, exc_val, exc_tb)
+
+
+class MemoryWatchdog(object):
+    """
+    Invokes callbacks when memory usage crosses soft and hard watermarks, so
+    that load can be shed before the OOM killer steps in. A level is entered
+    when usage reaches its watermark and left once usage drops below the
+    watermark reduced by `hysteresis` (a fraction), avoiding flapping around a
+    watermark. Callbacks are invoked with the triggering MemorySample:
+    `on_soft` and `on_hard` when entering the respective level from below,
+    `on_recover` whenever the level drops.
+
+    Watermarks are Memory values, byte counts or strings such as "512 MB".
+    The watchdog registers itself as a listener of the given sampler.
+
+    :type sampler: MemorySampler
+    :param metric: Callable returning the usage to compare from a sample.
+    """
+
+    NORMAL = 0
+    SOFT = 1
+    HARD = 2
+
+    def __init__(
+        self,
+        sampler,
+        soft=None,
+        hard=None,
+        on_soft=None,
+        on_hard=None,
+        on_recover=None,
+        hysteresis=0.05,
+        metric=None,
+    ):
+        self.soft = self._watermark(soft)
+        self.hard = self._watermark(hard)
+        self.on_soft = on_soft
+        self.on_hard = on_hard
+        self.on_recover = on_recover
+        self.hysteresis = hysteresis
+        self.metric = metric or (lambda sample: sample.usage)
+        self.level = self.NORMAL
+        self._sampler = sampler
+        sampler.add_listener(self)
+
+    @staticmethod
+    def _watermark(value):
+        if value is None or isinstance(value, Memory):
+            return value
+        if isinstance(value, str):
+            return Memory(value)
+        return _bytes(value)
+
+    def _level(self, usage):
+        for level, watermark in ((self.HARD, self.hard), (self.SOFT, self.soft)):
+            if watermark is None:
+                continue
+            if usage >= watermark:
+                return level
+            if self.level >= level and usage >= watermark * (1 - self.hysteresis):
+                # within the hysteresis band of a level we are in, stay there
+                return level
+        return self.NORMAL
+
+    def __call__(self, sample):
+        usage = self.metric(sample)
+        if usage is None:
+            return
+        level = self._level(usage)
+        if level == self.level:
+            return
+
+        previous, self.level = self.level, level
+        callback = {
+            self.HARD: self.on_hard,
+            self.SOFT: self.on_soft if level > previous else self.on_recover,
+            self.NORMAL: self.on_recover,
+        }[level]
+        if callback is not None:
+            callback(sample)
+
+    def close(self):
+        """
+        Stop watching the sampler.
+        """
+        self._sampler.remove_listener(self)
@@ -0,0 +1,359 @@
+import sys
+from array import array
+from collections.abc import Mapping
+from json import dumps, loads
+from keyword import iskeyword
+from operator import attrgetter
+
+from cafeteria.datastructs.dict import AttributeDict
+
+
+class Record(Mapping):
+    """
+    Base class of the record classes generated by `record_class`: objects with
+    a fixed set of fields stored in __slots__, without a per instance dict,
+    accessed as attributes or items like an AttributeDict.
+    """
+
+    __slots__ = ()
+
+    FIELDS = ()
+    DEFAULTS = {}
+    _getter = None
+
+    def __getitem__(self, key):
+        if key in self.DEFAULTS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self.DEFAULTS:
+            raise KeyError("{} has no field {!r}".format(self.__class__.__name__, key))
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.DEFAULTS
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __eq__(self, other):
+        if type(other) is type(self):
+            return self.values_tuple() == other.values_tuple()
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "{}({})".format(
+            self.__class__.__name__,
+            ", ".join("{}={!r}".format(k, v) for k, v in self.items()),
+        )
+
+    def __reduce__(self):
+        return self.__class__, self.values_tuple()
+
+    def values_tuple(self):
+        """
+        Return the values of the fields, in order.
+
+        :rtype: tuple
+        """
+        return self._getter(self)
+
+    def to_dict(self):
+        """
+        :rtype: dict
+        """
+        return dict(zip(self.FIELDS, self._getter(self)))
+
+    def to_attribute_dict(self):
+        """
+        :rtype: cafeteria.datastructs.dict.AttributeDict
+        """
+        return AttributeDict(zip(self.FIELDS, self._getter(self)))
+
+    @classmethod
+    def from_dict(cls, mapping):
+        """
+        Create a record from a mapping, missing fields taking their default.
+
+        :raises: TypeError if mapping has keys that are not fields.
+        """
+        return cls(**mapping)
+
+    @classmethod
+    def from_dicts(cls, mappings):
+        """
+        :rtype: list
+        """
+        return [cls(**mapping) for mapping in mappings]
+
+    @classmethod
+    def to_dicts(cls, records, attribute_dict=False):
+        """
+        Convert records of this class to dicts, or AttributeDicts.
+
+        :rtype: list
+        """
+        factory = AttributeDict if attribute_dict else dict
+        fields, getter = cls.FIELDS, cls._getter
+        return [factory(zip(fields, getter(record))) for record in records]
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        Create records from a JSON array of objects.
+
+        :type data: str or bytes
+        :rtype: list
+        """
+        return cls.from_dicts(loads(data))
+
+    @classmethod
+    def to_json(cls, records, **kwargs):
+        """
+        Serialize records of this class as a JSON array of objects.
+
+        :param kwargs: Passed to json.dumps.
+        :rtype: str
+        """
+        return dumps(cls.to_dicts(records), **kwargs)
+
+
+_RESERVED = frozenset(dir(Record))
+
+
+def _schema(schema):
+    fields = tuple(schema.keys() if isinstance(schema, Mapping) else schema)
+    for field in fields:
+        if not isinstance(field, str) or not field.isidentifier() or iskeyword(field):
+            raise ValueError("{!r} is not a valid field name".format(field))
+        if field.startswith("_") or field in _RESERVED:
+            raise ValueError("{!r} is reserved".format(field))
+    if len(set(fields)) != len(fields):
+        raise ValueError("Duplicate field names")
+    return fields
+
+
+def record_class(name, schema, defaults=None, module=None):
+    """
+    Generate a Record class with a field per key of schema, storing its values
+    in __slots__. A record takes a fraction of the memory of an AttributeDict
+    with the same keys, and its values are read as fast as attributes of any
+    object.
+
+    >>> Point = record_class("Point", ["x", "y"], defaults={"y": 0})
+    >>> point = Point(1)
+    >>> point.x, point["y"]
+    (1, 0)
+    >>> User = record_class("User", sample_attribute_dict)
+    >>> users = User.from_dicts(rows)
+
+    Fields not given on creation take their default, None unless set in
+    defaults. Default values are shared between records, as for function
+    defaults.
+
+    :param schema: Iterable of field names, or a mapping (eg: a sample
+            AttributeDict) whose keys are the field names.
+    :param defaults: Default values by field name.
+    :param module: Module the class is reported to be defined in, for
+            pickling. Defaults to the module calling this function.
+    :raises: ValueError if a field name is not an identifier, is reserved or
+            repeated.
+    :rtype: type
+    """
+    fields = _schema(schema)
+    defaults = dict(defaults or {})
+    unknown = set(defaults) - set(fields)
+    if unknown:
+        raise ValueError("Defaults for unknown fields: {}".format(sorted(unknown)))
+
+    # the initializer is generated so that records are created without
+    # looping over the fields
+    namespace = {"_defaults": defaults}
+    parameters = ", ".join("{0}=_defaults.get({0!r})".format(field) for field in fields)
+    body = "".join("\n    self.{0} = {0}".format(field) for field in fields)
+    source = "def __init__(self, {}):{}".format(parameters, body or "\n    pass")
+    exec(source, namespace)
+
+    getter = attrgetter(*fields) if fields else (lambda record: ())
+    if len(fields) == 1:
+        single = getter
+        getter = lambda record: (single(record),)  # noqa: E731
+
+    if module is None:
+        try:
+            module = sys._getframe(1).f_globals.get("__name__", "__main__")
+        except (AttributeError, ValueError):
+            module = __name__
+
+    return type(
+        name,
+        (Record,),
+        {
+            "__slots__": fields,
+            "__init__": namespace["__init__"],
+            "__module__": module,
+            "FIELDS": fields,
+            "DEFAULTS": {field: defaults.get(field) for field in fields},
+            "_getter": staticmethod(getter),
+        },
+    )
+
+
+class RecordTable(object):
+    """
+    Records of a Record class stored by column: each field is a contiguous
+    list, or an array.array for fields given a typecode, eg: "d" for floats
+    or "q" for integers. Numeric columns then take 8 bytes per record and
+    can be handed to numpy.frombuffer without copying.
+
+    Records are materialized on access, and changes to them are not written
+    back; use `set` to change values.
+
+    >>> table = RecordTable(User, typecodes={"id": "q"})
+    >>> table.extend(rows)
+    >>> ids = table.column("id")
+
+    :param record_class: A class generated by `record_class`.
+    :param typecodes: array.array typecodes by field name.
+    """
+
+    def __init__(self, record_class, typecodes=None):
+        self.record_class = record_class
+        self.typecodes = dict(typecodes or {})
+        unknown = set(self.typecodes) - set(record_class.FIELDS)
+        if unknown:
+            raise ValueError("Typecodes for unknown fields: {}".format(sorted(unknown)))
+        self._columns = {
+            field: array(self.typecodes[field]) if field in self.typecodes else []
+            for field in record_class.FIELDS
+        }
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def column(self, field):
+        """
+        Return the values of a field, shared with the table.
+
+        :rtype: list or array.array
+        """
+        return self._columns[field]
+
+    @property
+    def columns(self):
+        """
+        :rtype: dict
+        """
+        return dict(self._columns)
+
+    def append(self, record):
+        """
+        Append a record, or a mapping with the fields of a record.
+        """
+        if not isinstance(record, self.record_class):
+            record = self.record_class(**record)
+        try:
+            for column, value in zip(self._columns.values(), record.values_tuple()):
+                column.append(value)
+        except (TypeError, OverflowError):
+            self._truncate()
+            raise
+        self._length += 1
+
+    def extend(self, records):
+        """
+        Append records, or mappings, column by column.
+        """
+        cls = self.record_class
+        rows = [
+            (
+                record.values_tuple()
+                if isinstance(record, cls)
+                else cls(**record).values_tuple()
+            )
+            for record in records
+        ]
+        if not rows:
+            return
+        try:
+            for column, values in zip(self._columns.values(), zip(*rows)):
+                column.extend(values)
+        except (TypeError, OverflowError):
+            self._truncate()
+            raise
+        self._length += len(rows)
+
+    def _truncate(self):
+        # drop the values appended to some columns only, when a typed column
+        # rejected a value
+        for column in self._columns.values():
+            del column[self._length :]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("record index out of range")
+        return self.record_class(*(column[index] for column in self._columns.values()))
+
+    def __iter__(self):
+        cls = self.record_class
+        for values in zip(*self._columns.values()):
+            yield cls(*values)
+
+    def set(self, index, field, value):
+        """
+        Set the value of a field of the record at index.
+        """
+        self._columns[field][index] = value
+
+    def to_records(self):
+        """
+        :rtype: list
+        """
+        return list(self)
+
+    def to_dicts(self, attribute_dict=False):
+        """
+        :rtype: list
+        """
+        factory = AttributeDict if attribute_dict else dict
+        fields = self.record_class.FIELDS
+        return [factory(zip(fields, values)) for values in zip(*self._columns.values())]
+
+    def to_json(self, **kwargs):
+        """
+        Serialize the table as a JSON array of objects.
+
+        :rtype: str
+        """
+        return dumps(self.to_dicts(), **kwargs)
+
+    @classmethod
+    def from_records(cls, record_class, records, typecodes=None):
+        """
+        :rtype: RecordTable
+        """
+        table = cls(record_class, typecodes)
+        table.extend(records)
+        return table
+
+    @classmethod
+    def from_json(cls, record_class, data, typecodes=None):
+        """
+        Create a table from a JSON array of objects.
+
+        :rtype: RecordTable
+        """
+        return cls.from_records(record_class, loads(data), typecodes)
@@ -0,0 +1,424 @@
+import sys
+from array import array
+from fcntl import LOCK_EX, LOCK_UN, lockf
+from multiprocessing import resource_tracker, shared_memory
+from os import O_CREAT, O_RDWR
+from os import open as osopen
+from os import unlink as osunlink
+from os.path import join
+from pickle import HIGHEST_PROTOCOL, dumps, loads
+from re import sub
+from struct import Struct
+from tempfile import gettempdir
+from threading import Lock
+from time import sleep
+
+from cafeteria.patterns.borg import Borg, BorgStateManager
+
+MAGIC = b"CBD1"
+
+# before Python 3.13 attached segments are always registered with the resource
+# tracker, which unlinks them when the process exits
+TRACKED = sys.version_info < (3, 13)
+
+# magic, sequence number; the active half is bit 1 of the sequence number
+_HEADER = Struct("<4s4xQ")
+_SEQUENCE = Struct("<Q")
+_SEQUENCE_OFFSET = 8
+# payload length, index length
+_PAYLOAD = Struct("<QQ")
+
+_PICKLED = 0
+_BYTES = 1
+_ARRAY = 2
+
+# returned when the state changed while a value was decoded
+_STALE = object()
+
+
+def _align(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+class SharedState(object):
+    """
+    Per process handle of the shared memory segment backing a SharedBorgDict.
+
+    The segment starts with a header holding a sequence number, followed by
+    two equally sized halves. Each half holds an index, mapping keys to (type,
+    offset, length, typecode) entries, followed by the values. bytes and
+    array.array values are stored raw, so they can be read without copying,
+    other values are pickled. An all zero segment is an empty
+    state, so a newly created segment needs no initialisation.
+
+    Writers serialise on a thread lock and a POSIX record lock on a lock file,
+    make the sequence number odd, write the new state to the inactive half
+    and then increment the sequence number again. The active half is derived
+    from the sequence number, (sequence >> 1) & 1, so a single read gives a
+    consistent pair, and it only flips once the new state is complete.
+    Readers never take a lock or wait on writers: they read the active half
+    and retry if the sequence number changed meanwhile (seqlock).
+
+    The decoded index and values are published per process as one tuple of
+    (sequence, index, data offset, values), swapped in a single assignment.
+    """
+
+    def __init__(self, name, size):
+        self.name = name
+        self.segment = self._open(name, size)
+        self.buffer = self.segment.buf
+        # keep both halves 8 byte aligned
+        self.half_size = (self.segment.size - _HEADER.size) // 16 * 8
+
+        magic = _HEADER.unpack_from(self.buffer, 0)[0]
+        if magic not in (MAGIC, bytes(len(MAGIC))):
+            raise ValueError("{} is not a SharedBorgDict segment".format(name))
+
+        self._lock = Lock()
+        self._lock_path = join(gettempdir(), name + ".lock")
+        self._lock_fd = osopen(self._lock_path, O_CREAT | O_RDWR)
+        self._state = (None, {}, 0, {})
+
+    @classmethod
+    def _open(cls, name, size):
+        while True:
+            try:
+                return cls._segment(name, create=True, size=size)
+            except FileExistsError:
+                pass
+            try:
+                return cls._segment(name)
+            except FileNotFoundError:
+                # unlinked in the meantime, create it again
+                continue
+            except ValueError:
+                # created but not yet sized by another process
+                sleep(0.001)
+
+    @staticmethod
+    def _segment(name, create=False, size=0):
+        if TRACKED:
+            segment = shared_memory.SharedMemory(name, create, size)
+            # the segment outlives this process, do not let the resource
+            # tracker unlink it when the process exits
+            # noinspection PyProtectedMember
+            resource_tracker.unregister(segment._name, "shared_memory")
+            return segment
+        return shared_memory.SharedMemory(name, create, size, track=False)
+
+    def unlink(self):
+        """
+        Remove the segment and its lock file.
+        """
+        if TRACKED:
+            # noinspection PyProtectedMember
+            resource_tracker.register(self.segment._name, "shared_memory")
+        self.segment.unlink()
+        try:
+            osunlink(self._lock_path)
+        except OSError:
+            pass
+
+    def _sequence(self):
+        return _SEQUENCE.unpack_from(self.buffer, _SEQUENCE_OFFSET)[0]
+
+    def _half(self, sequence):
+        return _HEADER.size + ((sequence >> 1) & 1) * self.half_size
+
+    def state(self):
+        """
+        Return the current state as a (sequence, index, data offset, values)
+        tuple, decoding the index only if the state changed since the last
+        call. values caches the values decoded for this state.
+
+        :rtype: tuple
+        """
+        state = self._state
+        sequence = self._sequence()
+        while sequence != state[0]:
+            start = self._half(sequence)
+            payload_length, index_length = _PAYLOAD.unpack_from(self.buffer, start)
+            if payload_length:
+                offset = start + _PAYLOAD.size
+                try:
+                    index = loads(self.buffer[offset : offset + index_length])
+                except Exception:
+                    if self._sequence() == sequence:
+                        raise
+                    # torn read, retry
+                    sequence = self._sequence()
+                    continue
+                data_offset = start + _align(_PAYLOAD.size + index_length)
+            else:
+                index, data_offset = {}, 0
+
+            current = self._sequence()
+            if current == sequence:
+                state = self._state = (sequence, index, data_offset, {})
+            sequence = current
+        return state
+
+    def index(self):
+        """
+        Return the index of the current state.
+
+        :rtype: dict
+        """
+        return self.state()[1]
+
+    def view(self, key):
+        """
+        Return a memoryview into the segment for a bytes or array value. The
+        view stays valid until the second write after it was taken.
+
+        :raises: KeyError, TypeError
+        :rtype: memoryview
+        """
+        while True:
+            sequence, index, data_offset, _ = self.state()
+            tag, offset, length, typecode = index[key]
+            if tag == _PICKLED:
+                raise TypeError("{!r} is not a bytes or array value".format(key))
+            start = data_offset + offset
+            view = self.buffer[start : start + length]
+            if tag == _ARRAY:
+                view = view.cast(typecode)
+            if self._sequence() == sequence:
+                return view
+
+    def _decode(self, state, key):
+        # return the value of key in state, or _STALE if the state changed
+        # while decoding it
+        sequence, index, data_offset, values = state
+        try:
+            return values[key]
+        except KeyError:
+            pass
+
+        tag, offset, length, typecode = index[key]
+        start = data_offset + offset
+        data = self.buffer[start : start + length]
+        try:
+            if tag == _BYTES:
+                value = bytes(data)
+            elif tag == _ARRAY:
+                value = array(typecode, data.tobytes())
+            else:
+                value = loads(data)
+        except Exception:
+            if self._sequence() == sequence:
+                raise
+            return _STALE
+        if self._sequence() != sequence:
+            return _STALE
+        values[key] = value
+        return value
+
+    def get(self, key):
+        """
+        Return the value of key. Values are decoded once per state change and
+        the decoded objects are shared, so treat them as read only.
+
+        :raises: KeyError
+        """
+        while True:
+            value = self._decode(self.state(), key)
+            if value is not _STALE:
+                return value
+
+    def items(self):
+        """
+        Return a list of the (key, value) pairs of a single state.
+
+        :rtype: list
+        """
+        while True:
+            state = self.state()
+            items = []
+            for key in state[1]:
+                value = self._decode(state, key)
+                if value is _STALE:
+                    break
+                items.append((key, value))
+            else:
+                return items
+
+    def write(self, func):
+        """
+        Apply func to a dict copy of the current state and publish the result.
+
+        :param func: Callable modifying the dict it is given.
+        :return: The return value of func.
+        """
+        with self._lock:
+            lockf(self._lock_fd, LOCK_EX)
+            try:
+                state = dict(self.items())
+                result = func(state)
+                self._publish(state)
+                return result
+            finally:
+                lockf(self._lock_fd, LOCK_UN)
+
+    def _publish(self, state):
+        index, blobs, offset = {}, [], 0
+        for key, value in state.items():
+            if isinstance(value, bytes):
+                entry, blob = (_BYTES, offset, len(value), None), value
+            elif isinstance(value, array):
+                blob = value.tobytes()
+                entry = (_ARRAY, offset, len(blob), value.typecode)
+            else:
+                blob = dumps(value, HIGHEST_PROTOCOL)
+                entry = (_PICKLED, offset, len(blob), None)
+            index[key] = entry
+            blobs.append((offset, blob))
+            offset = _align(offset + len(blob))
+
+        encoded_index = dumps(index, HIGHEST_PROTOCOL)
+        data_offset = _align(_PAYLOAD.size + len(encoded_index))
+        payload_length = data_offset + offset
+        if payload_length > self.half_size:
+            raise ValueError(
+                "State of {} bytes exceeds the capacity of {} bytes of {}".format(
+                    payload_length, self.half_size, self.name
+                )
+            )
+
+        # an odd sequence number is left by a writer that died while writing,
+        # the active half is still the one it designates
+        begin = self._sequence() | 1
+        end = begin + 1
+        buffer, start = self.buffer, self._half(end)
+
+        _HEADER.pack_into(buffer, 0, MAGIC, begin)
+        _PAYLOAD.pack_into(buffer, start, payload_length, len(encoded_index))
+        buffer[start + _PAYLOAD.size : start + _PAYLOAD.size + len(encoded_index)] = (
+            encoded_index
+        )
+        for offset, blob in blobs:
+            position = start + data_offset + offset
+            buffer[position : position + len(blob)] = blob
+        _HEADER.pack_into(buffer, 0, MAGIC, end)
+
+
+class SharedBorgDict(Borg, dict):
+    """
+    A dict implementing the Borg Pattern across processes. The state lives in a
+    named multiprocessing.shared_memory segment, so all instances of a class in
+    all processes on a machine (eg: pre-forked workers) share a single copy.
+
+    Reads take no locks and decode each value once per state change; bytes and
+    array.array values can be accessed without copying using `view`. Every
+    write re-serialises the whole state, so this suits state that is read far
+    more often than it is written. Keys and values other than bytes and arrays
+    must be picklable.
+
+    The segment name and size default to SEGMENT_NAME (derived from the class
+    name if not set) and SEGMENT_SIZE; both halves of the segment must be able
+    to hold the serialised state. The segment is not removed when processes
+    exit, use `unlink` to remove it.
+    """
+
+    SEGMENT_NAME = None
+    SEGMENT_SIZE = 2**20
+
+    def __init__(self, *args, **kwargs):
+        object.__setattr__(self, "_shared", BorgStateManager.get_state(type(self)))
+        if args or kwargs:
+            self.update(*args, **kwargs)
+
+    @classmethod
+    def segment_name(cls):
+        return cls.SEGMENT_NAME or sub(
+            r"[^A-Za-z0-9_.-]",
+            "_",
+            "cafeteria.{}.{}".format(cls.__module__, cls.__qualname__),
+        )
+
+    @classmethod
+    def init_state(cls):
+        return SharedState(cls.segment_name(), cls.SEGMENT_SIZE)
+
+    @classmethod
+    def unlink(cls):
+        """
+        Remove the shared memory segment of this class.
+        """
+        BorgStateManager.get_state(cls).unlink()
+
+    def view(self, key):
+        """
+        Return a read only memoryview of a bytes or array.array value without
+        copying it. The view is only guaranteed to reflect the value until the
+        second write to the state after it was taken.
+
+        :rtype: memoryview
+        """
+        return self._shared.view(key).toreadonly()
+
+    def update(self, *args, **kwargs):
+        self._shared.write(lambda state: state.update(*args, **kwargs))
+
+    def __setitem__(self, key, value):
+        self._shared.write(lambda state: state.__setitem__(key, value))
+
+    def __getitem__(self, key):
+        return self._shared.get(key)
+
+    def __delitem__(self, key):
+        self._shared.write(lambda state: state.__delitem__(key))
+
+    def __getattr__(self, item):
+        try:
+            return self[item]
+        except KeyError:
+            raise AttributeError(item)
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+    def __delattr__(self, item):
+        try:
+            del self[item]
+        except KeyError:
+            raise AttributeError(item)
+
+    def __repr__(self):
+        return dict(self.items()).__repr__()
+
+    def __str__(self):
+        return dict(self.items()).__str__()
+
+    def __iter__(self):
+        return iter(list(self._shared.index()))
+
+    def __len__(self):
+        return len(self._shared.index())
+
+    def __contains__(self, k):
+        return k in self._shared.index()
+
+    def __eq__(self, other):
+        return dict(self.items()) == other
+
+    def keys(self):
+        return self._shared.index().keys()
+
+    def items(self):
+        return self._shared.items()
+
+    def values(self):
+        return [value for _, value in self._shared.items()]
+
+    def get(self, key, default=None):
+        try:
+            return self._shared.get(key)
+        except KeyError:
+            return default
+
+    def pop(self, *args):
+        return self._shared.write(lambda state: state.pop(*args))
+
+    def clear(self):
+        self._shared.write(lambda state: state.clear())
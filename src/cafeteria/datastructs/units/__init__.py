@@ -1,4 +1,14 @@
-from re import match
+from array import array
+from itertools import repeat
+from math import floor, fsum
+from operator import add, mul, sub, truediv
+from re import compile
+
+try:
+    # noinspection PyPackageRequirements,PyUnresolvedReferences
+    import numpy
+except ImportError:
+    numpy = None
 
 try:
     long
@@ -9,23 +19,72 @@ except NameError:
 
 class BaseUnitClass(float):
     UNITS = {}
+    DEFAULT_UNIT = None
 
-    # noinspection PyInitNewSignature
-    def __new__(cls, x, unit=None):
+    def __init_subclass__(cls, **kwargs):
+        super(BaseUnitClass, cls).__init_subclass__(**kwargs)
+        cls._compile()
+
+    @classmethod
+    def _compile(cls):
+        cls._UNITS_REGEX = "|".join(cls.UNITS.keys())
+        cls._PATTERN = compile(r"^(\d+(.\d+)?) ?({})$".format(cls._UNITS_REGEX))
+
+    @classmethod
+    def _parse(cls, x, unit=None):
+        """
+        Convert a string or a number in the given unit to the base unit amount.
+
+        :raises: ValueError, KeyError
+        :rtype: float
+        """
         if isinstance(x, str):
-            units_regex = "|".join(cls.UNITS.keys())
-            m = match(r"^(\d+(.\d+)?) ?({})$".format(units_regex), x)
+            m = cls._PATTERN.match(x)
             if m is None:
                 raise ValueError(
                     '{} requires number or a string in the format "<value> '
-                    '({})"'.format(cls.__name__, units_regex)
+                    '({})"'.format(cls.__name__, cls._UNITS_REGEX)
                 )
-            x = float(m.group(1)) * cls.UNITS.get(m.group(3))
-        elif unit is None:
+            return float(m.group(1)) * cls.UNITS[m.group(3)]
+        if unit is None:
+            unit = cls.DEFAULT_UNIT
+        if unit is None:
             raise ValueError("No unit provided.")
-        else:
-            x = x * cls.UNITS[unit]
-        return super(BaseUnitClass, cls).__new__(cls, x)
+        return x * cls.UNITS[unit]
+
+    # noinspection PyInitNewSignature
+    def __new__(cls, x, unit=None):
+        return super(BaseUnitClass, cls).__new__(cls, cls._parse(x, unit))
+
+    @classmethod
+    def parse_many(cls, values, unit=None):
+        """
+        Parse many strings or numbers in the given unit into a compact array of
+        base unit amounts. Rows that cannot be parsed are set to nan and
+        reported instead of raising.
+
+        :param values: Iterable of strings or numbers.
+        :param unit: Unit of numeric values, defaults to the class default unit.
+        :return: A tuple of the parsed values, as a NumPy array if available or
+                an array.array otherwise, and a list of (index, exception)
+                tuples for the rows that could not be parsed.
+        :rtype: tuple
+        """
+        parse = cls._parse
+        result = array("d")
+        append = result.append
+        errors = []
+
+        for index, value in enumerate(values):
+            try:
+                append(parse(value, unit))
+            except (KeyError, TypeError, ValueError) as e:
+                append(float("nan"))
+                errors.append((index, e))
+
+        if numpy is not None:
+            return numpy.frombuffer(result, dtype=numpy.float64), errors
+        return result, errors
 
     def __getattr__(self, item):
         if item in self.UNITS:
@@ -34,3 +93,201 @@ class BaseUnitClass(float):
             rounded = long(result)
             return result if result != rounded else rounded
         raise AttributeError("{} is not a valid conversion unit".format(item))
+
+
+BaseUnitClass._compile()
+
+
+class BaseUnitArray(object):
+    """
+    A compact array of BaseUnitClass values, stored as base unit amounts in a
+    contiguous array.array of doubles. Operations are applied elementwise and
+    return arrays of the same unit type where that makes sense.
+
+    The underlying buffer is exposed without copying via `buffer`, so that it
+    can be used with tools like numpy.frombuffer.
+    """
+
+    UNIT_CLASS = BaseUnitClass
+
+    __slots__ = ("_data",)
+
+    def __init__(self, values=(), unit=None):
+        self._data = array("d")
+        self.extend(values, unit)
+
+    @classmethod
+    def from_buffer(cls, data):
+        """
+        Create an array from base unit amounts. An array.array of doubles is
+        used as is, any other buffer of doubles is copied.
+
+        :type data: array.array or memoryview or bytes
+        """
+        if not (isinstance(data, array) and data.typecode == "d"):
+            buffer = array("d")
+            buffer.frombytes(memoryview(data).cast("B"))
+            data = buffer
+        instance = cls.__new__(cls)
+        instance._data = data
+        return instance
+
+    @property
+    def buffer(self):
+        """
+        A memoryview of the base unit amounts, shared with this array.
+
+        :rtype: memoryview
+        """
+        return memoryview(self._data)
+
+    def __buffer__(self, flags):
+        return memoryview(self._data)
+
+    if numpy is not None:
+
+        def __array__(self, dtype=None, copy=None):
+            return numpy.frombuffer(self._data, dtype=numpy.float64)
+
+    def _unit(self, value):
+        return float.__new__(self.UNIT_CLASS, value)
+
+    def append(self, value, unit=None):
+        if isinstance(value, self.UNIT_CLASS):
+            self._data.append(value)
+        else:
+            self._data.append(self.UNIT_CLASS._parse(value, unit))
+
+    def extend(self, values, unit=None):
+        unit_class = self.UNIT_CLASS
+        parse = unit_class._parse
+        self._data.extend(
+            value if isinstance(value, unit_class) else parse(value, unit)
+            for value in values
+        )
+
+    def to(self, unit):
+        """
+        Convert all values to the given unit.
+
+        :rtype: array.array
+        """
+        if unit not in self.UNIT_CLASS.UNITS:
+            raise ValueError("{} is not a valid conversion unit".format(unit))
+        return array("d", map(truediv, self._data, repeat(self.UNIT_CLASS.UNITS[unit])))
+
+    def sum(self):
+        return self._unit(fsum(self._data))
+
+    def mean(self):
+        if not self._data:
+            raise ValueError("mean of an empty {}".format(self.__class__.__name__))
+        return self._unit(fsum(self._data) / len(self._data))
+
+    def min(self):
+        return self._unit(min(self._data))
+
+    def max(self):
+        return self._unit(max(self._data))
+
+    def percentiles(self, *percents):
+        """
+        Compute percentiles (0 to 100) using linear interpolation between the
+        closest ranks. The values are sorted once for all requested percentiles.
+
+        :rtype: list
+        """
+        if not self._data:
+            raise ValueError(
+                "percentiles of an empty {}".format(self.__class__.__name__)
+            )
+        ordered = sorted(self._data)
+        last = len(ordered) - 1
+        result = []
+        for percent in percents:
+            if not 0 <= percent <= 100:
+                raise ValueError("percentile must be between 0 and 100")
+            position = last * percent / 100.0
+            lower = int(floor(position))
+            upper = min(lower + 1, last)
+            fraction = position - lower
+            result.append(
+                self._unit(
+                    ordered[lower] + (ordered[upper] - ordered[lower]) * fraction
+                )
+            )
+        return result
+
+    def percentile(self, percent):
+        return self.percentiles(percent)[0]
+
+    def _new(self, data, cls=None):
+        instance = (cls or self.__class__).__new__(cls or self.__class__)
+        instance._data = data
+        return instance
+
+    def _operand(self, other, units):
+        """
+        Resolve the right hand side of an elementwise operation to an iterable
+        of floats. Arrays must have the same length; unit arrays are only
+        accepted if `units` is set and must be of the same type.
+        """
+        if isinstance(other, BaseUnitArray):
+            if not units or type(other) is not type(self):
+                raise TypeError(
+                    "unsupported operand: {} and {}".format(
+                        self.__class__.__name__, other.__class__.__name__
+                    )
+                )
+            other = other._data
+        elif isinstance(other, (int, float)):
+            return repeat(float(other))
+        if len(other) != len(self._data):
+            raise ValueError("operands must have the same length")
+        return other
+
+    def __add__(self, other):
+        return self._new(array("d", map(add, self._data, self._operand(other, True))))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self._new(array("d", map(sub, self._data, self._operand(other, True))))
+
+    def __rsub__(self, other):
+        return self._new(array("d", map(sub, self._operand(other, True), self._data)))
+
+    def __mul__(self, other):
+        return self._new(array("d", map(mul, self._data, self._operand(other, False))))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, (self.UNIT_CLASS, self.__class__)):
+            # ratio of two amounts of the same unit is dimensionless
+            return array("d", map(truediv, self._data, self._operand(other, True)))
+        return self._new(
+            array("d", map(truediv, self._data, self._operand(other, False)))
+        )
+
+    def __neg__(self):
+        return self * -1
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        return map(self._unit, self._data)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._new(self._data[index])
+        return self._unit(self._data[index])
+
+    def __eq__(self, other):
+        if isinstance(other, BaseUnitArray):
+            return type(other) is type(self) and self._data == other._data
+        return NotImplemented
+
+    def __repr__(self):
+        return "{}({!r})".format(self.__class__.__name__, self._data.tolist())
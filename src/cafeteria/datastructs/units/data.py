@@ -1,6 +1,10 @@
+from array import array
+from datetime import timedelta
 from enum import Enum
+from itertools import repeat
+from operator import mul, truediv
 
-from cafeteria.datastructs.units import BaseUnitClass
+from cafeteria.datastructs.units import BaseUnitArray, BaseUnitClass
 
 
 class DataMultiplier(Enum):
@@ -40,13 +44,8 @@ class DataUnit(BaseUnitClass):
         for base in DataBaseUnit.__members__
     }
     UNITS.update({base: DataBaseUnit[base].value for base in DataBaseUnit.__members__})
-
-    # noinspection PyInitNewSignature
-    def __new__(cls, x, unit=None):
-        if unit is None:
-            # noinspection PyUnresolvedReferences
-            unit = DataBaseUnit.bit.name
-        return super(DataUnit, cls).__new__(cls, x, unit)
+    # noinspection PyUnresolvedReferences
+    DEFAULT_UNIT = DataBaseUnit.bit.name
 
 
 class DataRateUnit(DataUnit):
@@ -59,10 +58,80 @@ class DataRateUnit(DataUnit):
         for unit in DataUnit.UNITS
         for suffix in ["/s", "ps"]
     }
+    # noinspection PyUnresolvedReferences
+    DEFAULT_UNIT = "{}ps".format(DataBaseUnit.bit.name)
+
+
+def _seconds(duration, length):
+    """
+    Resolve a duration, or a sequence of durations of the given length, to an
+    iterable of seconds. Durations are numbers of seconds or timedelta objects.
+    """
+    if isinstance(duration, timedelta):
+        return repeat(duration.total_seconds())
+    if isinstance(duration, (int, float)):
+        return repeat(float(duration))
+    if len(duration) != length:
+        raise ValueError("operands must have the same length")
+    return (
+        d.total_seconds() if isinstance(d, timedelta) else float(d) for d in duration
+    )
+
+
+class DataUnitArray(BaseUnitArray):
+    """
+    A compact array of DataUnit values, stored as bits.
+    Eg: DataUnitArray(["1 KiB", "2 KiB"]).to("B") == array("d", [1024, 2048])
+
+    Dividing by a timedelta (or calling `per`) yields a DataRateUnitArray.
+    """
+
+    UNIT_CLASS = DataUnit
+
+    def per(self, duration):
+        """
+        Compute the data rates of transferring each amount in the given
+        duration(s).
+
+        :param duration: Seconds or timedelta, or a sequence of those.
+        :rtype: DataRateUnitArray
+        """
+        return self._new(
+            array("d", map(truediv, self._data, _seconds(duration, len(self)))),
+            DataRateUnitArray,
+        )
+
+    def __truediv__(self, other):
+        if isinstance(other, timedelta):
+            return self.per(other)
+        return super(DataUnitArray, self).__truediv__(other)
+
+
+class DataRateUnitArray(BaseUnitArray):
+    """
+    A compact array of DataRateUnit values, stored as bits per second.
+
+    Multiplying by a timedelta (or calling `over`) yields a DataUnitArray.
+    """
+
+    UNIT_CLASS = DataRateUnit
+
+    def over(self, duration):
+        """
+        Compute the data amounts transferred at each rate over the given
+        duration(s).
+
+        :param duration: Seconds or timedelta, or a sequence of those.
+        :rtype: DataUnitArray
+        """
+        return self._new(
+            array("d", map(mul, self._data, _seconds(duration, len(self)))),
+            DataUnitArray,
+        )
+
+    def __mul__(self, other):
+        if isinstance(other, timedelta):
+            return self.over(other)
+        return super(DataRateUnitArray, self).__mul__(other)
 
-    # noinspection PyInitNewSignature
-    def __new__(cls, x, unit=None):
-        if unit is None:
-            # noinspection PyUnresolvedReferences
-            unit = "{}ps".format(DataBaseUnit.bit.name)
-        return super(DataUnit, cls).__new__(cls, x, unit)
+    __rmul__ = __mul__
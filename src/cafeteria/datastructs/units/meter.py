@@ -0,0 +1,204 @@
+from collections import deque
+from math import exp
+from threading import RLock, local
+from time import monotonic
+from weakref import finalize, ref
+
+from cafeteria.datastructs.units.data import DataRateUnit
+
+
+class _Owner(object):
+    # held only by the thread local storage of a thread recording to a
+    # meter, so that it is collected when the thread ends
+    __slots__ = ("__weakref__",)
+
+
+def _retire(meter_ref, cell):
+    meter = meter_ref()
+    if meter is not None:
+        meter._retire(cell)
+
+
+class RateMeter(object):
+    """
+    A throughput meter fed with byte counts, producing DataRateUnit values.
+
+    Recording is kept cheap for use in hot I/O loops: each thread adds to its
+    own counter, so `record` takes no lock and never reads the clock. Counters
+    of threads that ended are folded into a shared total. The
+    clock is only read when rates are computed, either on query or via `tick`,
+    at which point the bytes recorded since the previous tick are attributed
+    to the elapsed interval, assuming a steady rate over it. Calling `tick`
+    periodically (eg: from a timer) gives the sliding window, EWMA and peak
+    rates a finer resolution.
+
+    :param window: Sliding window length in seconds.
+    :param ewma_window: Time constant in seconds of the exponentially weighted
+            moving average.
+    :param clock: Monotonic clock returning seconds.
+    """
+
+    def __init__(self, window=10.0, ewma_window=5.0, clock=monotonic):
+        if window <= 0:
+            raise ValueError("window must be positive")
+        if ewma_window <= 0:
+            raise ValueError("ewma_window must be positive")
+        self.window = window
+        self.ewma_window = ewma_window
+        self._clock = clock
+        self._local = local()
+        self._cells = []
+        # bytes recorded by threads that ended
+        self._retired = 0
+        self._lock = RLock()
+
+        self._start = self._last_time = clock()
+        self._last_total = 0
+        self._samples = deque()
+        self._window_bytes = 0
+        self._ewma = 0.0
+        self._peak = 0.0
+
+    def _register(self):
+        cell = self._local.cell = [0]
+        owner = self._local.owner = _Owner()
+        with self._lock:
+            self._cells.append(cell)
+        finalize(owner, _retire, ref(self), cell)
+        return cell
+
+    def _retire(self, cell):
+        with self._lock:
+            self._retired += cell[0]
+            self._cells.remove(cell)
+
+    def _total(self):
+        return self._retired + sum(cell[0] for cell in self._cells)
+
+    def record(self, nbytes):
+        """
+        Record a number of bytes transferred.
+
+        :type nbytes: int
+        """
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._register()
+        cell[0] += nbytes
+
+    @property
+    def total(self):
+        """
+        Total number of bytes recorded.
+
+        :rtype: int
+        """
+        with self._lock:
+            return self._total()
+
+    def tick(self):
+        """
+        Attribute the bytes recorded since the previous tick to the elapsed
+        interval, updating the sliding window, EWMA and peak rates.
+        """
+        with self._lock:
+            self._tick(self._clock())
+
+    def _tick(self, now):
+        total = self._total()
+        elapsed = now - self._last_time
+        if elapsed <= 0:
+            return
+
+        nbytes = total - self._last_total
+        self._last_total = total
+        self._last_time = now
+
+        # samples of (start, end, bytes), of intervals ending in the window
+        self._samples.append((now - elapsed, now, nbytes))
+        self._window_bytes += nbytes
+        horizon = now - self.window
+        while self._samples and self._samples[0][1] <= horizon:
+            self._window_bytes -= self._samples.popleft()[2]
+
+        alpha = 1.0 - exp(-elapsed / self.ewma_window)
+        self._ewma += alpha * (nbytes / elapsed - self._ewma)
+        self._peak = max(self._peak, self._window_rate(now))
+
+    def _window_rate(self, now):
+        span = min(self.window, now - self._start)
+        if span <= 0:
+            return 0.0
+        nbytes = self._window_bytes
+        if self._samples:
+            # prorate the interval straddling the start of the window
+            start, end, first = self._samples[0]
+            horizon = now - self.window
+            if start < horizon:
+                nbytes -= first * (horizon - start) / (end - start)
+        return nbytes / span
+
+    @staticmethod
+    def _rate(bytes_per_second):
+        return DataRateUnit(bytes_per_second, "B/s")
+
+    @property
+    def current(self):
+        """
+        Rate over the sliding window.
+
+        :rtype: DataRateUnit
+        """
+        with self._lock:
+            now = self._clock()
+            self._tick(now)
+            return self._rate(self._window_rate(now))
+
+    @property
+    def ewma(self):
+        """
+        Exponentially weighted moving average rate.
+
+        :rtype: DataRateUnit
+        """
+        with self._lock:
+            self._tick(self._clock())
+            return self._rate(self._ewma)
+
+    @property
+    def average(self):
+        """
+        Average rate since the meter was created or reset.
+
+        :rtype: DataRateUnit
+        """
+        with self._lock:
+            now = self._clock()
+            self._tick(now)
+            elapsed = now - self._start
+            return self._rate(self._last_total / elapsed if elapsed > 0 else 0.0)
+
+    @property
+    def peak(self):
+        """
+        Highest sliding window rate observed at a tick.
+
+        :rtype: DataRateUnit
+        """
+        with self._lock:
+            self._tick(self._clock())
+            return self._rate(self._peak)
+
+    def reset(self):
+        """
+        Discard all rates and start measuring from now. Recorded byte counts
+        are retained in `total`.
+        """
+        with self._lock:
+            self._start = self._last_time = self._clock()
+            self._last_total = self._total()
+            self._samples.clear()
+            self._window_bytes = 0
+            self._ewma = 0.0
+            self._peak = 0.0
@@ -1,5 +1,12 @@
+from collections import OrderedDict, namedtuple
+from functools import partial, wraps
+from inspect import Parameter, signature
+from threading import Lock, RLock
+from time import monotonic
+
 # noinspection PyUnresolvedReferences
 from cafeteria.abc.compat import abstractclassmethod  # noqa F401
+from cafeteria.patterns.dict import compile_path
 
 
 # noinspection PyPep8Naming,SpellCheckingInspection
@@ -18,3 +25,318 @@ class classproperty(property):
     # noinspection PyMethodOverriding,PyArgumentList,PyMethodParameters
     def __get__(desc, self, cls):
         return desc.fget(cls)
+
+
+_MISSING = object()
+
+
+# noinspection PyPep8Naming,SpellCheckingInspection
+class cached_classproperty(classproperty):
+    """
+    A classproperty computed once per class. Each class accessing the property
+    gets its own value, computed with that class, subclasses do not share the
+    value of their parents. Values are stored on the class under a private
+    attribute, so they are released with the class.
+
+    >>> class Plugin(object):
+    ...     @cached_classproperty
+    ...     def registry(cls):
+    ...         return build_registry(cls)
+    >>> invalidate_classproperty(Plugin, "registry")
+    """
+
+    def __init__(self, fget, *arg, **kw):
+        super(cached_classproperty, self).__init__(fget, *arg, **kw)
+        self._lock = RLock()
+        self._set_attribute(fget.__name__)
+
+    def __set_name__(self, owner, name):
+        self._set_attribute(name)
+
+    def _set_attribute(self, name):
+        self.name = name
+        self.attribute = "_cached_classproperty_{}".format(name)
+
+    # noinspection PyMethodOverriding,PyArgumentList,PyMethodParameters
+    def __get__(desc, self, cls):
+        value = cls.__dict__.get(desc.attribute, _MISSING)
+        if value is _MISSING:
+            with desc._lock:
+                value = cls.__dict__.get(desc.attribute, _MISSING)
+                if value is _MISSING:
+                    value = desc.fget(cls)
+                    setattr(cls, desc.attribute, value)
+        return value
+
+    def invalidate(self, cls, subclasses=False):
+        """
+        Discard the value cached for cls, and optionally for its subclasses,
+        to be computed again on the next access.
+        """
+        with self._lock:
+            classes = [cls]
+            while classes:
+                klass = classes.pop()
+                if self.attribute in klass.__dict__:
+                    delattr(klass, self.attribute)
+                if subclasses:
+                    classes.extend(klass.__subclasses__())
+
+
+def invalidate_classproperty(cls, name, subclasses=False):
+    """
+    Discard the value of a cached_classproperty cached for cls.
+
+    :raises: AttributeError if cls has no cached_classproperty name
+    """
+    for klass in cls.__mro__:
+        descriptor = klass.__dict__.get(name)
+        if isinstance(descriptor, cached_classproperty):
+            descriptor.invalidate(cls, subclasses)
+            return
+    raise AttributeError(
+        "{} has no cached_classproperty {}".format(cls.__qualname__, name)
+    )
+
+
+CacheInfo = namedtuple(
+    "CacheInfo", ["hits", "misses", "evictions", "currsize", "maxsize"]
+)
+
+
+class _Flight(object):
+    """
+    A value being computed, awaited by concurrent misses on the same key. The
+    lock is held by the computing thread until the result is available.
+    """
+
+    __slots__ = ("lock", "value", "error")
+
+    def __init__(self):
+        self.lock = Lock()
+        self.lock.acquire()
+        self.value = None
+        self.error = None
+
+
+class _MemoizeCache(object):
+    """
+    Results cached by memoize, in least recently used order with their
+    expiry time, and the results being computed.
+    """
+
+    def __init__(self, maxsize, ttl, clock):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = Lock()
+        self.hits = self.misses = self.evictions = 0
+        # key: (value, expiry)
+        self.entries = OrderedDict()
+        self._flights = {}
+
+    def _get(self, key):
+        # called with the lock held
+        entry = self.entries.get(key, _MISSING)
+        if entry is not _MISSING:
+            if self.ttl is None or entry[1] > self.clock():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            del self.entries[key]
+            self.evictions += 1
+        self.misses += 1
+        return _MISSING
+
+    def _put(self, key, value):
+        # called with the lock held
+        expiry = None if self.ttl is None else self.clock() + self.ttl
+        self.entries[key] = (value, expiry)
+        if self.maxsize is not None and len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def load(self, key, func, args, kwargs):
+        """
+        Return the cached result of key, computing it with func if missing,
+        once for concurrent callers.
+        """
+        with self.lock:
+            value = self._get(key)
+            if value is not _MISSING:
+                return value
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            with flight.lock:
+                pass
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = value = func(*args, **kwargs)
+        except BaseException as e:
+            flight.error = e
+            with self.lock:
+                del self._flights[key]
+            raise
+        else:
+            with self.lock:
+                self._put(key, value)
+                del self._flights[key]
+            return value
+        finally:
+            flight.lock.release()
+
+    def pop(self, key):
+        with self.lock:
+            return self.entries.pop(key, _MISSING) is not _MISSING
+
+    def info(self):
+        """
+        :rtype: CacheInfo
+        """
+        with self.lock:
+            return CacheInfo(
+                self.hits, self.misses, self.evictions, len(self.entries), self.maxsize
+            )
+
+    def clear(self):
+        """
+        Discard all cached results and reset the statistics.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+def _path_key(func, paths):
+    """
+    Build a key function extracting a value per path out of the arguments of
+    func. The first element of a path is the position or name of an argument,
+    the rest a path into it as for `get_by_path`.
+    """
+    parameters = list(signature(func).parameters.values())
+    positions = {parameter.name: index for index, parameter in enumerate(parameters)}
+    extractors = []
+    for path in paths:
+        path = path if isinstance(path, tuple) else (path,)
+        argument, *rest = path
+        if isinstance(argument, str):
+            name, position = argument, positions.get(argument)
+        else:
+            name, position = None, argument
+        default = None
+        if position is not None and position < len(parameters):
+            default = parameters[position].default
+            if default is Parameter.empty:
+                default = None
+        accessor = compile_path(*rest) if rest else None
+        extractors.append((name, position, default, accessor))
+
+    def key(*args, **kwargs):
+        values = []
+        for name, position, default, accessor in extractors:
+            if name is not None and name in kwargs:
+                value = kwargs[name]
+            elif position is not None and position < len(args):
+                value = args[position]
+            else:
+                value = default
+            if accessor is not None and value is not None:
+                value = accessor(value)
+            values.append(value)
+        return tuple(values)
+
+    return key
+
+
+def _default_key(*args, **kwargs):
+    if kwargs:
+        return args + (_MISSING,) + tuple(sorted(kwargs.items()))
+    return args
+
+
+def memoize(func=None, maxsize=128, ttl=None, key=None, paths=None, clock=monotonic):
+    """
+    Cache the results of a function, evicting the least recently used results
+    beyond maxsize and results older than ttl seconds.
+
+    Concurrent calls missing the same key compute it once: the first call
+    computes the result while the others wait for it, and share its exception
+    if it raises. Exceptions are not cached.
+
+    By default results are keyed by the arguments, which must be hashable.
+    Functions taking unhashable arguments, such as dicts, can be keyed by
+    values extracted out of them with `paths`, each path being the position
+    or name of an argument followed by a path into it as for `get_by_path`.
+
+    >>> @memoize(maxsize=1024, ttl=60, paths=[(0, "user", "id"), "limit"])
+    ... def recommendations(request, limit=10):
+    ...     ...
+    >>> recommendations.cache_info()
+    CacheInfo(hits=0, misses=0, evictions=0, currsize=0, maxsize=1024)
+
+    The decorated function has `cache_info`, `cache_clear` and `invalidate`,
+    discarding the result cached for given arguments. Hits are counted
+    without locking, so the statistics are approximate under contention.
+
+    :param maxsize: Maximum number of results cached, None for no limit.
+    :param ttl: Seconds results are cached for, None for no limit.
+    :param key: Callable returning the key of a call given its arguments.
+    :param paths: Paths of the values to key calls by, instead of key.
+    :param clock: Clock returning seconds, used for ttl.
+    """
+    if func is None:
+        return partial(
+            memoize, maxsize=maxsize, ttl=ttl, key=key, paths=paths, clock=clock
+        )
+    if maxsize is not None and maxsize < 1:
+        raise ValueError("maxsize must be at least 1 or None")
+    if paths is not None:
+        if key is not None:
+            raise ValueError("key and paths are mutually exclusive")
+        key = _path_key(func, paths)
+    cache = _MemoizeCache(maxsize, ttl, clock)
+    entries, load = cache.entries, cache.load
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if key is not None:
+            k = key(*args, **kwargs)
+        elif kwargs:
+            k = _default_key(*args, **kwargs)
+        else:
+            k = args
+        # hits are handled inline and without the lock, the OrderedDict
+        # operations being atomic; a concurrent eviction only makes
+        # move_to_end fail
+        entry = entries.get(k, _MISSING)
+        if entry is not _MISSING and (ttl is None or entry[1] > clock()):
+            try:
+                entries.move_to_end(k)
+            except KeyError:
+                pass
+            cache.hits += 1
+            return entry[0]
+        return load(k, func, args, kwargs)
+
+    def invalidate(*args, **kwargs):
+        """
+        Discard the result cached for the given arguments.
+
+        :return: Whether a result was cached.
+        :rtype: bool
+        """
+        return cache.pop((key or _default_key)(*args, **kwargs))
+
+    wrapper.cache_info = cache.info
+    wrapper.cache_clear = cache.clear
+    wrapper.invalidate = invalidate
+    return wrapper
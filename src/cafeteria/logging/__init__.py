@@ -1,15 +1,22 @@
+from atexit import register
 from logging import debug, exception, getLogger, root
 from logging.config import dictConfig
 from os import getenv
 from os.path import isfile
+from weakref import WeakSet
 
-from cafeteria.logging.trace import LOGGING_LEVELS
+from cafeteria.logging.queued import OverflowPolicy, QueuedLogging
+from cafeteria.logging.trace import LOGGING_LEVELS, TRACE
 from cafeteria.patterns.mixins import ContextMixin
 
 
 class LoggingManager(object):
     CONFIGFILE_ENV_KEY = "LOG_CFG"
 
+    queued = None
+    """:type: cafeteria.logging.queued.QueuedLogging"""
+    _atexit_registered = False
+
     @classmethod
     def set_level(cls, level):
         """
@@ -21,16 +28,72 @@ class LoggingManager(object):
             else int(LOGGING_LEVELS.get(level.upper(), level))
         )
 
-        for handler in root.handlers:
+        handlers = list(root.handlers)
+        if cls.queued is not None:
+            handlers += cls.queued.handlers
+        for handler in handlers:
             handler.setLevel(level)
 
         root.setLevel(level)
+        LoggedObject.refresh_trace()
 
     @classmethod
-    def load_config(cls, configfile=None):
+    def enable_async(
+        cls,
+        maxsize=10000,
+        overflow=OverflowPolicy.BLOCK,
+        timeout=None,
+        batch_size=256,
+    ):
+        """
+        Move the I/O of the root handlers to a background thread. The root
+        handlers are replaced by a handler putting records on a bounded queue,
+        which a single listener thread passes to the original handlers in
+        batches. Queued records are flushed by `disable_async`, which is also
+        called at exit.
+
+        See cafeteria.logging.queued.QueuedLogging for the parameters.
+
+        :rtype: cafeteria.logging.queued.QueuedLogging
         """
+        if cls.queued is not None:
+            return cls.queued
+
+        handlers = list(root.handlers)
+        queued = QueuedLogging(handlers, maxsize, overflow, timeout, batch_size)
+        for handler in handlers:
+            root.removeHandler(handler)
+        root.addHandler(queued.handler)
+        queued.start()
+
+        if not cls._atexit_registered:
+            register(cls.disable_async)
+            cls._atexit_registered = True
+        cls.queued = queued
+        return queued
+
+    @classmethod
+    def disable_async(cls):
+        """
+        Handle all queued records, stop the background thread and restore
+        the root handlers.
+        """
+        queued, cls.queued = cls.queued, None
+        if queued is None:
+            return
+        root.removeHandler(queued.handler)
+        queued.stop()
+        for handler in queued.handlers:
+            root.addHandler(handler)
+
+    @classmethod
+    def load_config(cls, configfile=None, asynchronous=False, **kwargs):
+        """
+        :param asynchronous: Enable async logging once configured, with kwargs
+                passed to `enable_async`.
         :raises: ValueError
         """
+        cls.disable_async()
         configfile = configfile or getenv(cls.CONFIGFILE_ENV_KEY, "logging.yaml")
 
         if isfile(configfile):
@@ -46,32 +109,75 @@ class LoggingManager(object):
                     # noinspection PyBroadException
                     try:
                         dictConfig(yaml.safe_load(cf))
+                        LoggedObject.refresh_trace()
                     except ValueError:
                         debug(
                             "Learn to config foooo! Improper config at %s", configfile
                         )
                     except Exception:
                         exception("Something went wrong while reading %s.", configfile)
+            if asynchronous:
+                cls.enable_async(**kwargs)
         else:
             raise ValueError("Invalid configfile specified: {}".format(configfile))
 
 
 # noinspection PyPep8Naming
 class LoggedObject(ContextMixin):
-    def __new__(cls, *args, **kwargs):
+    """
+    Base class for objects tracing their instantiation and context usage.
+
+    The logger of each class is resolved once, when the class is created, and
+    whether it is enabled for TRACE is cached in `_trace_enabled`, so that
+    disabled trace calls cost a single attribute check. The cache is
+    refreshed by LoggingManager; call `LoggedObject.refresh_trace()` after
+    changing levels by other means.
+    """
+
+    _classes = WeakSet()
+    _trace_enabled = False
+
+    def __init_subclass__(cls, **kwargs):
+        super(LoggedObject, cls).__init_subclass__(**kwargs)
+        cls._setup_logger()
+
+    @classmethod
+    def _setup_logger(cls):
         cls.logger = getLogger("{}.{}".format(cls.__module__, cls.__name__))
         """:type: cafeteria.logging.trace.TraceEnabledLogger"""
-        cls.logger.trace("Instantiating %s.%s", cls.__module__, cls.__qualname__)
+        cls._trace_enabled = cls.logger.isEnabledFor(TRACE)
+        LoggedObject._classes.add(cls)
+
+    @classmethod
+    def refresh_trace(cls):
+        """
+        Refresh the cached TRACE enabled flag of all LoggedObject classes.
+        """
+        for clz in list(LoggedObject._classes):
+            clz._trace_enabled = clz.logger.isEnabledFor(TRACE)
+
+    def __new__(cls, *args, **kwargs):
+        if cls._trace_enabled:
+            cls.logger.trace("Instantiating %s.%s", cls.__module__, cls.__qualname__)
         return super(LoggedObject, cls).__new__(cls)
 
     def __enter__(self):
-        self.logger.trace(
-            "Entering context for %s.%s", self.__module__, self.__class__.__qualname__
-        )
+        if self._trace_enabled:
+            self.logger.trace(
+                "Entering context for %s.%s",
+                self.__module__,
+                self.__class__.__qualname__,
+            )
         return super(LoggedObject, self).__enter__()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.logger.trace(
-            "Exiting context for %s.%s", self.__module__, self.__class__.__qualname__
-        )
+        if self._trace_enabled:
+            self.logger.trace(
+                "Exiting context for %s.%s",
+                self.__module__,
+                self.__class__.__qualname__,
+            )
         super(LoggedObject, self).__exit__(exc_type, exc_val, exc_tb)
+
+
+LoggedObject._setup_logger()
@@ -0,0 +1,283 @@
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+from logging import Filter, LoggerAdapter
+from threading import Lock
+from time import monotonic
+
+SUPPRESSED_SUFFIX = " (suppressed {} similar messages)"
+
+
+def _message(msg, args):
+    msg = str(msg)
+    if args:
+        try:
+            msg = msg % args
+        except (TypeError, ValueError, KeyError):
+            # logging leaves bad calls to Handler.handleError, filters must
+            # not raise out of the logging call instead
+            msg = "{} {!r}".format(msg, args)
+    return msg
+
+
+def annotate(record, suppressed):
+    """
+    Append a "suppressed N similar messages" summary to the message of a
+    record, and set its `suppressed` attribute for formatters.
+    """
+    record.msg = _message(record.msg, record.args) + SUPPRESSED_SUFFIX.format(
+        suppressed
+    )
+    record.args = None
+    record.suppressed = suppressed
+
+
+class KeyedFilter(Filter, metaclass=ABCMeta):
+    """
+    Base class of filters keeping a state per key of the records they see,
+    in a dict bounded to `max_keys` entries by evicting the least recently
+    seen key. Deciding on a record is a constant time lookup, under a lock as
+    filters attached to loggers are called concurrently.
+
+    Records whose logger is outside of `name`, as for logging.Filter, pass
+    untouched. A record passed after others of its key were dropped carries
+    a "suppressed N similar messages" summary.
+
+    Subclasses implement `admit`, and `key` if records are not keyed by
+    logger and message template.
+
+    :param name: Only apply to records of this logger and its children.
+    :param max_keys: Maximum number of keys tracked.
+    """
+
+    def __init__(self, name="", max_keys=1024):
+        super(KeyedFilter, self).__init__(name)
+        if max_keys < 1:
+            raise ValueError("max_keys must be at least 1")
+        self.max_keys = max_keys
+        self.suppressed = 0
+        self.evictions = 0
+        self._keys = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def applies(self, name):
+        """
+        Whether records of a logger are subject to this filter.
+
+        :rtype: bool
+        """
+        return (
+            not self.nlen
+            or name == self.name
+            or (name.startswith(self.name) and name[self.nlen] == ".")
+        )
+
+    # noinspection PyUnusedLocal
+    def key(self, name, levelno, msg, args):
+        """
+        Return the key records are tracked by, the logger and the message
+        template by default.
+        """
+        return name, msg if isinstance(msg, str) else str(msg)
+
+    def _track(self, key, state):
+        # called with the lock held
+        keys = self._keys
+        keys[key] = state
+        if len(keys) > self.max_keys:
+            keys.popitem(last=False)
+            self.evictions += 1
+
+    @abstractmethod
+    def admit(self, key):
+        """
+        Decide on a record of key.
+
+        :return: None if the record is to be dropped, else the number of
+                records of key dropped since the last one admitted.
+        :rtype: int or None
+        """
+
+    def filter(self, record):
+        if not self.applies(record.name):
+            return True
+        suppressed = self.admit(
+            self.key(record.name, record.levelno, record.msg, record.args)
+        )
+        if suppressed is None:
+            return False
+        if suppressed:
+            annotate(record, suppressed)
+        return True
+
+    def reset(self):
+        """
+        Forget all keys tracked.
+        """
+        with self._lock:
+            self._keys.clear()
+
+
+class RateLimitFilter(KeyedFilter):
+    """
+    Limits records per logger and message template with a token bucket:
+    up to `burst` records pass at once, then `rate` records per second.
+
+    >>> handler.addFilter(RateLimitFilter(rate=1, burst=5))
+
+    :param rate: Records per second allowed per key, once the burst is spent.
+    :param burst: Records allowed at once per key.
+    :param clock: Clock returning seconds.
+    """
+
+    def __init__(self, rate=1.0, burst=10, name="", max_keys=1024, clock=monotonic):
+        super(RateLimitFilter, self).__init__(name, max_keys)
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._clock = clock
+
+    def admit(self, key):
+        now = self._clock()
+        with self._lock:
+            # state: [tokens, last refill, suppressed]
+            state = self._keys.get(key)
+            if state is None:
+                self._track(key, [self.burst - 1, now, 0])
+                return 0
+            self._keys.move_to_end(key)
+            tokens = min(self.burst, state[0] + (now - state[1]) * self.rate)
+            state[1] = now
+            if tokens < 1:
+                state[0] = tokens
+                state[2] += 1
+                self.suppressed += 1
+                return None
+            state[0] = tokens - 1
+            suppressed, state[2] = state[2], 0
+            return suppressed
+
+
+class SamplingFilter(KeyedFilter):
+    """
+    Passes one in every `n` records per logger and message template,
+    starting with the first.
+
+    :param n: Sampling interval.
+    :param per_key: Count records per key, else across all records.
+    """
+
+    def __init__(self, n=100, per_key=True, name="", max_keys=1024):
+        super(SamplingFilter, self).__init__(name, max_keys)
+        if n < 1:
+            raise ValueError("n must be at least 1")
+        self.n = n
+        self.per_key = per_key
+
+    def key(self, name, levelno, msg, args):
+        if not self.per_key:
+            return None
+        return super(SamplingFilter, self).key(name, levelno, msg, args)
+
+    def admit(self, key):
+        with self._lock:
+            # state: [records seen since the last one admitted]
+            state = self._keys.get(key)
+            if state is None:
+                self._track(key, [0])
+                return 0
+            self._keys.move_to_end(key)
+            if state[0] + 1 < self.n:
+                state[0] += 1
+                self.suppressed += 1
+                return None
+            suppressed, state[0] = state[0], 0
+            return suppressed
+
+
+class DuplicateFilter(KeyedFilter):
+    """
+    Drops records repeating the message and level of a record of the same
+    logger passed less than `interval` seconds before. The first repeat
+    after the interval passes, with a summary of the repeats dropped.
+
+    Unlike the other filters, records are keyed by their formatted message.
+
+    :param interval: Seconds during which repeats are dropped.
+    :param clock: Clock returning seconds.
+    """
+
+    def __init__(self, interval=60.0, name="", max_keys=1024, clock=monotonic):
+        super(DuplicateFilter, self).__init__(name, max_keys)
+        self.interval = interval
+        self._clock = clock
+
+    def key(self, name, levelno, msg, args):
+        return name, levelno, _message(msg, args)
+
+    def admit(self, key):
+        now = self._clock()
+        with self._lock:
+            # state: [time last admitted, suppressed]
+            state = self._keys.get(key)
+            if state is None:
+                self._track(key, [now, 0])
+                return 0
+            self._keys.move_to_end(key)
+            if now - state[0] < self.interval:
+                state[1] += 1
+                self.suppressed += 1
+                return None
+            state[0] = now
+            suppressed, state[1] = state[1], 0
+            return suppressed
+
+
+class ThrottledLoggerAdapter(LoggerAdapter):
+    """
+    A LoggerAdapter applying KeyedFilters before a record is created, so that
+    records dropped in a hot loop cost a lookup rather than a LogRecord and
+    a pass through the logger and handler locks.
+
+    >>> log = ThrottledLoggerAdapter(logger, RateLimitFilter(rate=1))
+    >>> for item in items:
+    ...     log.warning("Failed to process item %s", item)
+
+    Filters are applied in order as a short-circuiting chain, as logging
+    applies the filters of loggers and handlers: a record dropped by a filter
+    is not seen by the filters after it, while the filters before it have
+    already counted it as admitted, eg: spent a token of a RateLimitFilter.
+    Suppressed counts are therefore per filter. Put the filter dropping the
+    most records first.
+
+    :param logger: Logger to log to.
+    :param filters: KeyedFilters to apply, in order.
+    :param extra: Extra attributes for records, as for LoggerAdapter.
+    """
+
+    def __init__(self, logger, *filters, extra=None):
+        super(ThrottledLoggerAdapter, self).__init__(logger, extra or {})
+        self.filters = [f for f in filters if f.applies(logger.name)]
+
+    def log(self, level, msg, *args, **kwargs):
+        if not self.isEnabledFor(level):
+            return
+        name = self.logger.name
+        suppressed = 0
+        for f in self.filters:
+            dropped = f.admit(f.key(name, level, msg, args))
+            if dropped is None:
+                return
+            suppressed = max(suppressed, dropped)
+        if suppressed:
+            # without arguments the message is not formatted again
+            msg, args = _message(msg, args) + SUPPRESSED_SUFFIX.format(suppressed), ()
+        msg, kwargs = self.process(msg, kwargs)
+        # attribute records to the caller of the adapter, not to this method
+        kwargs["stacklevel"] = kwargs.get("stacklevel", 1) + 1
+        self.logger.log(level, msg, *args, **kwargs)
@@ -0,0 +1,261 @@
+from enum import Enum
+from logging import FileHandler, Formatter, StreamHandler
+from logging.handlers import QueueHandler, QueueListener
+from queue import Empty, Full, Queue
+from threading import Lock
+from time import sleep
+
+_formatter = Formatter()
+
+
+class OverflowPolicy(Enum):
+    """
+    What to do with a record when the logging queue is full.
+    """
+
+    # wait for the listener to make room, optionally up to a timeout
+    BLOCK = "block"
+    # discard the oldest queued record to make room for the new one
+    DROP_OLDEST = "drop_oldest"
+    # discard the new record
+    DROP = "drop"
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    A QueueHandler for a bounded queue, applying an OverflowPolicy when the
+    queue is full and counting the records dropped.
+
+    :param timeout: Seconds to wait for room with OverflowPolicy.BLOCK before
+            dropping the record, None to wait forever.
+    """
+
+    def __init__(self, queue, overflow=OverflowPolicy.BLOCK, timeout=None):
+        super(BoundedQueueHandler, self).__init__(queue)
+        self.overflow = OverflowPolicy(overflow)
+        self.timeout = timeout
+        self.dropped = 0
+        self._dropped_lock = Lock()
+
+    def prepare(self, record):
+        """
+        Return a shallow copy of the record safe to pass to another thread,
+        with the message merged with its arguments and exception information
+        rendered as text. Unlike QueueHandler.prepare the record is not
+        formatted, so that each handler applies its own formatter.
+        """
+        prepared = record.__class__.__new__(record.__class__)
+        prepared.__dict__.update(record.__dict__)
+        prepared.msg = record.getMessage()
+        prepared.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                prepared.exc_text = _formatter.formatException(record.exc_info)
+            prepared.exc_info = None
+        return prepared
+
+    def _drop(self):
+        with self._dropped_lock:
+            self.dropped += 1
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+            return
+        except Full:
+            pass
+
+        if self.overflow is OverflowPolicy.BLOCK:
+            try:
+                self.queue.put(record, timeout=self.timeout)
+            except Full:
+                self._drop()
+        elif self.overflow is OverflowPolicy.DROP:
+            self._drop()
+        else:
+            while True:
+                try:
+                    oldest = self.queue.get_nowait()
+                except Empty:
+                    pass
+                else:
+                    if oldest is BatchingQueueListener._sentinel:
+                        # never drop the stop request of the listener
+                        self.queue.put(oldest)
+                        self._drop()
+                        return
+                    self.queue.task_done()
+                    self._drop()
+                try:
+                    self.queue.put_nowait(record)
+                    return
+                except Full:
+                    continue
+
+
+class BatchingQueueListener(QueueListener):
+    """
+    A QueueListener handling records in batches of up to `batch_size`. After
+    the first record of a batch arrives, the listener waits `linger` seconds
+    for more, trading latency for fewer, larger writes and fewer wake ups
+    competing with the logging threads. Records for plain StreamHandlers and
+    FileHandlers are formatted and written with a single write and flush per
+    batch, other handlers receive the records one at a time. Handler levels
+    are always respected.
+    """
+
+    def __init__(self, queue, *handlers, batch_size=256, linger=0.005):
+        super(BatchingQueueListener, self).__init__(
+            queue, *handlers, respect_handler_level=True
+        )
+        self.batch_size = batch_size
+        self.linger = linger
+        self.processed = 0
+        self.batches = 0
+
+    def enqueue_sentinel(self):
+        # the queue may be full, wait for room
+        self.queue.put(self._sentinel)
+
+    def _monitor(self):
+        q = self.queue
+        sentinel = self._sentinel
+        while True:
+            batch = [self.dequeue(True)]
+            if self.linger and batch[0] is not sentinel:
+                sleep(self.linger)
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except Empty:
+                    break
+
+            stop = sentinel in batch
+            records = [record for record in batch if record is not sentinel]
+            if records:
+                self.handle_batch(records)
+            for _ in batch:
+                q.task_done()
+            if stop:
+                break
+
+    def handle_batch(self, records):
+        """
+        Pass a batch of records to all handlers.
+        """
+        records = [self.prepare(record) for record in records]
+        for handler in self.handlers:
+            if type(handler) in (StreamHandler, FileHandler):
+                self._write_batch(handler, records)
+            else:
+                for record in records:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+        self.processed += len(records)
+        self.batches += 1
+
+    @staticmethod
+    def _write_batch(handler, records):
+        lines = []
+        for record in records:
+            if record.levelno >= handler.level and handler.filter(record):
+                try:
+                    lines.append(handler.format(record) + handler.terminator)
+                except Exception:
+                    handler.handleError(record)
+        if not lines:
+            return
+
+        handler.acquire()
+        try:
+            if handler.stream is None and isinstance(handler, FileHandler):
+                # FileHandler opened with delay
+                handler.stream = handler._open()
+            handler.stream.write("".join(lines))
+            handler.flush()
+        except Exception:
+            handler.handleError(records[-1])
+        finally:
+            handler.release()
+
+
+class QueuedLogging(object):
+    """
+    Moves the I/O of a set of handlers to a background thread. Records are
+    put on a bounded queue by a BoundedQueueHandler on the calling thread and
+    passed to the handlers in batches by a BatchingQueueListener.
+
+    :param handlers: Handlers to call from the background thread.
+    :param maxsize: Capacity of the queue in records.
+    :param overflow: OverflowPolicy, or its value, applied when the queue is
+            full.
+    :param timeout: Seconds to wait with OverflowPolicy.BLOCK, None to wait
+            forever.
+    :param batch_size: Maximum number of records handled at once.
+    """
+
+    def __init__(
+        self,
+        handlers,
+        maxsize=10000,
+        overflow=OverflowPolicy.BLOCK,
+        timeout=None,
+        batch_size=256,
+    ):
+        self.queue = Queue(maxsize)
+        self.handlers = list(handlers)
+        self.handler = BoundedQueueHandler(self.queue, overflow, timeout)
+        self.listener = BatchingQueueListener(
+            self.queue, *self.handlers, batch_size=batch_size
+        )
+        self._running = False
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        if not self._running:
+            self.listener.start()
+            self._running = True
+
+    def stop(self):
+        """
+        Stop the background thread once all queued records were handled, and
+        flush the handlers.
+        """
+        if self._running:
+            self.listener.stop()
+            self._running = False
+        for handler in self.handlers:
+            handler.flush()
+
+    @property
+    def depth(self):
+        """
+        Approximate number of queued records.
+
+        :rtype: int
+        """
+        return self.queue.qsize()
+
+    @property
+    def dropped(self):
+        """
+        Number of records dropped because the queue was full.
+
+        :rtype: int
+        """
+        return self.handler.dropped
+
+    def metrics(self):
+        """
+        :rtype: dict
+        """
+        return {
+            "depth": self.depth,
+            "capacity": self.queue.maxsize,
+            "dropped": self.dropped,
+            "processed": self.listener.processed,
+            "batches": self.listener.batches,
+        }
@@ -0,0 +1,457 @@
+import logging
+from bisect import bisect_left
+from functools import wraps
+from threading import Event, Lock, RLock, Thread, local
+from time import perf_counter_ns
+from weakref import finalize, ref
+
+from cafeteria.logging.trace import TRACE
+from cafeteria.patterns.mixins import ContextMixin
+
+logger = logging.getLogger(__name__)
+
+
+class _State(object):
+    __slots__ = ("enabled",)
+
+    def __init__(self):
+        self.enabled = False
+
+
+_state = _State()
+
+
+def enable():
+    """
+    Start recording durations measured with `timed`.
+    """
+    _state.enabled = True
+
+
+def disable():
+    """
+    Stop recording durations; `timed` then only costs a flag check.
+    """
+    _state.enabled = False
+
+
+def is_enabled():
+    return _state.enabled
+
+
+class _Shard(object):
+    __slots__ = ("counts", "total")
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+
+    def merge_into(self, counts, total):
+        for index, value in dict(self.counts).items():
+            counts[index] = counts.get(index, 0) + value
+        return total + self.total
+
+
+class _Owner(object):
+    # held only by the thread local storage of a thread recording to a
+    # histogram, so that it is collected when the thread ends
+    __slots__ = ("__weakref__",)
+
+
+def _retire(histogram_ref, shard):
+    histogram = histogram_ref()
+    if histogram is not None:
+        histogram._retire(shard)
+
+
+class HistogramSnapshot(object):
+    """
+    An immutable view of the values recorded by a Histogram over an interval.
+    Quantiles are approximate, within the relative precision of the
+    histogram.
+    """
+
+    __slots__ = ("name", "count", "total", "_bounds", "_cumulative", "_histogram")
+
+    def __init__(self, histogram, counts, total):
+        self.name = histogram.name
+        self.total = total
+        self._histogram = histogram
+        self._bounds = []
+        self._cumulative = []
+        running = 0
+        for index in sorted(index for index, value in counts.items() if value):
+            running += counts[index]
+            self._bounds.append(index)
+            self._cumulative.append(running)
+        # counted from the buckets, shards are read without locking
+        self.count = running
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def min(self):
+        return self._histogram.value_at(self._bounds[0]) if self.count else 0
+
+    @property
+    def max(self):
+        return self._histogram.value_at(self._bounds[-1]) if self.count else 0
+
+    def quantile(self, q):
+        """
+        Return the value at quantile q (0 to 1), or 0 if nothing was recorded.
+        """
+        if not 0 <= q <= 1:
+            raise ValueError("quantile must be between 0 and 1")
+        if not self.count:
+            return 0
+        rank = max(1, int(q * self.count + 0.5))
+        position = bisect_left(self._cumulative, rank)
+        return self._histogram.value_at(self._bounds[position])
+
+    @property
+    def p50(self):
+        return self.quantile(0.5)
+
+    @property
+    def p99(self):
+        return self.quantile(0.99)
+
+    @property
+    def p999(self):
+        return self.quantile(0.999)
+
+    def __repr__(self):
+        return "{}({!r}, count={}, p50={}, p99={}, p999={})".format(
+            self.__class__.__name__,
+            self.name,
+            self.count,
+            self.p50,
+            self.p99,
+            self.p999,
+        )
+
+
+class Histogram(object):
+    """
+    A log-linear histogram of non negative integers, in the style of
+    HdrHistogram: each power of two range is split into 2 ** precision_bits
+    linear buckets, bounding the relative error of recorded values to
+    2 ** -precision_bits regardless of their magnitude.
+
+    Each thread records into its own shard, so `record` takes no lock.
+    Snapshots merge the shards. Shards of threads that ended are merged into
+    a shared one and dropped. `reset` does not touch the shards, it makes
+    later snapshots report only values recorded since, so concurrent records
+    are never lost.
+
+    :param name: Name reported in snapshots.
+    :param precision_bits: Number of bits of linear precision per power of two.
+    """
+
+    def __init__(self, name=None, precision_bits=5):
+        self.name = name
+        self.precision_bits = precision_bits
+        self._local = local()
+        self._shards = []
+        # values recorded by threads that ended
+        self._retired = _Shard()
+        # reentrant, shards may be retired by the garbage collector while
+        # the lock is held
+        self._lock = RLock()
+        self._baseline = ({}, 0)
+
+    def index_of(self, value):
+        """
+        Return the bucket index of value.
+
+        :type value: int
+        :rtype: int
+        """
+        shift = value.bit_length() - self.precision_bits - 1
+        if shift <= 0:
+            return value
+        return (shift << self.precision_bits) + (value >> shift)
+
+    def value_at(self, index):
+        """
+        Return the value representing a bucket, its midpoint.
+
+        :type index: int
+        :rtype: int
+        """
+        shift = (index >> self.precision_bits) - 1
+        if shift <= 0:
+            return index
+        return ((index - (shift << self.precision_bits)) << shift) + (1 << (shift - 1))
+
+    def _register(self):
+        shard = self._local.shard = _Shard()
+        owner = self._local.owner = _Owner()
+        with self._lock:
+            self._shards.append(shard)
+        finalize(owner, _retire, ref(self), shard)
+        return shard
+
+    def _retire(self, shard):
+        with self._lock:
+            retired = self._retired
+            retired.total = shard.merge_into(retired.counts, retired.total)
+            self._shards.remove(shard)
+
+    def record(self, value):
+        """
+        Record a non negative integer value.
+        """
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._register()
+        shift = value.bit_length() - self.precision_bits - 1
+        index = (
+            value if shift <= 0 else (shift << self.precision_bits) + (value >> shift)
+        )
+        counts = shard.counts
+        counts[index] = counts.get(index, 0) + 1
+        shard.total += value
+
+    def snapshot(self, reset=False):
+        """
+        Return the values recorded since the last reset, optionally resetting.
+
+        :rtype: HistogramSnapshot
+        """
+        with self._lock:
+            counts, total = dict(self._retired.counts), self._retired.total
+            for shard in list(self._shards):
+                total = shard.merge_into(counts, total)
+            base_counts, base_total = self._baseline
+            if reset:
+                self._baseline = counts, total
+        delta = {
+            index: value - base_counts.get(index, 0) for index, value in counts.items()
+        }
+        return HistogramSnapshot(self, delta, total - base_total)
+
+    def reset(self):
+        """
+        Discard the values recorded so far from later snapshots.
+        """
+        self.snapshot(reset=True)
+
+
+class TimingRegistry(object):
+    """
+    Histograms of durations in nanoseconds, by name.
+    """
+
+    def __init__(self, precision_bits=5):
+        self.precision_bits = precision_bits
+        self.null_timers = {}
+        self._histograms = {}
+        self._lock = Lock()
+
+    def histogram(self, name):
+        """
+        Return the histogram of name, creating it if needed.
+
+        :rtype: Histogram
+        """
+        try:
+            return self._histograms[name]
+        except KeyError:
+            with self._lock:
+                if name not in self._histograms:
+                    self._histograms[name] = Histogram(name, self.precision_bits)
+                return self._histograms[name]
+
+    def names(self):
+        return sorted(self._histograms)
+
+    def snapshot(self, reset=False):
+        """
+        Return a snapshot of every histogram, by name.
+
+        :rtype: dict
+        """
+        return {
+            name: histogram.snapshot(reset)
+            for name, histogram in list(self._histograms.items())
+        }
+
+    def reset(self):
+        for histogram in list(self._histograms.values()):
+            histogram.reset()
+
+
+registry = TimingRegistry()
+
+
+def _decorate(histogram, func):
+    record = histogram.record
+    state = _state
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not state.enabled:
+            return func(*args, **kwargs)
+        start = perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record(perf_counter_ns() - start)
+
+    return wrapper
+
+
+class Timer(object):
+    """
+    Measures a block into a histogram; returned by `timed` while timing is
+    enabled.
+    """
+
+    __slots__ = ("histogram", "_start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self._start = None
+
+    def __call__(self, func):
+        return _decorate(self.histogram, func)
+
+    def __enter__(self):
+        self._start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.histogram.record(perf_counter_ns() - self._start)
+
+
+class NullTimer(object):
+    """
+    Measures nothing; returned by `timed` while timing is disabled. Used as
+    a decorator it still returns a timing wrapper, so that functions
+    decorated while timing is disabled are measured once it is enabled.
+    """
+
+    __slots__ = ("histogram",)
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __call__(self, func):
+        return _decorate(self.histogram, func)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+def timed(name, registry=registry):
+    """
+    Measure the duration of a block or of calls to a function into the
+    histogram `name` of a TimingRegistry, while timing is enabled.
+
+    >>> @timed("db.query")
+    ... def query(sql): ...
+    >>> with timed("render"):
+    ...     render()
+
+    While timing is disabled a shared NullTimer is returned, and decorated
+    functions only check a flag, so instrumentation costs next to nothing.
+
+    :rtype: Timer or NullTimer
+    """
+    if _state.enabled:
+        return Timer(registry.histogram(name))
+    try:
+        return registry.null_timers[name]
+    except KeyError:
+        timer = registry.null_timers[name] = NullTimer(registry.histogram(name))
+        return timer
+
+
+class TimingEmitter(ContextMixin):
+    """
+    Periodically logs a summary line per histogram of a TimingRegistry and
+    resets them, from a background thread.
+
+    :param interval: Seconds between summaries.
+    :param level: Level to log at, TRACE or DEBUG typically.
+    :param log: Logger to log to, defaults to the logger of this module.
+    :param reset: Reset the histograms after each summary, so that each
+            summary covers one interval.
+    """
+
+    def __init__(
+        self, registry=registry, interval=60.0, level=TRACE, log=None, reset=True
+    ):
+        self.registry = registry
+        self.interval = interval
+        self.level = level
+        self.logger = log or logger
+        self.reset = reset
+        self._stop = Event()
+        self._thread = None
+
+    def emit(self):
+        """
+        Log a summary of each histogram with values recorded.
+
+        :return: The snapshots logged, by name.
+        :rtype: dict
+        """
+        snapshots = self.registry.snapshot(self.reset)
+        if self.logger.isEnabledFor(self.level):
+            for name, snapshot in sorted(snapshots.items()):
+                if snapshot.count:
+                    self.logger.log(
+                        self.level,
+                        "%s count=%d mean=%.1fus p50=%.1fus p99=%.1fus "
+                        "p999=%.1fus max=%.1fus",
+                        name,
+                        snapshot.count,
+                        snapshot.mean / 1e3,
+                        snapshot.p50 / 1e3,
+                        snapshot.p99 / 1e3,
+                        snapshot.p999 / 1e3,
+                        snapshot.max / 1e3,
+                    )
+        return snapshots
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.emit()
+            except Exception:
+                logger.exception("Failed to emit timing summaries")
+
+    def start(self):
+        """
+        Start emitting on a background daemon thread.
+        """
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = Thread(target=self._run, name="TimingEmitter", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background thread.
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return super(TimingEmitter, self).__enter__()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        super(TimingEmitter, self).__exit__(exc_type, exc_val, exc_tb)
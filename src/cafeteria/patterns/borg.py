@@ -1,3 +1,6 @@
+from threading import Lock, RLock
+
+
 class BorgStateManager(object):
     """
     A special State Manager for Borg classes and child classes. This is what
@@ -8,9 +11,15 @@ class BorgStateManager(object):
     shared state.
 
     Each class state is mapped to the the hash of the class itself.
+
+    Retrieving an existing class state takes no lock. First time
+    initialisation is serialised using a lock selected by the hash of the
+    class from a fixed set of locks, so that concurrent first instantiations of
+    a class share a single state while other classes are not blocked.
     """
 
     __shared_state = {}
+    __locks = tuple(RLock() for _ in range(16))
 
     def __init__(self):
         self.__dict__ = self.__shared_state
@@ -24,11 +33,17 @@ class BorgStateManager(object):
         :return: Class state.
         :rtype: dict
         """
-        if clz not in cls.__shared_state:
-            cls.__shared_state[clz] = (
-                clz.init_state() if hasattr(clz, "init_state") else {}
-            )
-        return cls.__shared_state[clz]
+        try:
+            return cls.__shared_state[clz]
+        except KeyError:
+            pass
+
+        with cls.__locks[hash(clz) % len(cls.__locks)]:
+            if clz not in cls.__shared_state:
+                cls.__shared_state[clz] = (
+                    clz.init_state() if hasattr(clz, "init_state") else {}
+                )
+            return cls.__shared_state[clz]
 
 
 class Borg(object):
@@ -51,3 +66,87 @@ class Borg(object):
     @property
     def _shared_state(self):
         return BorgStateManager.get_state(self.__class__)
+
+
+class SnapshotState(object):
+    """
+    Copy-on-write state holder used by SnapshotBorg. `current` is never
+    modified in place; writers serialise on `lock`, modify a copy and publish
+    it by replacing `current`.
+    """
+
+    __slots__ = ("current", "lock")
+
+    def __init__(self, initial=None):
+        self.current = dict(initial or {})
+        self.lock = Lock()
+
+    def write(self, func):
+        """
+        Apply func to a copy of the current state and publish the copy.
+
+        :param func: Callable modifying the dict it is given.
+        :return: The return value of func.
+        """
+        with self.lock:
+            state = dict(self.current)
+            result = func(state)
+            self.current = state
+            return result
+
+
+class SnapshotBorg(Borg):
+    """
+    A Borg whose shared state is updated copy-on-write. Readers access the
+    latest published snapshot without locking and never wait on writers,
+    writers copy the state on every change. This suits state that is read far
+    more often than it is written.
+
+    Unlike Borg, class attributes, such as methods and properties, take
+    precedence over state attributes of the same name, which remain
+    accessible through `snapshot`.
+    """
+
+    def __init__(self):
+        object.__setattr__(
+            self, "_snapshot_state", BorgStateManager.get_state(type(self))
+        )
+
+    @classmethod
+    def init_state(cls):
+        return SnapshotState()
+
+    @property
+    def snapshot(self):
+        """
+        The current state. Treat the returned dict as read only; it is
+        consistent, but does not reflect later changes.
+
+        :rtype: dict
+        """
+        return object.__getattribute__(self, "_snapshot_state").current
+
+    def _write(self, func):
+        return object.__getattribute__(self, "_snapshot_state").write(func)
+
+    def update(self, *args, **kwargs):
+        """
+        Update multiple attributes in a single atomic change.
+        """
+        self._write(lambda state: state.update(*args, **kwargs))
+
+    def __getattr__(self, item):
+        # only called for names that are not attributes of the class
+        try:
+            return object.__getattribute__(self, "_snapshot_state").current[item]
+        except KeyError:
+            raise AttributeError(item)
+
+    def __setattr__(self, key, value):
+        self._write(lambda state: state.__setitem__(key, value))
+
+    def __delattr__(self, item):
+        try:
+            self._write(lambda state: state.__delitem__(item))
+        except KeyError:
+            raise AttributeError(item)
@@ -1,3 +1,15 @@
+import logging
+from asyncio import CancelledError, ensure_future, gather, get_running_loop
+from collections import deque, namedtuple
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from inspect import isawaitable
+from threading import Condition, local
+from time import monotonic
+
+logger = logging.getLogger(__name__)
+
+
 class SessionManager(object):
     def __init__(self, factory, *args, **kwargs):
         self._kwargs = kwargs
@@ -20,3 +32,798 @@ class SessionManager(object):
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
+
+
+PoolStats = namedtuple(
+    "PoolStats",
+    (
+        "size",
+        "idle",
+        "in_use",
+        "waiting",
+        "checkouts",
+        "creations",
+        "evictions",
+        "validation_failures",
+        "timeouts",
+        "wait_time",
+        "max_wait_time",
+    ),
+)
+PoolStats.__doc__ = """
+Point in time statistics of a SessionPool. `wait_time` is the total and
+`max_wait_time` the longest time in seconds spent in checkout, including
+session creation, validation and checkouts that timed out.
+"""
+
+
+class _PooledSession(object):
+    __slots__ = ("session", "created", "last_used")
+
+    def __init__(self, session, created):
+        self.session = session
+        self.created = created
+        self.last_used = created
+
+
+class SessionPool(object):
+    """
+    A thread safe, bounded pool of sessions created by `factory`, for use in
+    place of a SessionManager when creating a session per use is too costly.
+
+    Sessions are checked out with `acquire` and returned with `release`, or
+    more conveniently using the pool as a context manager, like a
+    SessionManager, or with `session()`.
+
+    >>> pool = SessionPool(connect, dsn, max_size=8, timeout=5)
+    >>> with pool as session:
+    ...     session.execute(query)
+
+    Idle sessions are reused most recently used first. Sessions idle for longer
+    than `idle_timeout` are closed, keeping at least `min_size` sessions, and
+    sessions older than `max_lifetime` are closed instead of being reused.
+    Expired sessions are closed lazily on checkout or eagerly by calling
+    `maintain` (eg: from a timer), which also tops the pool up to `min_size`.
+
+    :param factory: Callable creating a session, called with args and kwargs.
+    :param min_size: Number of sessions created up front and kept on idle
+            eviction.
+    :param max_size: Maximum number of sessions, idle or in use.
+    :param timeout: Default seconds to wait in checkout for a session to
+            become available, None to wait forever.
+    :param idle_timeout: Seconds after which an idle session is closed, None
+            to keep idle sessions.
+    :param max_lifetime: Seconds after creation after which a session is
+            recycled, None to never recycle.
+    :param validate: Callable called with a session on checkout, returning
+            whether the idle session is still usable. Unusable sessions are
+            closed and another one is checked out.
+    :param clock: Monotonic clock returning seconds.
+    """
+
+    def __init__(
+        self,
+        factory,
+        *args,
+        min_size=0,
+        max_size=10,
+        timeout=None,
+        idle_timeout=None,
+        max_lifetime=None,
+        validate=None,
+        clock=monotonic,
+        **kwargs
+    ):
+        if max_size < 1 or not 0 <= min_size <= max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size")
+        self._factory = factory
+        self._args = args
+        self._kwargs = kwargs
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.validate = validate
+        self._clock = clock
+
+        self._condition = Condition()
+        self._idle = deque()
+        self._checked_out = {}
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+        self._local = local()
+
+        self._checkouts = 0
+        self._creations = 0
+        self._evictions = 0
+        self._validation_failures = 0
+        self._timeouts = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+
+        self.maintain()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    @property
+    def stats(self):
+        """
+        :rtype: PoolStats
+        """
+        with self._condition:
+            return PoolStats(
+                size=self._size,
+                idle=len(self._idle),
+                in_use=len(self._checked_out),
+                waiting=self._waiting,
+                checkouts=self._checkouts,
+                creations=self._creations,
+                evictions=self._evictions,
+                validation_failures=self._validation_failures,
+                timeouts=self._timeouts,
+                wait_time=self._wait_time,
+                max_wait_time=self._max_wait_time,
+            )
+
+    def _expired(self, entry, now):
+        return (
+            self.max_lifetime is not None and now - entry.created >= self.max_lifetime
+        )
+
+    def _evict_idle(self, now, recycle=False):
+        """
+        Remove idle sessions idle for longer than the idle timeout, and if
+        recycle is set those older than the maximum lifetime. Must be called
+        with the condition held; the returned sessions must be closed after
+        releasing it.
+        """
+        idle, evicted = self._idle, []
+        if self.idle_timeout is not None:
+            horizon = now - self.idle_timeout
+            # least recently used sessions are on the left
+            while idle and idle[0].last_used <= horizon and self._size > self.min_size:
+                evicted.append(idle.popleft().session)
+                self._size -= 1
+        if recycle and self.max_lifetime is not None:
+            for entry in [entry for entry in idle if self._expired(entry, now)]:
+                idle.remove(entry)
+                evicted.append(entry.session)
+                self._size -= 1
+        if evicted:
+            self._evictions += len(evicted)
+            self._condition.notify(len(evicted))
+        return evicted
+
+    @staticmethod
+    def _close_all(sessions):
+        for session in sessions:
+            try:
+                session.close()
+            except Exception:
+                logger.exception("Failed to close session %r", session)
+
+    def _create(self):
+        """
+        Create a session for a slot already reserved in the pool size.
+        """
+        try:
+            session = self._factory(*self._args, **self._kwargs)
+        except BaseException:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        return _PooledSession(session, self._clock())
+
+    def maintain(self):
+        """
+        Close expired idle sessions and create sessions until the pool holds
+        at least `min_size` sessions.
+        """
+        with self._condition:
+            evicted = self._evict_idle(self._clock(), recycle=True)
+            missing = 0 if self._closed else max(0, self.min_size - self._size)
+            self._size += missing
+        self._close_all(evicted)
+
+        attempted = 0
+        try:
+            while attempted < missing:
+                attempted += 1
+                entry = self._create()
+                with self._condition:
+                    self._creations += 1
+                    closed = self._closed
+                    if closed:
+                        self._size -= 1
+                    else:
+                        self._idle.append(entry)
+                        self._condition.notify()
+                if closed:
+                    self._close_all((entry.session,))
+        finally:
+            # a failed creation releases its own slot, give back the slots
+            # reserved for the sessions not attempted
+            unused = missing - attempted
+            if unused:
+                with self._condition:
+                    self._size -= unused
+                    self._condition.notify(unused)
+
+    def _checkout(self, start, deadline):
+        """
+        Take an idle session or reserve a slot for a new one, waiting until
+        the deadline if the pool is exhausted.
+
+        :return: A tuple of an idle entry or None, and sessions to close.
+        """
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Session pool is closed")
+                now = self._clock()
+                evicted = self._evict_idle(now)
+                while self._idle:
+                    entry = self._idle.pop()
+                    if not self._expired(entry, now):
+                        return entry, evicted
+                    self._size -= 1
+                    self._evictions += 1
+                    evicted.append(entry.session)
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, evicted
+
+                remaining = None
+                if deadline is not None:
+                    now = self._clock()
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        self._record_wait(now - start)
+                        raise TimeoutError(
+                            "Timed out waiting for a session, {} in use".format(
+                                len(self._checked_out)
+                            )
+                        )
+                self._waiting += 1
+                try:
+                    self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+    def acquire(self, timeout=-1):
+        """
+        Check out a session, waiting for one to become available if the pool
+        is exhausted.
+
+        :param timeout: Seconds to wait, None to wait forever, defaults to the
+                pool timeout.
+        :raises: TimeoutError if no session became available in time,
+                RuntimeError if the pool is closed.
+        """
+        if timeout == -1:
+            timeout = self.timeout
+        start = self._clock()
+        deadline = None if timeout is None else start + timeout
+
+        while True:
+            entry, evicted = self._checkout(start, deadline)
+            self._close_all(evicted)
+            if entry is None:
+                entry = self._create()
+                with self._condition:
+                    self._creations += 1
+            elif self.validate is not None and not self._valid(entry.session):
+                with self._condition:
+                    self._size -= 1
+                    self._evictions += 1
+                    self._validation_failures += 1
+                    self._condition.notify()
+                self._close_all((entry.session,))
+                continue
+
+            with self._condition:
+                self._checkouts += 1
+                self._record_wait(self._clock() - start)
+                self._checked_out[id(entry.session)] = entry
+            return entry.session
+
+    def _record_wait(self, waited):
+        self._wait_time += waited
+        self._max_wait_time = max(self._max_wait_time, waited)
+
+    def _valid(self, session):
+        try:
+            return self.validate(session)
+        except Exception:
+            logger.exception("Failed to validate session %r", session)
+            return False
+
+    def release(self, session, discard=False):
+        """
+        Return a checked out session to the pool.
+
+        :param discard: Close the session instead of reusing it, eg: after an
+                error left it in an unknown state.
+        """
+        with self._condition:
+            try:
+                entry = self._checked_out.pop(id(session))
+            except KeyError:
+                raise ValueError("{!r} is not checked out of this pool".format(session))
+            now = self._clock()
+            if discard or self._closed or self._expired(entry, now):
+                self._size -= 1
+                if not self._closed:
+                    self._evictions += 1
+            else:
+                entry.last_used = now
+                self._idle.append(entry)
+                session = None
+            self._condition.notify()
+        if session is not None:
+            self._close_all((session,))
+
+    @contextmanager
+    def session(self, timeout=-1):
+        """
+        Check out a session for the duration of a with block.
+        """
+        session = self.acquire(timeout)
+        try:
+            yield session
+        finally:
+            self.release(session)
+
+    def close(self):
+        """
+        Close all idle sessions and the pool. Sessions in use are closed when
+        they are released; further checkouts raise RuntimeError.
+        """
+        with self._condition:
+            self._closed = True
+            idle = [entry.session for entry in self._idle]
+            self._size -= len(idle)
+            self._idle.clear()
+            self._condition.notify_all()
+        self._close_all(idle)
+
+    def __enter__(self):
+        try:
+            stack = self._local.stack
+        except AttributeError:
+            stack = self._local.stack = []
+        session = self.acquire()
+        stack.append(session)
+        return session
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release(self._local.stack.pop())
+
+
+# sessions checked out by using a pool as an async context manager in the
+# current task, as (pool, session) tuples
+_checked_out = ContextVar("cafeteria_pool_sessions", default=())
+
+
+async def _maybe_await(value):
+    if isawaitable(value):
+        return await value
+    return value
+
+
+async def _close_session(session):
+    """
+    Close a session using `aclose` if it has one and `close` otherwise,
+    awaiting the result if it is awaitable.
+    """
+    close = getattr(session, "aclose", None) or session.close
+    await _maybe_await(close())
+
+
+class AsyncSessionManager(object):
+    """
+    An asyncio SessionManager. The factory may be a regular callable or a
+    coroutine function, and sessions are closed with `aclose` if available or
+    `close`, awaited if they return an awaitable.
+
+    >>> async with AsyncSessionManager(connect, dsn) as session:
+    ...     await session.execute(query)
+    """
+
+    def __init__(self, factory, *args, **kwargs):
+        self._kwargs = kwargs
+        self._args = args
+        self._factory = factory
+        self.session = None
+
+    async def open(self):
+        if self.session is None:
+            self.session = await _maybe_await(
+                self._factory(*self._args, **self._kwargs)
+            )
+
+    async def close(self):
+        session, self.session = self.session, None
+        if session is not None:
+            await _close_session(session)
+
+    aclose = close
+
+    async def __aenter__(self):
+        await self.open()
+        return self.session
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class AsyncSessionPool(object):
+    """
+    A bounded pool of sessions for asyncio, with the API of SessionPool made
+    awaitable. The factory, validate hook and session close methods may be
+    regular callables or coroutine functions.
+
+    >>> pool = AsyncSessionPool(connect, dsn, min_size=2, max_size=8)
+    >>> await pool.open()
+    >>> async with pool as session:
+    ...     await session.execute(query)
+
+    Tasks waiting for a session are served in FIFO order: a released session,
+    or the slot of a closed one, is handed directly to the longest waiting
+    task. Checkout and release are safe to cancel; a session handed to a task
+    cancelled before it resumed is passed on to the next waiter.
+
+    `open` (and `maintain`) creates the `min_size` sessions concurrently. The
+    pool must be used from a single event loop.
+
+    See SessionPool for the pool parameters.
+    """
+
+    def __init__(
+        self,
+        factory,
+        *args,
+        min_size=0,
+        max_size=10,
+        timeout=None,
+        idle_timeout=None,
+        max_lifetime=None,
+        validate=None,
+        clock=monotonic,
+        **kwargs
+    ):
+        if max_size < 1 or not 0 <= min_size <= max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size")
+        self._factory = factory
+        self._args = args
+        self._kwargs = kwargs
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.validate = validate
+        self._clock = clock
+
+        self._idle = deque()
+        self._waiters = deque()
+        self._checked_out = {}
+        self._size = 0
+        self._closed = False
+        self._closing = set()
+
+        self._checkouts = 0
+        self._creations = 0
+        self._evictions = 0
+        self._validation_failures = 0
+        self._timeouts = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+
+    @property
+    def closed(self):
+        return self._closed
+
+    @property
+    def stats(self):
+        """
+        :rtype: PoolStats
+        """
+        return PoolStats(
+            size=self._size,
+            idle=len(self._idle),
+            in_use=len(self._checked_out),
+            waiting=len(self._waiters),
+            checkouts=self._checkouts,
+            creations=self._creations,
+            evictions=self._evictions,
+            validation_failures=self._validation_failures,
+            timeouts=self._timeouts,
+            wait_time=self._wait_time,
+            max_wait_time=self._max_wait_time,
+        )
+
+    _expired = SessionPool._expired
+
+    def _evict_idle(self, now, recycle=False):
+        """
+        Remove idle sessions idle for longer than the idle timeout, and if
+        recycle is set those older than the maximum lifetime, returning them.
+        """
+        idle, evicted = self._idle, []
+        if self.idle_timeout is not None:
+            horizon = now - self.idle_timeout
+            while idle and idle[0].last_used <= horizon and self._size > self.min_size:
+                evicted.append(idle.popleft().session)
+                self._size -= 1
+        if recycle and self.max_lifetime is not None:
+            for entry in [entry for entry in idle if self._expired(entry, now)]:
+                idle.remove(entry)
+                evicted.append(entry.session)
+                self._size -= 1
+        self._evictions += len(evicted)
+        return evicted
+
+    @staticmethod
+    async def _close_all(sessions):
+        for session in sessions:
+            try:
+                await _close_session(session)
+            except Exception:
+                logger.exception("Failed to close session %r", session)
+
+    def _close_later(self, session):
+        # used where the caller cannot wait, eg: when being cancelled
+        task = ensure_future(self._close_all((session,)))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    def _dispatch(self, entry):
+        """
+        Hand an idle entry, or if entry is None a free slot, to the longest
+        waiting task, or return it to the pool if there is none.
+        """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(entry)
+                return
+        if entry is None:
+            self._size -= 1
+        else:
+            self._idle.append(entry)
+
+    async def _create(self):
+        session = await _maybe_await(self._factory(*self._args, **self._kwargs))
+        self._creations += 1
+        return _PooledSession(session, self._clock())
+
+    async def maintain(self):
+        """
+        Close expired idle sessions and concurrently create sessions until the
+        pool holds at least `min_size` sessions. If any session cannot be
+        created, the first error is raised once all creations completed.
+        """
+        await self._close_all(self._evict_idle(self._clock(), recycle=True))
+        if self._closed:
+            return
+
+        missing = max(0, self.min_size - self._size)
+        self._size += missing
+        results = await gather(
+            *(self._create() for _ in range(missing)), return_exceptions=True
+        )
+        error = None
+        for result in results:
+            if isinstance(result, BaseException):
+                error = error or result
+                self._dispatch(None)
+            elif self._closed:
+                self._size -= 1
+                self._close_later(result.session)
+            else:
+                self._dispatch(result)
+        if error is not None:
+            raise error
+
+    open = maintain
+
+    def _timeout(self, waiter, start):
+        if not waiter.done():
+            self._timeouts += 1
+            self._record_wait(self._clock() - start)
+            waiter.set_exception(
+                TimeoutError(
+                    "Timed out waiting for a session, {} in use".format(
+                        len(self._checked_out)
+                    )
+                )
+            )
+
+    async def _checkout(self, start, deadline):
+        """
+        Take an idle session or reserve a slot for a new one, queueing behind
+        other waiting tasks if the pool is exhausted.
+
+        :return: An idle entry, or None if a slot was reserved.
+        """
+        if self._closed:
+            raise RuntimeError("Session pool is closed")
+        now = self._clock()
+        for session in self._evict_idle(now):
+            self._close_later(session)
+
+        if not self._waiters:
+            while self._idle:
+                entry = self._idle.pop()
+                if not self._expired(entry, now):
+                    return entry
+                self._size -= 1
+                self._evictions += 1
+                self._close_later(entry.session)
+            if self._size < self.max_size:
+                self._size += 1
+                return None
+
+        waiter = get_running_loop().create_future()
+        self._waiters.append(waiter)
+        timer = None
+        if deadline is not None:
+            timer = get_running_loop().call_at(
+                get_running_loop().time() + max(0.0, deadline - now),
+                self._timeout,
+                waiter,
+                start,
+            )
+        try:
+            return await waiter
+        except CancelledError:
+            if waiter.done() and not waiter.cancelled() and not waiter.exception():
+                # handed a session or slot after being cancelled, pass it on
+                self._dispatch(waiter.result())
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    async def acquire(self, timeout=-1):
+        """
+        Check out a session, waiting for one to become available if the pool
+        is exhausted.
+
+        :param timeout: Seconds to wait, None to wait forever, defaults to the
+                pool timeout.
+        :raises: TimeoutError if no session became available in time,
+                RuntimeError if the pool is closed or more than `max_size`
+                idle sessions in a row failed validation.
+        """
+        if timeout == -1:
+            timeout = self.timeout
+        start = self._clock()
+        deadline = None if timeout is None else start + timeout
+
+        failures = 0
+        while True:
+            entry = await self._checkout(start, deadline)
+            if entry is None:
+                try:
+                    entry = await self._create()
+                except BaseException:
+                    self._dispatch(None)
+                    raise
+                break
+
+            # as in SessionPool, only idle sessions are validated
+            try:
+                valid = self.validate is None or await self._valid(entry.session)
+            except BaseException:
+                # give up the slot, closing the session that was not validated
+                self._close_later(entry.session)
+                self._dispatch(None)
+                raise
+            if valid:
+                break
+
+            self._evictions += 1
+            self._validation_failures += 1
+            failures += 1
+            self._dispatch(None)
+            await self._close_all((entry.session,))
+            if failures > self.max_size:
+                # more than the pool can hold idle, sessions keep being
+                # returned broken
+                raise RuntimeError(
+                    "{} idle sessions in a row failed validation".format(failures)
+                )
+
+        self._checkouts += 1
+        self._record_wait(self._clock() - start)
+        self._checked_out[id(entry.session)] = entry
+        return entry.session
+
+    async def _valid(self, session):
+        try:
+            return await _maybe_await(self.validate(session))
+        except Exception:
+            logger.exception("Failed to validate session %r", session)
+            return False
+
+    def _record_wait(self, waited):
+        self._wait_time += waited
+        self._max_wait_time = max(self._max_wait_time, waited)
+
+    async def release(self, session, discard=False):
+        """
+        Return a checked out session to the pool. The pool is updated before
+        the first suspension point, so cancelling a release never leaks a
+        session or slot.
+
+        :param discard: Close the session instead of reusing it, eg: after an
+                error left it in an unknown state.
+        """
+        try:
+            entry = self._checked_out.pop(id(session))
+        except KeyError:
+            raise ValueError("{!r} is not checked out of this pool".format(session))
+        now = self._clock()
+        if discard or self._closed or self._expired(entry, now):
+            if not self._closed:
+                self._evictions += 1
+            self._dispatch(None)
+            await self._close_all((session,))
+        else:
+            entry.last_used = now
+            self._dispatch(entry)
+
+    @asynccontextmanager
+    async def session(self, timeout=-1):
+        """
+        Check out a session for the duration of an async with block.
+        """
+        session = await self.acquire(timeout)
+        try:
+            yield session
+        finally:
+            await self.release(session)
+
+    async def close(self):
+        """
+        Close all idle sessions and the pool. Waiting tasks fail with
+        RuntimeError, sessions in use are closed when they are released.
+        """
+        self._closed = True
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(RuntimeError("Session pool is closed"))
+        idle = [entry.session for entry in self._idle]
+        self._size -= len(idle)
+        self._idle.clear()
+        await self._close_all(idle)
+
+    aclose = close
+
+    async def __aenter__(self):
+        session = await self.acquire()
+        _checked_out.set(_checked_out.get() + ((self, session),))
+        return session
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        stack = _checked_out.get()
+        for position in range(len(stack) - 1, -1, -1):
+            if stack[position][0] is self:
+                break
+        else:
+            raise RuntimeError("No session checked out of this pool")
+        _checked_out.set(stack[:position] + stack[position + 1 :])
+        await self.release(stack[position][1])
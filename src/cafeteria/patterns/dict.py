@@ -1,10 +1,19 @@
 import logging
-from typing import Any, Dict, Hashable, TypeVar, Union
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Tuple, TypeVar, Union
+
+try:
+    # noinspection PyPackageRequirements,PyUnresolvedReferences
+    import numpy
+except ImportError:
+    numpy = None
 
 logger = logging.getLogger(__name__)
 
 D = TypeVar("D")
 
+PathAccessor = Callable[..., Any]
+
 
 def get_by_path(d: Dict, *path: Hashable, default: D = None) -> Union[Any, D]:
     """
@@ -26,3 +35,83 @@ def get_by_path(d: Dict, *path: Hashable, default: D = None) -> Union[Any, D]:
         return get_by_path(d[head], *tail, default=default)
     except KeyError:
         return default
+
+
+@lru_cache(maxsize=1024)
+def compile_path(*path: Hashable) -> PathAccessor:
+    """
+    Compile a path into a reusable accessor behaving like `get_by_path`. The
+    accessor walks the path iteratively and does no logging, making it suitable
+    for hot loops. Accessors are cached by path, so repeated calls with the same
+    path return the same callable.
+    >>> get_c = compile_path("a", "b", "c")
+    >>> get_c(d, default=1)
+    """
+    if len(path) == 0:
+        raise ValueError("No path given")
+    *head, last = path
+
+    if not head:
+
+        def accessor(d: Dict, default: D = None) -> Union[Any, D]:
+            return d.get(last, default)
+
+    else:
+
+        def accessor(d: Dict, default: D = None) -> Union[Any, D]:
+            try:
+                for key in head:
+                    d = d[key]
+            except KeyError:
+                return default
+            return d.get(last, default)
+
+    accessor.path = path
+    return accessor
+
+
+def _as_array(column: List[Any]) -> Any:
+    # values that are sequences themselves, eg: lists, would make a 2-D array
+    # or fail when ragged; they are kept as objects of a 1-D array instead
+    try:
+        array = numpy.asarray(column)
+    except ValueError:
+        array = None
+    if array is None or array.ndim != 1:
+        array = numpy.empty(len(column), dtype=object)
+        for index, value in enumerate(column):
+            array[index] = value
+    return array
+
+
+def extract_columns(
+    records: Iterable[Dict],
+    *paths: Union[Hashable, Tuple[Hashable, ...]],
+    default: Any = None,
+    as_arrays: bool = True,
+) -> List[Any]:
+    """
+    Extract values for multiple paths out of an iterable of nested dicts in a
+    single pass. One column is returned per path, in the order the paths were
+    given. A path is either a tuple of keys or a single key.
+    >>> ids, names = extract_columns(events, ("user", "id"), ("user", "name"))
+
+    Columns are NumPy arrays when NumPy is installed and `as_arrays` is set,
+    plain lists otherwise. Columns of non scalar values, such as lists, are
+    one dimensional arrays of objects.
+    """
+    if len(paths) == 0:
+        raise ValueError("No path given")
+    accessors = [
+        compile_path(*(path if isinstance(path, tuple) else (path,))) for path in paths
+    ]
+    columns = [[] for _ in accessors]
+    pairs = list(zip(accessors, [column.append for column in columns]))
+
+    for record in records:
+        for accessor, append in pairs:
+            append(accessor(record, default))
+
+    if as_arrays and numpy is not None:
+        return [_as_array(column) for column in columns]
+    return columns
@@ -0,0 +1,282 @@
+import logging
+import signal
+from os import environ as os_environ
+
+from cafeteria.datastructs.memory import Memory, MemoryUnit
+from cafeteria.patterns.dict import compile_path
+
+logger = logging.getLogger(__name__)
+
+TRUE_STRINGS = frozenset(["1", "true", "yes", "on"])
+FALSE_STRINGS = frozenset(["0", "false", "no", "off", ""])
+
+
+class SettingsError(ValueError):
+    """
+    Raised when settings cannot be resolved, listing every setting at fault.
+
+    :ivar errors: Exceptions by setting name.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super(SettingsError, self).__init__(
+            "Invalid settings: {}".format(
+                ", ".join(
+                    "{} ({})".format(name, error) for name, error in errors.items()
+                )
+            )
+        )
+
+
+def coerce(value, type_):
+    """
+    Convert a value, typically a string from the environment, to a type.
+    Values already of the type are returned as is. Booleans accept
+    true/false, yes/no, on/off and 1/0, lists and tuples accept comma
+    separated strings, and Memory accepts plain numbers as bytes.
+
+    :raises: ValueError, TypeError
+    """
+    if type_ is None or value is None:
+        return value
+    if isinstance(type_, type):
+        if isinstance(value, type_):
+            return value
+        if type_ is bool:
+            if isinstance(value, str):
+                lowered = value.strip().lower()
+                if lowered in TRUE_STRINGS:
+                    return True
+                if lowered in FALSE_STRINGS:
+                    return False
+                raise ValueError("{!r} is not a boolean".format(value))
+            return bool(value)
+        if issubclass(type_, (list, tuple)) and isinstance(value, str):
+            return type_(item.strip() for item in value.split(",") if item.strip())
+        if issubclass(type_, Memory) and not isinstance(value, str):
+            return type_(value, MemoryUnit.BYTES)
+    return type_(value)
+
+
+class Setting(object):
+    """
+    Declaration of a setting on a Settings class. The value is resolved with
+    the priority of `resolve_setting`: override, environment variable,
+    configuration entry and finally the default.
+
+    :param default: Value when not set otherwise, coerced like other values.
+    :param type: Type or callable the value is converted with, see `coerce`.
+    :param env: Environment variable name, defaults to the upper case name of
+            the setting prefixed with the ENV_PREFIX of the Settings class;
+            False to not read the environment.
+    :param config: Path of the entry in the configuration mapping, a key or a
+            tuple of keys, defaults to the name of the setting.
+    :param required: Fail to resolve if no value is set and default is None.
+    """
+
+    def __init__(self, default=None, type=None, env=None, config=None, required=False):
+        self.default = default
+        self.type = type
+        self.env = env
+        self.config = config
+        self.required = required
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return getattr(instance.snapshot, self.name)
+
+    def __repr__(self):
+        return "{}({!r}, default={!r})".format(
+            self.__class__.__name__, self.name, self.default
+        )
+
+
+class SettingsSnapshot(object):
+    """
+    Immutable values of all the settings of a Settings class, as slots. A
+    subclass is created per Settings class.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("{} is immutable".format(self.__class__.__name__))
+
+    def __delattr__(self, key):
+        raise AttributeError("{} is immutable".format(self.__class__.__name__))
+
+    def as_dict(self):
+        """
+        :rtype: dict
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.as_dict() == other.as_dict()
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, name) for name in self.__slots__))
+
+    def __repr__(self):
+        return "{}({})".format(
+            self.__class__.__name__,
+            ", ".join("{}={!r}".format(k, v) for k, v in self.as_dict().items()),
+        )
+
+
+class Settings(object):
+    """
+    Resolves a declared schema of settings from overrides, the environment
+    and a configuration mapping into an immutable SettingsSnapshot. The
+    environment and configuration are read once per resolution, and every
+    setting is resolved in the same pass, so that reading settings on the
+    hot path is a plain attribute access on the snapshot. As for
+    resolve_setting, a layer holding None for a setting falls through to the
+    next one.
+
+    >>> class AppSettings(Settings):
+    ...     ENV_PREFIX = "APP_"
+    ...     workers = Setting(4, int)
+    ...     memory_limit = Setting("512 MB", Memory, config=("limits", "memory"))
+    >>> settings = AppSettings(config={"limits": {"memory": "1 GB"}})
+    >>> settings.install_signal_handler()
+    >>> snapshot = settings.snapshot
+    >>> snapshot.workers, snapshot.memory_limit
+    (4, 1073741824)
+
+    `refresh` resolves a new snapshot and swaps it in atomically, readers
+    holding on to a snapshot keep a consistent view. Attributes of the
+    Settings object read through to the current snapshot.
+
+    :param config: Configuration mapping, or a callable returning one, called
+            again on each refresh (eg: to reload a file).
+    :param environ: Environment mapping, defaults to os.environ.
+    :param overrides: Values by setting name, taking precedence over all.
+    :raises: SettingsError
+    """
+
+    ENV_PREFIX = ""
+    SETTINGS = {}
+    SNAPSHOT_CLASS = SettingsSnapshot
+
+    def __init_subclass__(cls, **kwargs):
+        super(Settings, cls).__init_subclass__(**kwargs)
+        settings = {}
+        for klass in reversed(cls.__mro__):
+            for name, value in vars(klass).items():
+                if isinstance(value, Setting):
+                    if name in _RESERVED:
+                        raise TypeError(
+                            "{} cannot be used as a setting name".format(name)
+                        )
+                    settings[name] = value
+        cls.SETTINGS = settings
+        cls.SNAPSHOT_CLASS = type(
+            "{}Snapshot".format(cls.__name__),
+            (SettingsSnapshot,),
+            {"__slots__": tuple(settings), "__module__": cls.__module__},
+        )
+        # environment variable and configuration accessor of each setting
+        cls._accessors = {}
+        for name, setting in settings.items():
+            env_var = setting.env or "{}{}".format(cls.ENV_PREFIX, name.upper())
+            path = setting.config or name
+            cls._accessors[name] = (
+                None if setting.env is False else env_var,
+                compile_path(*(path if isinstance(path, tuple) else (path,))),
+            )
+
+    def __init__(self, config=None, environ=None, overrides=None):
+        self.config = config
+        self.environ = environ
+        self.overrides = dict(overrides or {})
+        unknown = set(self.overrides) - set(self.SETTINGS)
+        if unknown:
+            raise SettingsError(
+                {name: KeyError("unknown setting") for name in sorted(unknown)}
+            )
+        self.snapshot = self.resolve()
+
+    def _layers(self):
+        config = self.config() if callable(self.config) else self.config
+        environ = os_environ if self.environ is None else self.environ
+        return dict(environ), config or {}
+
+    def resolve(self):
+        """
+        Resolve all settings from the current environment and configuration,
+        without changing the current snapshot.
+
+        :rtype: SettingsSnapshot
+        :raises: SettingsError
+        """
+        environ, config = self._layers()
+        values, errors = {}, {}
+
+        for name, setting in self.SETTINGS.items():
+            env_var, accessor = self._accessors[name]
+            try:
+                # as resolve_setting, a layer set to None falls through
+                value = self.overrides.get(name)
+                if value is None and env_var is not None:
+                    value = environ.get(env_var)
+                if value is None:
+                    # raises AttributeError or TypeError if the path runs into
+                    # a value that is not a dict
+                    value = accessor(config)
+                if value is None:
+                    value = setting.default
+                if value is None and setting.required:
+                    raise ValueError("required")
+                values[name] = coerce(value, setting.type)
+            except (AttributeError, TypeError, ValueError, KeyError) as e:
+                errors[name] = e
+
+        if errors:
+            raise SettingsError(errors)
+        return self.SNAPSHOT_CLASS(values)
+
+    def refresh(self):
+        """
+        Resolve the settings again and swap the new snapshot in. The current
+        snapshot is kept if any setting fails to resolve.
+
+        :rtype: SettingsSnapshot
+        :raises: SettingsError
+        """
+        self.snapshot = snapshot = self.resolve()
+        return snapshot
+
+    def install_signal_handler(self, signum=signal.SIGHUP):
+        """
+        Refresh the settings when the process receives a signal, SIGHUP by
+        default. Failures are logged and the current snapshot kept. Must be
+        called from the main thread.
+
+        :return: The previous handler of the signal.
+        """
+
+        # noinspection PyUnusedLocal
+        def handler(received, frame):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Failed to refresh %s", self.__class__.__name__)
+
+        return signal.signal(signum, handler)
+
+    def __repr__(self):
+        return "{}({!r})".format(self.__class__.__name__, self.snapshot)
+
+
+_RESERVED = frozenset(vars(Settings)) | {"config", "environ", "overrides", "snapshot"}
@@ -0,0 +1,211 @@
+from collections import deque
+from collections.abc import Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from os import cpu_count
+from queue import Empty, SimpleQueue
+
+# default number of items per task submitted to a process pool
+PROCESS_CHUNKSIZE = 64
+
+_POOLS = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+
+
+def batched(iterable, n):
+    """
+    Lazily split an iterable into tuples of n items, the last one possibly
+    shorter.
+
+    >>> list(batched("abcde", 2))
+    [('a', 'b'), ('c', 'd'), ('e',)]
+
+    :rtype: generator
+    """
+    if n < 1:
+        raise ValueError("n must be at least 1")
+    iterator = iter(iterable)
+    while True:
+        batch = tuple(islice(iterator, n))
+        if not batch:
+            return
+        yield batch
+
+
+def chunked(iterable, n):
+    """
+    Lazily split an iterable into chunks of n items, the last one possibly
+    shorter. Sequences, such as lists, strings and bytes, and memoryviews are
+    sliced, so chunks have the type of the sequence and chunks of memoryviews
+    do not copy. Other iterables, including deques and mappings, are split
+    into lists.
+
+    >>> list(chunked(b"abcde", 2))
+    [b'ab', b'cd', b'e']
+
+    :rtype: generator
+    """
+    if n < 1:
+        raise ValueError("n must be at least 1")
+    # deques are registered as sequences but cannot be sliced
+    if isinstance(iterable, (Sequence, memoryview)) and not isinstance(iterable, deque):
+        return (iterable[i : i + n] for i in range(0, len(iterable), n))
+    return (list(batch) for batch in batched(iterable, n))
+
+
+def windowed(iterable, n, step=1):
+    """
+    Lazily yield tuples of n consecutive items, moving step items between
+    windows. Nothing is yielded for iterables of less than n items.
+
+    >>> list(windowed([1, 2, 3, 4], 2))
+    [(1, 2), (2, 3), (3, 4)]
+
+    :rtype: generator
+    """
+    if n < 1:
+        raise ValueError("n must be at least 1")
+    if step < 1:
+        raise ValueError("step must be at least 1")
+    iterator = iter(iterable)
+    window = deque(islice(iterator, n), maxlen=n)
+    if len(window) < n:
+        return
+    yield tuple(window)
+    while True:
+        items = tuple(islice(iterator, step))
+        if len(items) < step:
+            return
+        window.extend(items)
+        yield tuple(window)
+
+
+def _call_chunk(func, chunk):
+    return [func(item) for item in chunk]
+
+
+def _failed(future):
+    return not future.cancelled() and future.exception() is not None
+
+
+def _head_result(pending, completions):
+    # wait for the oldest task, raising the exception of any later task that
+    # failed meanwhile rather than after the tasks before it; completions are
+    # drained on the way so the queue stays bounded
+    head = pending[0]
+    while True:
+        try:
+            future = completions.get(block=not head.done())
+        except Empty:
+            break
+        if _failed(future):
+            return future.result()
+    return pending.popleft().result()
+
+
+def _ordered(submit, chunks, limit, completions):
+    pending = deque()
+    for chunk in chunks:
+        pending.append(submit(chunk))
+        if len(pending) >= limit:
+            yield from _head_result(pending, completions)
+    while pending:
+        yield from _head_result(pending, completions)
+
+
+def _unordered(submit, chunks, limit, completions):
+    chunks = iter(chunks)
+    in_flight = 0
+    exhausted = False
+    while True:
+        while not exhausted and in_flight < limit:
+            chunk = next(chunks, None)
+            if chunk is None:
+                exhausted = True
+            else:
+                submit(chunk)
+                in_flight += 1
+        if not in_flight:
+            return
+        future = completions.get()
+        in_flight -= 1
+        yield from future.result()
+
+
+def pmap(
+    func,
+    iterable,
+    executor="thread",
+    workers=None,
+    ordered=True,
+    max_in_flight=None,
+    chunksize=None,
+):
+    """
+    Lazily map func over an iterable on a pool of threads or processes.
+
+    Unlike Executor.map, which submits every item up front, at most
+    `max_in_flight` tasks are submitted at a time and the iterable is only
+    consumed as tasks complete, so memory stays bounded for large or endless
+    inputs and a slow consumer holds back the producer. Items are submitted
+    in tasks of `chunksize` items, cutting the per item overhead of process
+    pools.
+
+    Results are yielded in the order of the iterable, or as they complete if
+    `ordered` is False. The first exception raised by func is raised by the
+    generator, after cancelling the tasks not yet started. Closing the
+    generator early cancels them too.
+
+    >>> for result in pmap(fetch, urls, workers=16, ordered=False):
+    ...     store(result)
+
+    :param executor: "thread", "process" or an Executor, which is then not
+            shut down.
+    :param workers: Number of workers of the pool, the number of CPUs by
+            default. Ignored if an Executor is given.
+    :param ordered: Yield results in the order of the iterable.
+    :param max_in_flight: Maximum number of tasks submitted and not yet
+            consumed, twice the number of workers by default.
+    :param chunksize: Number of items per task, 1 for threads and
+            PROCESS_CHUNKSIZE for processes by default.
+    :rtype: generator
+    """
+    workers = workers or cpu_count() or 1
+    if not isinstance(executor, Executor) and executor not in _POOLS:
+        raise ValueError("executor must be 'thread', 'process' or an Executor")
+    if chunksize is None:
+        process = executor == "process" or isinstance(executor, ProcessPoolExecutor)
+        chunksize = PROCESS_CHUNKSIZE if process else 1
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least 1")
+    limit = max_in_flight or 2 * workers
+    if limit < 1:
+        raise ValueError("max_in_flight must be at least 1")
+    return _pmap(func, iterable, executor, workers, ordered, limit, chunksize)
+
+
+def _pmap(func, iterable, executor, workers, ordered, limit, chunksize):
+    # a separate generator, so that pmap validates its arguments eagerly and
+    # pools are only created once iterated
+    owned = not isinstance(executor, Executor)
+    pool = _POOLS[executor](workers) if owned else executor
+    futures = set()
+    completions = SimpleQueue()
+
+    def submit(chunk):
+        future = pool.submit(_call_chunk, func, chunk)
+        futures.add(future)
+        future.add_done_callback(futures.discard)
+        future.add_done_callback(completions.put)
+        return future
+
+    results = _ordered if ordered else _unordered
+    completed = False
+    try:
+        yield from results(submit, batched(iterable, chunksize), limit, completions)
+        completed = True
+    finally:
+        for future in list(futures):
+            future.cancel()
+        if owned:
+            # do not wait for running tasks on errors or early close
+            pool.shutdown(wait=completed)
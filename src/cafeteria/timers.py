@@ -0,0 +1,329 @@
+import logging
+from abc import ABCMeta, abstractmethod
+from asyncio import get_running_loop
+from math import ceil
+from time import monotonic
+from weakref import WeakKeyDictionary, ref
+
+logger = logging.getLogger(__name__)
+
+
+class Timer(object):
+    """
+    Handle of a callback scheduled on a TimingWheel.
+    """
+
+    __slots__ = ("deadline", "callback", "args", "_wheel", "_slot")
+
+    def __init__(self, wheel, deadline, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self._wheel = wheel
+        self._slot = None
+
+    @property
+    def active(self):
+        """
+        Whether the timer is scheduled and neither fired nor cancelled.
+
+        :rtype: bool
+        """
+        return self._slot is not None
+
+    def cancel(self):
+        """
+        Cancel the timer in constant time.
+
+        :return: Whether the timer was active.
+        :rtype: bool
+        """
+        slot = self._slot
+        if slot is None:
+            return False
+        del slot[self]
+        self._slot = None
+        self._wheel._count -= 1
+        return True
+
+
+class TimingWheel(object):
+    """
+    A hierarchical timing wheel, scheduling and cancelling timers in constant
+    time regardless of how many timers are pending, at the cost of a fixed
+    granularity. This suits large numbers of timeouts that are mostly
+    cancelled before they fire, eg: per connection or per request timeouts.
+
+    Time is divided into ticks of `tick` seconds. Each of the `levels` wheels
+    has `wheel_size` slots, a slot of a level spanning a full turn of the
+    level below, so the wheels cover wheel_size ** levels ticks; timers
+    further out are parked in the last slot and re-filed as time passes.
+    Timers are filed in the slot of their deadline on the lowest level that
+    covers it, and moved down a level each time the level below completes a
+    turn.
+
+    The wheel does not keep time itself, `advance` must be called
+    periodically, at least once per tick for timers to fire on time. Timers
+    never fire early, and up to a tick late if advanced every tick. The wheel
+    is not thread safe, use it from a single thread such as an event loop.
+
+    :param tick: Granularity in seconds.
+    :param wheel_size: Number of slots per level, a power of two.
+    :param levels: Number of levels.
+    :param clock: Clock returning seconds, used when scheduling and as the
+            default time to advance to.
+    """
+
+    def __init__(self, tick=0.01, wheel_size=256, levels=4, clock=monotonic):
+        if tick <= 0:
+            raise ValueError("tick must be positive")
+        if wheel_size < 2 or wheel_size & (wheel_size - 1):
+            raise ValueError("wheel_size must be a power of two")
+        if levels < 1:
+            raise ValueError("levels must be at least 1")
+        self.tick = tick
+        self.wheel_size = wheel_size
+        self.levels = levels
+        self._clock = clock
+        self._bits = wheel_size.bit_length() - 1
+        self._mask = wheel_size - 1
+        self._limits = [wheel_size ** (level + 1) for level in range(levels)]
+        self._wheels = [[{} for _ in range(wheel_size)] for _ in range(levels)]
+        self._start = clock()
+        self._current = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def time(self):
+        """
+        Time of the last tick processed, in clock seconds.
+
+        :rtype: float
+        """
+        return self._start + self._current * self.tick
+
+    def _file(self, timer):
+        deadline = timer.deadline
+        delta = deadline - self._current
+        if delta < self.wheel_size:
+            slot = self._wheels[0][deadline & self._mask]
+        else:
+            for level in range(1, self.levels):
+                if delta < self._limits[level]:
+                    break
+            else:
+                # beyond the last level, park in its furthest slot
+                level = self.levels - 1
+                deadline = self._current + self._limits[level] - 1
+            slot = self._wheels[level][(deadline >> (self._bits * level)) & self._mask]
+        slot[timer] = None
+        timer._slot = slot
+
+    def call_later(self, delay, callback, *args):
+        """
+        Schedule callback to be called with args after delay seconds.
+
+        :rtype: Timer
+        """
+        elapsed = self._clock() - self._start
+        if not self._count:
+            # nothing pending, catch up without processing the idle ticks
+            self._current = max(self._current, int(elapsed / self.tick))
+        deadline = int(ceil((elapsed + delay) / self.tick))
+        timer = Timer(self, max(deadline, self._current + 1), callback, args)
+        self._file(timer)
+        self._count += 1
+        return timer
+
+    def call_at(self, when, callback, *args):
+        """
+        Schedule callback to be called with args at the given clock time.
+
+        :rtype: Timer
+        """
+        return self.call_later(when - self._clock(), callback, *args)
+
+    def _cascade(self, level):
+        index = (self._current >> (self._bits * level)) & self._mask
+        slot = self._wheels[level][index]
+        if slot:
+            self._wheels[level][index] = {}
+            for timer in slot:
+                self._file(timer)
+        return index
+
+    def advance(self, now=None):
+        """
+        Process all ticks up to now, calling the callbacks of the timers that
+        are due. Exceptions raised by callbacks are logged.
+
+        :param now: Clock time to advance to, defaults to the current time.
+        :return: Number of timers fired.
+        :rtype: int
+        """
+        if now is None:
+            now = self._clock()
+        # tolerate floating point error on tick boundaries
+        target = int((now - self._start) / self.tick + 1e-9)
+        fired = 0
+        wheel, mask = self._wheels[0], self._mask
+
+        while self._current < target:
+            if not self._count:
+                self._current = target
+                break
+            self._current += 1
+            index = self._current & mask
+            if index == 0:
+                for level in range(1, self.levels):
+                    if self._cascade(level):
+                        break
+
+            slot = wheel[index]
+            if not slot:
+                continue
+            wheel[index] = {}
+            for timer in list(slot):
+                if timer._slot is not slot:
+                    # cancelled by an earlier callback
+                    continue
+                if timer.deadline > self._current:
+                    # parked beyond the range of the wheels
+                    self._file(timer)
+                    continue
+                timer._slot = None
+                self._count -= 1
+                fired += 1
+                try:
+                    timer.callback(*timer.args)
+                except Exception:
+                    logger.exception("Error calling timer callback %r", timer.callback)
+        return fired
+
+
+class EventLoopTimingWheel(TimingWheel, metaclass=ABCMeta):
+    """
+    A TimingWheel advanced by an event loop. While timers are pending, a
+    single loop timer per tick advances the wheel, so the loop only ever
+    holds one timer regardless of the number scheduled on the wheel.
+
+    Subclasses implement `_call_later` and `_cancel_call` for their loop.
+    """
+
+    def __init__(self, tick=0.01, wheel_size=256, levels=4, clock=monotonic):
+        super(EventLoopTimingWheel, self).__init__(tick, wheel_size, levels, clock)
+        self._handle = None
+
+    @abstractmethod
+    def _call_later(self, delay, callback):
+        """
+        Schedule callback on the loop after delay seconds, returning a handle.
+        """
+
+    @abstractmethod
+    def _cancel_call(self, handle):
+        """
+        Cancel a call scheduled with `_call_later`.
+        """
+
+    def call_later(self, delay, callback, *args):
+        timer = super(EventLoopTimingWheel, self).call_later(delay, callback, *args)
+        if self._handle is None:
+            self._handle = self._call_later(self.tick, self._run)
+        return timer
+
+    def _run(self):
+        self._handle = None
+        self.advance()
+        if self._count and self._handle is None:
+            # wake up at the next tick boundary
+            delay = self._start + (self._current + 1) * self.tick - self._clock()
+            self._handle = self._call_later(max(0.0, delay), self._run)
+
+    def stop(self):
+        """
+        Stop advancing the wheel. Pending timers stay scheduled and the wheel
+        is advanced again once another timer is scheduled.
+        """
+        if self._handle is not None:
+            self._cancel_call(self._handle)
+            self._handle = None
+
+
+class AsyncioTimingWheel(EventLoopTimingWheel):
+    """
+    A TimingWheel advanced by an asyncio event loop, with the call_later API
+    of the loop. The wheel only holds a weak reference to the loop, so that
+    wheels kept per loop do not keep closed loops alive.
+
+    >>> wheel = AsyncioTimingWheel(tick=0.1)
+    >>> timer = wheel.call_later(30, connection.timeout)
+    >>> timer.cancel()
+    """
+
+    def __init__(self, tick=0.01, wheel_size=256, levels=4, loop=None):
+        loop = ref(loop or get_running_loop())
+        self._loop = loop
+        super(AsyncioTimingWheel, self).__init__(
+            tick, wheel_size, levels, lambda: loop().time()
+        )
+
+    @property
+    def loop(self):
+        return self._loop()
+
+    def _call_later(self, delay, callback):
+        return self.loop.call_later(delay, callback)
+
+    def _cancel_call(self, handle):
+        handle.cancel()
+
+    async def sleep(self, delay, result=None):
+        """
+        Coroutine completing after delay seconds, with the granularity of the
+        wheel. Cancelling it cancels its timer.
+        """
+        future = self.loop.create_future()
+        timer = self.call_later(delay, _set_result, future, result)
+        try:
+            return await future
+        finally:
+            timer.cancel()
+
+
+def _set_result(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+_default_wheels = WeakKeyDictionary()
+
+
+def get_timing_wheel(loop=None):
+    """
+    Return the default AsyncioTimingWheel of a loop, the running loop if not
+    given, creating it with the default granularity.
+
+    :rtype: AsyncioTimingWheel
+    """
+    loop = loop or get_running_loop()
+    try:
+        return _default_wheels[loop]
+    except KeyError:
+        wheel = _default_wheels[loop] = AsyncioTimingWheel(loop=loop)
+        return wheel
+
+
+async def async_sleep(seconds, result=None):
+    """
+    An asyncio sleep using the default timing wheel of the running loop. Use
+    in place of asyncio.sleep for large numbers of concurrent, frequently
+    cancelled sleeps (eg: timeouts), where the granularity of the wheel is
+    acceptable.
+
+    :type seconds: float
+    """
+    return await get_timing_wheel().sleep(seconds, result)
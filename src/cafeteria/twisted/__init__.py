@@ -2,6 +2,8 @@ try:
     # noinspection PyPackageRequirements,PyUnresolvedReferences
     from twisted.internet import defer, reactor
 
+    from cafeteria.timers import EventLoopTimingWheel
+
     def async_sleep(seconds):
         """
         An asynchronous sleep function using twsited.
@@ -15,5 +17,42 @@ try:
         reactor.callLater(seconds, d.callback, seconds)
         return d
 
+    class ReactorTimingWheel(EventLoopTimingWheel):
+        """
+        A cafeteria.timers.TimingWheel advanced by a Twisted reactor, with the
+        callLater API of the reactor. Use in place of reactor.callLater for
+        large numbers of timeouts that are mostly cancelled, where the
+        granularity of the wheel is acceptable.
+
+        :param clock: An IReactorTime provider, defaults to the reactor.
+        """
+
+        def __init__(self, tick=0.01, wheel_size=256, levels=4, clock=None):
+            self.reactor = clock or reactor
+            super(ReactorTimingWheel, self).__init__(
+                tick, wheel_size, levels, self.reactor.seconds
+            )
+
+        def _call_later(self, delay, callback):
+            return self.reactor.callLater(delay, callback)
+
+        def _cancel_call(self, handle):
+            if handle.active():
+                handle.cancel()
+
+        def callLater(self, delay, callback, *args):
+            return self.call_later(delay, callback, *args)
+
+        def sleep(self, seconds):
+            """
+            Like async_sleep, using the wheel. Cancelling the returned deferred
+            cancels its timer.
+
+            :rtype: twisted.internet.defer.Deferred
+            """
+            d = defer.Deferred(lambda _: timer.cancel())
+            timer = self.call_later(seconds, d.callback, seconds)
+            return d
+
 except ImportError:
     pass
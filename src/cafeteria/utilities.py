@@ -30,6 +30,9 @@ def resolve_setting(default, arg_value=None, env_var=None, config_value=None):
     - Configuration file entry
     - Default
 
+    The environment is read on every call, see cafeteria.settings.Settings to
+    resolve many settings once into a snapshot.
+
     :param arg_value: Explicitly passed value
     :param env_var: Environment variable name
     :type env_var: string or None
@@ -0,0 +1,130 @@
+from abc import ABCMeta, abstractmethod
+from threading import Thread
+
+import pytest
+
+from cafeteria.abc import AbstractClass, invalidate_conformance
+
+
+class Handler(AbstractClass):
+    @abstractmethod
+    def handle(self, message):
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
+
+
+class Base(object):
+    def close(self):
+        pass
+
+
+class Structural(Base):
+    def handle(self, message):
+        pass
+
+
+class Partial(object):
+    def handle(self, message):
+        pass
+
+
+class Concrete(Handler):
+    def handle(self, message):
+        pass
+
+    def close(self):
+        pass
+
+
+class TestAbstractClass:
+    def test_metaclass(self):
+        assert isinstance(Handler, ABCMeta)
+        assert Handler.__abstractmethods__ == frozenset(["handle", "close"])
+        with pytest.raises(TypeError):
+            Handler()
+
+    def test_structural(self):
+        assert issubclass(Structural, Handler)
+        assert isinstance(Structural(), Handler)
+        assert not issubclass(Partial, Handler)
+        assert not isinstance(Partial(), Handler)
+        assert issubclass(Concrete, Handler)
+
+    def test_concrete_classes_not_structural(self):
+        # classes without abstract methods use plain subclass checks
+        assert not issubclass(Structural, Concrete)
+        assert not issubclass(int, AbstractClass)
+
+    def test_register(self):
+        class Registered(object):
+            pass
+
+        assert not issubclass(Registered, Handler)
+        Handler.register(Registered)
+        assert issubclass(Registered, Handler)
+        assert not Handler.conforms(Registered)
+
+    def test_cached(self):
+        class Candidate(Structural):
+            pass
+
+        assert Handler.conforms(Candidate)
+        assert Handler._conformance[Candidate] is True
+
+    def test_invalidate(self):
+        class Candidate(object):
+            def handle(self, message):
+                pass
+
+        assert not isinstance(Candidate(), Handler)
+        Candidate.close = lambda self: None
+        # candidate classes are not watched
+        assert not isinstance(Candidate(), Handler)
+        invalidate_conformance()
+        assert isinstance(Candidate(), Handler)
+
+    def test_abstract_class_modified(self):
+        class Closeable(AbstractClass):
+            @abstractmethod
+            def close(self):
+                pass
+
+        class Candidate(object):
+            def close(self):
+                pass
+
+        assert issubclass(Candidate, Closeable)
+        Closeable.__abstractmethods__ = frozenset(["close", "flush"])
+        assert not issubclass(Candidate, Closeable)
+
+    def test_missing(self):
+        assert Handler.missing(Partial) == frozenset(["close"])
+        assert Handler.missing(Structural) == frozenset()
+
+    def test_conforms_many(self):
+        assert Handler.conforms_many([Structural, Partial, Concrete, int]) == {
+            Structural: True,
+            Partial: False,
+            Concrete: True,
+            int: False,
+        }
+
+    def test_thread_safe(self):
+        classes = [type("C{}".format(i), (Base,), {}) for i in range(200)]
+        for cls in classes[::2]:
+            cls.handle = lambda self, message: None
+        results = []
+
+        def check():
+            results.append([isinstance(cls(), Handler) for cls in classes])
+
+        threads = [Thread(target=check) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        expected = [i % 2 == 0 for i in range(200)]
+        assert results == [expected] * 8
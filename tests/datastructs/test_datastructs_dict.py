@@ -1,6 +1,26 @@
+import io
+import json
+import pickle
+from collections import Counter
+from copy import deepcopy
+
 import pytest
 
-from cafeteria.datastructs.dict import DeepMergingDict, MergingDict
+from cafeteria.datastructs.dict import (
+    DeepAttributeDict,
+    DeepMergingDict,
+    JSONAttributeDict,
+    LazyDeepAttributeDict,
+    MergingDict,
+    json_adopt,
+    json_compact,
+    json_decode,
+    json_dump_to,
+    json_from_bytes,
+    json_from_file,
+    json_invalidate,
+    register_merge_strategy,
+)
 
 
 @pytest.fixture
@@ -62,3 +82,205 @@ class TestDeepMergingDict:
             "dict": {"one": 1, "two": 2, "nested": {"a": "a", "b": "b"}},
             "list": [2, 3],
         }
+
+
+@pytest.fixture
+def nested_document():
+    return {"a": {"b": {"c": 1}}, "x": [{"y": 2}]}
+
+
+class TestLazyDeepAttributeDict:
+    def test_wraps_on_access(self, nested_document):
+        d = LazyDeepAttributeDict(nested_document)
+        assert type(dict.__getitem__(d, "a")) is dict
+        assert isinstance(d.a, LazyDeepAttributeDict)
+        assert d.a.b.c == 1
+        assert d["a"] is d.a
+        assert d.get("a") is d.a
+
+    def test_equals_eager(self, nested_document):
+        lazy = LazyDeepAttributeDict(nested_document)
+        assert lazy == DeepAttributeDict(nested_document) == nested_document
+        lazy.a.b.c = 2
+        assert nested_document["a"]["b"]["c"] == 1
+
+
+class TestMergeMany:
+    @pytest.mark.parametrize("cls", [DeepMergingDict, ListDisabledDeepMergingDict])
+    def test_same_as_sequential_update(self, cls, simple_dict, simple_dict_update):
+        layers = [simple_dict, simple_dict_update, {"dict": {"nested": 0}, "s": "a"}]
+        merged = cls.merge_many(*layers)
+        d = cls(simple_dict)
+        for layer in layers[1:]:
+            d.update(layer)
+        assert merged == d
+        assert type(merged) is cls
+        assert type(merged.dict) is cls
+
+    def test_layers_unmodified(self, simple_dict, simple_dict_update):
+        DeepMergingDict.merge_many(simple_dict, simple_dict_update)
+        assert simple_dict == {"dict": {"one": 1, "nested": {"a": "a"}}, "list": [1]}
+
+    def test_nested_containers_of_layers_unmodified(self):
+        layers = [
+            {"c": MergingDict({"b": {2}, "l": [2]})},
+            {"c": MergingDict({"b": {1}, "l": [1]})},
+            {"c": {"b": {0}, "l": [0]}},
+        ]
+        expected = deepcopy(layers)
+        d = DeepMergingDict()
+        for layer in deepcopy(layers):
+            d.update(layer)
+        assert DeepMergingDict.merge_many(*layers) == d
+        assert layers == expected
+        assert layers[0]["c"]["b"] == {2} and layers[0]["c"]["l"] == [2]
+
+
+class TestMergeStrategies:
+    def test_register_strategy(self):
+        class CountingMergingDict(MergingDict):
+            pass
+
+        register_merge_strategy(
+            CountingMergingDict, Counter, lambda current, value: current.update(value)
+        )
+        register_merge_strategy(CountingMergingDict, list, None)
+
+        d = CountingMergingDict(counts=Counter(a=1), list=[1])
+        d.counts = Counter(a=2)
+        d.list = [2]
+        assert d == {"counts": Counter(a=3), "list": [2]}
+
+        m = MergingDict(list=[1])
+        m.list = [2]
+        assert m.list == [1, 2]
+
+    def test_default_strategies(self):
+        d = MergingDict(tags={"a"}, numbers=[1])
+        d.tags = {"b"}
+        d.numbers = [2]
+        d.numbers = 3
+        assert d == {"tags": {"a", "b"}, "numbers": 3}
+
+    def test_keys_not_shadowed(self):
+        d = MergingDict(merge_strategies=1, register_merge_strategy=2)
+        assert d.merge_strategies == 1 and d.register_merge_strategy == 2
+
+
+class TestJSONAttributeDict:
+    def test_from_file(self, tmp_path, simple_dict):
+        path = tmp_path / "document.json"
+        path.write_text(json.dumps(simple_dict))
+        d = json_from_file(str(path), decoder=json_decode)
+        assert d == simple_dict
+        assert d == JSONAttributeDict(str(path))
+
+    def test_from_empty_file(self, tmp_path):
+        path = tmp_path / "empty.json"
+        path.write_text("")
+        with pytest.raises(ValueError):
+            json_from_file(str(path))
+
+    def test_from_bytes(self, simple_dict):
+        d = json_from_bytes(json.dumps(simple_dict).encode())
+        assert d == simple_dict
+
+    def test_adopt(self, simple_dict):
+        d = json_adopt(simple_dict)
+        assert d.dict is simple_dict["dict"]
+
+    def test_adopt_serialization_cache(self, simple_dict):
+        d = json_adopt(simple_dict)
+        assert json.loads(str(d)) == simple_dict
+        assert d.pretty is d.pretty
+        assert json_compact(d) is json_compact(d)
+        d.dict["nested"]["a"] = "b"
+        d.list.append(2)
+        assert json.loads(str(d)) == d
+        assert d["list"] is simple_dict["list"]
+        assert [v for v in d.values()][0] is simple_dict["dict"]
+
+    @pytest.mark.parametrize("encoding", ["utf-8", "utf-8-sig", "utf-16"])
+    def test_json_decode_buffer(self, simple_dict, encoding):
+        data = json.dumps({"text": "caf\u00e9", **simple_dict}).encode(encoding)
+        assert json_decode(memoryview(data)) == {"text": "caf\u00e9", **simple_dict}
+
+    def test_serialization_cache(self, simple_dict):
+        d = JSONAttributeDict(simple_dict)
+        assert d.pretty is d.pretty
+        assert json.loads(json_compact(d)) == simple_dict
+
+        nested = d["dict"]["nested"]
+        assert json.loads(str(d)) == simple_dict
+        nested["a"] = "b"
+        assert json.loads(str(d)) == json.loads(json_compact(d)) == d
+        d.list.append(2)
+        assert json.loads(str(d)) == json.loads(json_compact(d)) == d
+
+    def test_dump_to(self, simple_dict):
+        d = JSONAttributeDict(simple_dict)
+        buffer = io.StringIO()
+        json_dump_to(d, buffer)
+        assert json.loads(buffer.getvalue()) == simple_dict
+
+    def test_keys_not_shadowed(self):
+        keys = ["decoder", "compact", "invalidate", "dump_to"]
+        keys += ["from_file", "from_bytes", "adopt"]
+        document = {key: i for i, key in enumerate(keys)}
+        for d in (JSONAttributeDict(document), json_adopt(dict(document))):
+            assert [getattr(d, key) for key in keys] == list(range(len(keys)))
+
+    def test_invalidate(self, simple_dict):
+        d = json_adopt(simple_dict)
+        nested = d.dict
+        assert json.loads(str(d)) == simple_dict
+        assert d.pretty is d.pretty
+        nested["one"] = 2
+        assert json.loads(str(d))["dict"]["one"] == 2
+        nested["nested"]["a"] = "b"
+        assert json.loads(json_compact(d))["dict"]["nested"]["a"] == "b"
+        pretty = d.pretty
+        json_invalidate(d)
+        assert d.pretty == pretty and d.pretty is not pretty
+
+    def test_invalidate_loaded(self):
+        d = json_from_bytes(b'{"a": {"b": 1}}')
+        x = d["a"]
+        assert json.loads(d.pretty) == {"a": {"b": 1}}
+        x["b"] = 2
+        assert json.loads(d.pretty) == {"a": {"b": 2}}
+        buffer = io.StringIO()
+        x["b"] = 3
+        json_dump_to(d, buffer, indent=2)
+        assert json.loads(buffer.getvalue()) == {"a": {"b": 3}}
+
+    @pytest.mark.parametrize("adopt", [False, True])
+    def test_invalidate_shared(self, simple_dict, adopt):
+        d1 = JSONAttributeDict(simple_dict)
+        d2 = json_adopt({}) if adopt else JSONAttributeDict({})
+        d2["x"] = d1["dict"]
+        d2["y"] = [d1["list"]]
+        nested = d1["dict"]["nested"]
+        assert json.loads(str(d1)) == simple_dict
+        assert json.loads(str(d2))["x"] == simple_dict["dict"]
+        d2["x"]["one"] = 9
+        assert json.loads(str(d1))["dict"]["one"] == 9
+        nested["a"] = "b"
+        assert json.loads(str(d2))["x"]["nested"]["a"] == "b"
+        d1["list"].append(2)
+        assert json.loads(str(d2))["y"] == [[1, 2]]
+
+    def test_nested_attributes(self, nested_document):
+        d = JSONAttributeDict(nested_document)
+        with pytest.raises(AttributeError):
+            d.a.k = 1
+        with pytest.raises(AttributeError):
+            d.x[0].k = 1
+        with pytest.raises(AttributeError):
+            d.x.k = 1
+        assert d == nested_document
+
+    def test_pickle(self, simple_dict):
+        d = json_adopt(simple_dict)
+        copied = pickle.loads(pickle.dumps(d))
+        assert type(copied) is JSONAttributeDict and copied == simple_dict
@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+from cafeteria.datastructs.memory import (
+    Memory,
+    MemorySampler,
+    MemoryUnit,
+    MemoryWatchdog,
+)
+
+
+class TestMemory:
+    def test_parse(self):
+        assert Memory("512 MB") == 512 * 2**20
+        assert Memory(2, MemoryUnit.KB) == 2048
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            Memory("512 parsecs")
+
+
+@pytest.fixture
+def fake_tree(tmp_path):
+    def write(path, content):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+    proc = tmp_path / "proc"
+    cgroup = tmp_path / "cgroup"
+    write(proc / "self" / "statm", "1000 100 50 1 0 10 0\n")
+    write(proc / "self" / "status", "Name:\tpython\nVmHWM:\t  1024 kB\n")
+    write(proc / "self" / "cgroup", "0::/app\n")
+    write(cgroup / "app" / "memory.current", "1048576\n")
+    write(cgroup / "app" / "memory.max", "2097152\n")
+    return proc, cgroup
+
+
+class TestMemorySampler:
+    def test_sample(self, fake_tree):
+        proc, cgroup = fake_tree
+        sampler = MemorySampler(proc_root=str(proc), cgroup_root=str(cgroup))
+        sample = sampler.sample()
+        assert sample.rss == 100 * os.sysconf("SC_PAGE_SIZE")
+        assert sample.rss_peak == Memory("1 MB")
+        assert sample.cgroup_usage == sample.usage == Memory("1 MB")
+        assert sample.cgroup_limit == Memory("2 MB")
+
+        (cgroup / "app" / "memory.current").write_text("2097152\n")
+        (cgroup / "app" / "memory.max").write_text("max\n")
+        sample = sampler.sample()
+        assert sample.usage == Memory("2 MB")
+        assert sample.cgroup_limit is None
+        sampler.close()
+
+    def test_cgroup_v1(self, fake_tree):
+        proc, cgroup = fake_tree
+        (proc / "self" / "cgroup").write_text("4:memory:/not/mounted\n0::/\n")
+        (cgroup / "memory").mkdir()
+        (cgroup / "memory" / "memory.usage_in_bytes").write_text("1024\n")
+        (cgroup / "memory" / "memory.limit_in_bytes").write_text(
+            "9223372036854771712\n"
+        )
+        sampler = MemorySampler(proc_root=str(proc), cgroup_root=str(cgroup))
+        sample = sampler.sample()
+        assert sample.cgroup_usage == 1024
+        assert sample.cgroup_limit is None
+        sampler.close()
+
+    def test_background(self, fake_tree):
+        proc, cgroup = fake_tree
+        samples = []
+        sampler = MemorySampler(
+            interval=0.01, proc_root=str(proc), cgroup_root=str(cgroup)
+        )
+        sampler.add_listener(samples.append)
+        with sampler:
+            assert sampler.latest is not None
+        assert samples
+        sampler.close()
+
+
+class TestMemoryWatchdog:
+    def test_watermarks(self, fake_tree):
+        proc, cgroup = fake_tree
+        current = cgroup / "app" / "memory.current"
+        sampler = MemorySampler(proc_root=str(proc), cgroup_root=str(cgroup))
+        events = []
+        MemoryWatchdog(
+            sampler,
+            soft="100 KB",
+            hard="200 KB",
+            on_soft=lambda s: events.append("soft"),
+            on_hard=lambda s: events.append("hard"),
+            on_recover=lambda s: events.append("recover"),
+            hysteresis=0.1,
+        )
+        for kb in [50, 100, 95, 201, 190, 150, 89]:
+            current.write_text(str(kb * 1024))
+            sampler.sample()
+        assert events == ["soft", "hard", "recover", "recover"]
+        sampler.close()
@@ -0,0 +1,138 @@
+import json
+import pickle
+from array import array
+
+import pytest
+
+from cafeteria.datastructs.dict import AttributeDict
+from cafeteria.datastructs.records import Record, RecordTable, record_class
+
+User = record_class("User", ["id", "name", "score"], defaults={"score": 0.0})
+
+
+@pytest.fixture
+def rows():
+    return [{"id": i, "name": "user{}".format(i), "score": i / 2} for i in range(5)]
+
+
+class TestRecordClass:
+    def test_access(self):
+        user = User(1, name="alice")
+        assert isinstance(user, Record)
+        assert user.id == 1 and user["name"] == "alice" and user.score == 0.0
+        user.score = 1.5
+        user["name"] = "bob"
+        assert user["score"] == 1.5 and user.name == "bob"
+        assert list(user) == ["id", "name", "score"]
+        assert len(user) == 3
+        assert "id" in user and "other" not in user
+        assert user.get("other", 2) == 2
+        assert dict(user.items()) == {"id": 1, "name": "bob", "score": 1.5}
+
+    def test_no_dict(self):
+        user = User(1)
+        assert not hasattr(user, "__dict__")
+        with pytest.raises(AttributeError):
+            user.other = 1
+        with pytest.raises(KeyError):
+            user["other"] = 1
+        with pytest.raises(KeyError):
+            user["other"]
+
+    def test_from_sample(self):
+        sample = AttributeDict(id=1, name="alice", score=2.0)
+        cls = record_class("Sample", sample)
+        assert cls.FIELDS == ("id", "name", "score")
+        assert cls.from_dict(sample).to_attribute_dict() == sample
+        assert cls() == {"id": None, "name": None, "score": None}
+
+    @pytest.mark.parametrize(
+        "fields", [["a", "a"], ["class"], ["not valid"], ["_a"], ["keys"], [1]]
+    )
+    def test_invalid_fields(self, fields):
+        with pytest.raises(ValueError):
+            record_class("Invalid", fields)
+
+    def test_unknown_key(self):
+        with pytest.raises(TypeError):
+            User.from_dict({"id": 1, "other": 2})
+        with pytest.raises(ValueError):
+            record_class("Invalid", ["a"], defaults={"b": 1})
+
+    def test_equality(self):
+        assert User(1, "a") == User(1, "a")
+        assert User(1, "a") != User(2, "a")
+        assert User(1, "a") == {"id": 1, "name": "a", "score": 0.0}
+        assert User(1, "a") != 1
+
+    def test_single_and_empty(self):
+        single = record_class("Single", ["value"])
+        assert single(1).to_dict() == {"value": 1}
+        assert single(1) == single(1)
+        empty = record_class("Empty", [])
+        assert empty().to_dict() == {} and len(empty()) == 0
+
+    def test_pickle(self):
+        user = User(1, "alice", 2.0)
+        assert pickle.loads(pickle.dumps(user)) == user
+
+    def test_repr(self):
+        assert repr(User(1, "a")) == "User(id=1, name='a', score=0.0)"
+
+
+class TestBulkConversion:
+    def test_dicts(self, rows):
+        users = User.from_dicts(rows)
+        assert [user.id for user in users] == list(range(5))
+        assert User.to_dicts(users) == rows
+        attribute_dicts = User.to_dicts(users, attribute_dict=True)
+        assert all(isinstance(d, AttributeDict) for d in attribute_dicts)
+        assert attribute_dicts[1].name == "user1"
+
+    def test_json(self, rows):
+        users = User.from_json(json.dumps(rows))
+        assert users == User.from_dicts(rows)
+        assert json.loads(User.to_json(users)) == rows
+
+
+class TestRecordTable:
+    def test_columns(self, rows):
+        table = RecordTable.from_records(
+            User, rows, typecodes={"id": "q", "score": "d"}
+        )
+        assert len(table) == 5
+        assert isinstance(table.column("id"), array)
+        assert list(table.column("id")) == list(range(5))
+        assert table.column("name") == [row["name"] for row in rows]
+        assert table[2] == User(**rows[2])
+        assert table[-1] == User(**rows[-1])
+        assert table[1:3] == User.from_dicts(rows[1:3])
+        with pytest.raises(IndexError):
+            table[5]
+
+    def test_append_and_set(self, rows):
+        table = RecordTable(User)
+        table.append(User(**rows[0]))
+        table.append(rows[1])
+        table.extend([])
+        table.set(1, "score", 10.0)
+        assert len(table) == 2
+        assert table[1].score == 10.0
+        assert table.to_records() == [User(**rows[0]), User(1, "user1", 10.0)]
+
+    def test_conversion(self, rows):
+        table = RecordTable.from_json(User, json.dumps(rows), typecodes={"id": "q"})
+        assert table.to_dicts() == rows
+        assert table.to_dicts(attribute_dict=True)[0].name == "user0"
+        assert json.loads(table.to_json()) == rows
+
+    def test_invalid_typecodes(self):
+        with pytest.raises(ValueError):
+            RecordTable(User, typecodes={"other": "q"})
+        table = RecordTable(User, typecodes={"score": "d"})
+        with pytest.raises(TypeError):
+            table.append({"id": 1, "score": "one"})
+        with pytest.raises(TypeError):
+            table.extend([{"id": 1}, {"id": 2, "score": "two"}])
+        assert len(table) == 0
+        assert table.column("id") == [] and len(table.column("score")) == 0
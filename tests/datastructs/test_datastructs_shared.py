@@ -0,0 +1,141 @@
+import multiprocessing
+from array import array
+from threading import Event, Thread
+from uuid import uuid4
+
+import pytest
+
+from cafeteria.datastructs.shared import _HEADER, MAGIC, SharedBorgDict
+
+
+@pytest.fixture
+def shared_class():
+    class Shared(SharedBorgDict):
+        SEGMENT_NAME = "cafeteria-test-{}".format(uuid4().hex)
+        SEGMENT_SIZE = 2**16
+
+    yield Shared
+    Shared.unlink()
+
+
+def _child_update(cls_name, size, queue):
+    class Shared(SharedBorgDict):
+        SEGMENT_NAME = cls_name
+        SEGMENT_SIZE = size
+
+    shared = Shared()
+    queue.put(dict(shared.items()))
+    shared["child"] = [1, 2, 3]
+    shared.blob = b"from child"
+
+
+class TestSharedBorgDict:
+    def test_shared_between_instances(self, shared_class):
+        a = shared_class(x=1)
+        b = shared_class()
+        assert b["x"] == 1
+        b.y = "y"
+        assert a.y == "y"
+        assert a == {"x": 1, "y": "y"}
+        assert sorted(a) == ["x", "y"]
+        assert len(a) == 2
+
+    def test_dict_api(self, shared_class):
+        d = shared_class()
+        d.update({"a": 1}, b=2)
+        assert "a" in d
+        assert d.get("missing", 3) == 3
+        assert d.pop("a") == 1
+        del d["b"]
+        assert len(d) == 0
+        d.c = 1
+        d.clear()
+        assert d == {}
+        with pytest.raises(KeyError):
+            _ = d["missing"]
+        with pytest.raises(AttributeError):
+            _ = d.missing
+        with pytest.raises(AttributeError):
+            del d.missing
+
+    def test_view(self, shared_class):
+        d = shared_class(blob=b"abc", numbers=array("l", [1, 2, 3]), other={"a": 1})
+        view = d.view("blob")
+        assert view.readonly
+        assert view.tobytes() == b"abc"
+        assert d.view("numbers").tolist() == [1, 2, 3]
+        assert d["numbers"] == array("l", [1, 2, 3])
+        with pytest.raises(TypeError):
+            d.view("other")
+
+    def test_capacity(self, shared_class):
+        d = shared_class(x=1)
+        with pytest.raises(ValueError):
+            d["big"] = b"0" * shared_class.SEGMENT_SIZE
+        assert d == {"x": 1}
+
+    def test_subclass_separation(self, shared_class):
+        class Other(shared_class):
+            SEGMENT_NAME = "cafeteria-test-{}".format(uuid4().hex)
+
+        try:
+            shared_class(x=1)
+            Other(x=2)
+            assert shared_class()["x"] == 1
+            assert Other()["x"] == 2
+        finally:
+            Other.unlink()
+
+    def test_across_processes(self, shared_class):
+        shared = shared_class(parent=True)
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        process = context.Process(
+            target=_child_update,
+            args=(shared_class.SEGMENT_NAME, shared_class.SEGMENT_SIZE, queue),
+        )
+        process.start()
+        seen = queue.get(timeout=30)
+        process.join(30)
+        assert process.exitcode == 0
+        assert seen == {"parent": True}
+        assert shared["child"] == [1, 2, 3]
+        assert shared.blob == b"from child"
+
+    def test_consistent_reads_during_writes(self, shared_class):
+        shared = shared_class(a=0, b=0)
+        state = shared._shared
+        done = Event()
+        errors = []
+
+        def write():
+            for i in range(1, 300):
+                shared.update(a=i, b=-i)
+            done.set()
+
+        def read():
+            while not done.is_set():
+                items = dict(state.items())
+                sequence, index, _, values = state.state()
+                if items["a"] != -items["b"] or set(values) - set(index):
+                    errors.append(items)
+
+        threads = [Thread(target=write)] + [Thread(target=read) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        assert shared.a == 299 and shared.b == -299
+        assert state.state()[0] % 2 == 0
+
+    def test_interrupted_write(self, shared_class):
+        shared = shared_class(x=1)
+        state = shared._shared
+        # a writer that died after starting to write leaves an odd sequence
+        # number, the previous state remains readable and writable
+        _HEADER.pack_into(state.buffer, 0, MAGIC, state._sequence() + 1)
+        assert shared.x == 1
+        shared.x = 2
+        assert shared.x == 2 and state._sequence() % 2 == 0
+        assert shared_class().x == 2
@@ -0,0 +1,163 @@
+import gc
+import math
+from array import array
+from datetime import timedelta
+from threading import Thread
+
+import pytest
+
+from cafeteria.datastructs.units.data import (
+    DataRateUnit,
+    DataRateUnitArray,
+    DataUnit,
+    DataUnitArray,
+)
+from cafeteria.datastructs.units.meter import RateMeter
+
+
+class TestDataUnit:
+    @pytest.mark.parametrize(
+        "value, bits",
+        [("1 byte", 8), ("512 MiB", 512 * 2**23), ("1.5kB", 12000), (8, 8)],
+    )
+    def test_parse(self, value, bits):
+        assert DataUnit(value) == bits
+
+    def test_conversion(self):
+        assert DataUnit("1 KiB").B == 1024
+        assert DataUnit(2, "GB").MB == 2000
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            DataUnit("1 parsec")
+
+    def test_parse_many(self):
+        values, errors = DataUnit.parse_many(["1 byte", "bad", "2 kb", 3])
+        assert (values[0], values[2], values[3]) == (8, 2000, 3)
+        assert math.isnan(values[1])
+        assert [index for index, _ in errors] == [1]
+        assert isinstance(errors[0][1], ValueError)
+
+
+class TestDataRateUnit:
+    def test_parse(self):
+        assert DataRateUnit("10 Gbps") == DataRateUnit(10, "Gb/s") == 10**10
+        assert DataRateUnit(1) == 1
+
+    def test_parse_many(self):
+        values, errors = DataRateUnit.parse_many(["1 Mbps", "1 MB"])
+        assert values[0] == 10**6
+        assert [index for index, _ in errors] == [1]
+
+
+class TestDataUnitArray:
+    def test_conversion(self):
+        values = DataUnitArray(["1 KiB", "2 KiB", 8192])
+        assert values.to("B") == array("d", [1024, 2048, 1024])
+        assert values[0] == DataUnit("1 KiB")
+        assert isinstance(values[0], DataUnit)
+
+    def test_statistics(self):
+        values = DataUnitArray(range(1, 101), "B")
+        assert values.sum().B == 5050
+        assert values.mean().B == 50.5
+        assert [p.B for p in values.percentiles(0, 50, 100)] == [1, 50.5, 100]
+
+    def test_arithmetic(self):
+        values = DataUnitArray([1, 2], "MB")
+        assert (values + values).to("MB") == array("d", [2, 4])
+        assert (values * 2).to("MB") == array("d", [2, 4])
+        assert values / values == array("d", [1, 1])
+        with pytest.raises(TypeError):
+            values * values
+
+        rates = values / timedelta(seconds=2)
+        assert isinstance(rates, DataRateUnitArray)
+        assert rates.to("MB/s") == array("d", [0.5, 1])
+        assert rates * timedelta(seconds=2) == values
+
+    def test_buffer(self):
+        values = DataUnitArray([1, 2])
+        view = values.buffer
+        assert view.tolist() == [1, 2]
+        assert DataUnitArray.from_buffer(view.tobytes()) == values
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateMeter:
+    def test_rates(self):
+        clock = FakeClock()
+        meter = RateMeter(window=10, ewma_window=1, clock=clock)
+        for second in range(20):
+            meter.record(1000)
+            clock.now = second + 1.0
+            meter.tick()
+
+        assert meter.total == 20000
+        assert meter.current == DataRateUnit(1, "kB/s")
+        assert meter.average == DataRateUnit(1, "kB/s")
+        assert meter.ewma.kBps == pytest.approx(1)
+
+        meter.record(10000)
+        clock.now += 1
+        assert meter.current == DataRateUnit(1.9, "kB/s")
+        assert meter.peak == DataRateUnit(1.9, "kB/s")
+
+    def test_rates_without_ticks(self):
+        clock = FakeClock()
+        meter = RateMeter(window=10, clock=clock)
+        for second in range(100):
+            meter.record(10)
+            clock.now = second + 1.0
+        assert meter.current == DataRateUnit(10, "B/s")
+        assert meter.peak == DataRateUnit(10, "B/s")
+        meter.record(50)
+        clock.now += 5
+        assert meter.current.Bps == pytest.approx(10)
+
+    def test_threads(self):
+        meter = RateMeter()
+
+        def feed():
+            for _ in range(10000):
+                meter.record(1)
+
+        threads = [Thread(target=feed) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert meter.total == 40000
+
+    def test_ended_threads_folded(self):
+        meter = RateMeter()
+        for _ in range(50):
+            thread = Thread(target=meter.record, args=(10,))
+            thread.start()
+            thread.join()
+        gc.collect()
+        assert len(meter._cells) == 0
+        meter.record(5)
+        assert meter.total == 505
+        assert meter.average.Bps > 0
+
+    @pytest.mark.parametrize("window, ewma_window", [(0, 1), (-1, 1), (1, 0)])
+    def test_invalid_windows(self, window, ewma_window):
+        with pytest.raises(ValueError):
+            RateMeter(window=window, ewma_window=ewma_window)
+
+    def test_tiny_window(self):
+        clock = FakeClock()
+        meter = RateMeter(window=1e-9, clock=clock)
+        meter.record(100)
+        clock.now = 1.0
+        meter.tick()
+        clock.now = 2.0
+        assert meter.current.Bps == 0
@@ -0,0 +1,247 @@
+from threading import Barrier, Thread
+
+import pytest
+
+from cafeteria.decorators import (
+    CacheInfo,
+    cached_classproperty,
+    classproperty,
+    invalidate_classproperty,
+    memoize,
+)
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Registry(object):
+    calls = []
+
+    @classproperty
+    def plain(cls):
+        cls.calls.append(("plain", cls))
+        return cls.__name__
+
+    @cached_classproperty
+    def registry(cls):
+        """Expensive registry."""
+        cls.calls.append(("registry", cls))
+        return {"name": cls.__name__}
+
+
+class SubRegistry(Registry):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def reset_registry():
+    Registry.calls.clear()
+    invalidate_classproperty(Registry, "registry", subclasses=True)
+
+
+class TestCachedClassproperty:
+    def test_classproperty_not_cached(self):
+        assert Registry.plain == Registry.plain == "Registry"
+        assert len(Registry.calls) == 2
+
+    def test_cached(self):
+        value = Registry.registry
+        assert value == {"name": "Registry"}
+        assert Registry.registry is value
+        assert Registry().registry is value
+        assert Registry.calls == [("registry", Registry)]
+
+    def test_subclass_separation(self):
+        assert SubRegistry.registry == {"name": "SubRegistry"}
+        assert Registry.registry == {"name": "Registry"}
+        assert SubRegistry.registry is not Registry.registry
+        assert Registry.calls == [("registry", SubRegistry), ("registry", Registry)]
+
+    def test_invalidate(self):
+        base, sub = Registry.registry, SubRegistry.registry
+        invalidate_classproperty(Registry, "registry")
+        assert SubRegistry.registry is sub
+        assert Registry.registry is not base
+
+        invalidate_classproperty(Registry, "registry", subclasses=True)
+        assert SubRegistry.registry is not sub
+        assert len(Registry.calls) == 4
+
+    def test_invalidate_unknown(self):
+        with pytest.raises(AttributeError):
+            invalidate_classproperty(Registry, "plain")
+
+    def test_doc(self):
+        assert Registry.__dict__["registry"].__doc__ == "Expensive registry."
+
+
+class TestMemoize:
+    def test_cache_info(self):
+        calls = []
+
+        @memoize
+        def square(x):
+            calls.append(x)
+            return x * x
+
+        assert [square(2), square(2), square(3)] == [4, 4, 9]
+        assert calls == [2, 3]
+        assert square.cache_info() == CacheInfo(1, 2, 0, 2, 128)
+        assert square.__name__ == "square"
+
+        square.cache_clear()
+        assert square.cache_info() == CacheInfo(0, 0, 0, 0, 128)
+
+    def test_kwargs(self):
+        @memoize()
+        def add(a, b=0):
+            return a + b
+
+        assert add(1, b=2) == 3
+        assert add(1, 2) == 3
+        assert add(1, b=2) == 3
+        assert add.cache_info().hits == 1
+
+    def test_lru(self):
+        calls = []
+
+        @memoize(maxsize=2)
+        def identity(x):
+            calls.append(x)
+            return x
+
+        for x in (1, 2, 1, 3, 1, 2):
+            identity(x)
+        # 2 was evicted by 3, then 3 by 2
+        assert calls == [1, 2, 3, 2]
+        assert identity.cache_info().evictions == 2
+
+    def test_ttl(self):
+        clock = Clock()
+        calls = []
+
+        @memoize(ttl=10, clock=clock)
+        def identity(x):
+            calls.append(x)
+            return x
+
+        identity(1)
+        clock.now = 9.9
+        identity(1)
+        clock.now = 10
+        identity(1)
+        assert calls == [1, 1]
+        assert identity.cache_info() == CacheInfo(1, 2, 1, 1, 128)
+
+    def test_invalidate(self):
+        calls = []
+
+        @memoize
+        def identity(x):
+            calls.append(x)
+            return x
+
+        identity(1)
+        assert identity.invalidate(1)
+        assert not identity.invalidate(1)
+        identity(1)
+        assert calls == [1, 1]
+
+    def test_exceptions_not_cached(self):
+        calls = []
+
+        @memoize
+        def fail(x):
+            calls.append(x)
+            raise ValueError(x)
+
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                fail(1)
+        assert calls == [1, 1]
+
+    def test_paths(self):
+        calls = []
+
+        @memoize(paths=[(0, "user", "id"), "limit"])
+        def recommend(request, limit=10):
+            calls.append((request["user"]["id"], limit))
+            return limit
+
+        recommend({"user": {"id": 1, "tags": ["a"]}})
+        recommend({"user": {"id": 1, "tags": ["b"]}}, limit=10)
+        recommend({"user": {"id": 1}}, 5)
+        recommend({"user": {"id": 2}}, limit=5)
+        assert calls == [(1, 10), (1, 5), (2, 5)]
+
+    def test_unhashable(self):
+        @memoize
+        def identity(x):
+            return x
+
+        with pytest.raises(TypeError):
+            identity({"a": 1})
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            memoize(maxsize=0)(len)
+        with pytest.raises(ValueError):
+            memoize(key=len, paths=[0])(len)
+
+    def test_single_flight(self):
+        threads = 8
+        barrier = Barrier(threads)
+        calls = []
+
+        @memoize
+        def slow(x):
+            calls.append(x)
+            # let every other thread miss and wait on this computation
+            while slow.cache_info().misses < threads:
+                pass
+            return x
+
+        results = []
+
+        def run():
+            barrier.wait()
+            results.append(slow(1))
+
+        workers = [Thread(target=run) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(5)
+        assert results == [1] * threads
+        assert calls == [1]
+
+    def test_single_flight_error(self):
+        threads = 4
+        barrier = Barrier(threads)
+        errors = []
+
+        @memoize
+        def fail():
+            while fail.cache_info().misses < threads:
+                pass
+            raise ValueError("shared")
+
+        def run():
+            barrier.wait()
+            try:
+                fail()
+            except ValueError as e:
+                errors.append(e)
+
+        workers = [Thread(target=run) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(5)
+        assert len(errors) == threads
+        assert len(set(map(id, errors))) == 1
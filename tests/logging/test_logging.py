@@ -0,0 +1,57 @@
+import logging
+
+import pytest
+
+from cafeteria.logging import LoggedObject, LoggingManager
+from cafeteria.logging.trace import TRACE
+
+
+class Traced(LoggedObject):
+    pass
+
+
+@pytest.fixture
+def root_level():
+    level = logging.root.level
+    yield
+    LoggingManager.set_level(level)
+
+
+class TestLoggedObject:
+    def test_logger_resolved_at_class_creation(self):
+        assert Traced.logger is logging.getLogger("{}.Traced".format(__name__))
+        assert Traced.__dict__["logger"] is Traced.logger
+        logger = Traced.logger
+        Traced()
+        assert Traced.logger is logger
+
+    def test_trace_flag(self, root_level, caplog):
+        LoggingManager.set_level(logging.INFO)
+        assert not Traced._trace_enabled
+        with caplog.at_level(TRACE):
+            with Traced():
+                pass
+        assert not caplog.records
+
+        LoggingManager.set_level(TRACE)
+        assert Traced._trace_enabled
+        with caplog.at_level(TRACE):
+            with Traced():
+                pass
+        assert [record.getMessage() for record in caplog.records] == [
+            "Instantiating {0}.Traced".format(__name__),
+            "Entering context for {0}.Traced".format(__name__),
+            "Exiting context for {0}.Traced".format(__name__),
+        ]
+
+    def test_refresh_trace(self, root_level):
+        LoggingManager.set_level(logging.INFO)
+        logger = Traced.logger
+        logger.setLevel(TRACE)
+        try:
+            assert not Traced._trace_enabled
+            LoggedObject.refresh_trace()
+            assert Traced._trace_enabled
+        finally:
+            logger.setLevel(logging.NOTSET)
+            LoggedObject.refresh_trace()
@@ -0,0 +1,301 @@
+import logging
+from inspect import currentframe
+from logging.handlers import BufferingHandler
+
+import pytest
+
+from cafeteria.logging import LoggingManager
+from cafeteria.logging.filters import (
+    DuplicateFilter,
+    KeyedFilter,
+    RateLimitFilter,
+    SamplingFilter,
+    ThrottledLoggerAdapter,
+)
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def buffered():
+    """
+    A logger not propagating to the root, logging to a BufferingHandler.
+    """
+    logger = logging.getLogger("test.filters")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    handler = BufferingHandler(10000)
+    logger.addHandler(handler)
+    yield logger, handler
+    logger.removeHandler(handler)
+    for f in list(logger.filters):
+        logger.removeFilter(f)
+
+
+def messages(handler):
+    return [record.getMessage() for record in handler.buffer]
+
+
+class TestRateLimitFilter:
+    def test_burst_then_rate(self, buffered, clock):
+        logger, handler = buffered
+        logger.addFilter(RateLimitFilter(rate=2, burst=3, clock=clock))
+        for index in range(10):
+            logger.error("failed %d", index)
+        assert messages(handler) == ["failed 0", "failed 1", "failed 2"]
+
+        clock.now = 0.5
+        logger.error("failed %d", 10)
+        logger.error("failed %d", 11)
+        assert messages(handler)[3:] == ["failed 10 (suppressed 7 similar messages)"]
+        assert handler.buffer[3].suppressed == 7
+
+    def test_keyed_by_template(self, buffered, clock):
+        logger, handler = buffered
+        rate_limit = RateLimitFilter(rate=1, burst=1, clock=clock)
+        # records propagated from children only go through handler filters
+        handler.addFilter(rate_limit)
+        for index in range(3):
+            logger.error("a %d", index)
+            logger.error("b %d", index)
+            logging.getLogger("test.filters.child").error("a %d", index)
+        assert messages(handler) == ["a 0", "b 0", "a 0"]
+        assert len(rate_limit) == 3
+        assert rate_limit.suppressed == 6
+
+    def test_lru_eviction(self, clock):
+        rate_limit = RateLimitFilter(rate=1, burst=1, max_keys=2, clock=clock)
+        assert rate_limit.admit("a") == 0
+        assert rate_limit.admit("b") == 0
+        assert rate_limit.admit("a") is None
+        assert rate_limit.admit("c") == 0
+        assert len(rate_limit) == 2
+        assert rate_limit.evictions == 1
+        # b was least recently seen, it starts afresh
+        assert rate_limit.admit("b") == 0
+        assert rate_limit.admit("c") is None
+
+    def test_name_scope(self, buffered, clock):
+        logger, handler = buffered
+        logger.addFilter(
+            RateLimitFilter(rate=1, burst=1, name="test.filters.hot", clock=clock)
+        )
+        for _ in range(3):
+            logger.error("cold")
+        assert messages(handler) == ["cold"] * 3
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            RateLimitFilter(rate=0)
+        with pytest.raises(ValueError):
+            RateLimitFilter(burst=0)
+        with pytest.raises(ValueError):
+            RateLimitFilter(max_keys=0)
+
+
+class TestSamplingFilter:
+    def test_one_in_n(self, buffered):
+        logger, handler = buffered
+        logger.addFilter(SamplingFilter(n=3))
+        for index in range(7):
+            logger.info("item %d", index)
+        assert messages(handler) == [
+            "item 0",
+            "item 3 (suppressed 2 similar messages)",
+            "item 6 (suppressed 2 similar messages)",
+        ]
+
+    def test_global(self):
+        sampling = SamplingFilter(n=2, per_key=False)
+        decisions = [
+            sampling.admit(sampling.key("test", logging.INFO, msg, ()))
+            for msg in ("a", "b", "c", "d")
+        ]
+        assert decisions == [0, None, 1, None]
+        assert len(sampling) == 1
+
+
+class TestDuplicateFilter:
+    def test_suppress_repeats(self, buffered, clock):
+        logger, handler = buffered
+        logger.addFilter(DuplicateFilter(interval=10, clock=clock))
+        for _ in range(5):
+            logger.warning("disk %s full", "/var")
+            logger.warning("disk %s full", "/tmp")
+        logger.error("disk %s full", "/var")
+        assert messages(handler) == [
+            "disk /var full",
+            "disk /tmp full",
+            "disk /var full",
+        ]
+
+        clock.now = 10
+        logger.warning("disk %s full", "/var")
+        assert messages(handler)[-1] == "disk /var full (suppressed 4 similar messages)"
+
+    def test_bad_arguments(self, buffered, clock, monkeypatch):
+        # bad calls are reported by Handler.handleError, not raised
+        monkeypatch.setattr(logging, "raiseExceptions", False)
+        logger, handler = buffered
+        logger.addFilter(DuplicateFilter(interval=10, clock=clock))
+        logger.warning("%d items", "abc")
+        logger.warning("%d items", "abc")
+        clock.now = 10
+        logger.warning("%d items", "abc")
+        assert len(handler.buffer) == 2
+        assert handler.buffer[-1].getMessage() == (
+            "%d items ('abc',) (suppressed 1 similar messages)"
+        )
+
+
+class TestThrottledLoggerAdapter:
+    def test_drops_before_record(self, buffered, clock, monkeypatch):
+        logger, handler = buffered
+        created = []
+        factory = logging.getLogRecordFactory()
+
+        def counting_factory(*args, **kwargs):
+            created.append(args)
+            return factory(*args, **kwargs)
+
+        monkeypatch.setattr(logging, "_logRecordFactory", counting_factory)
+        log = ThrottledLoggerAdapter(
+            logger, RateLimitFilter(rate=1, burst=2, clock=clock)
+        )
+        for index in range(10):
+            log.warning("retry %d", index)
+        clock.now = 1
+        log.warning("retry %d", 10)
+        assert len(created) == 3
+        assert messages(handler) == [
+            "retry 0",
+            "retry 1",
+            "retry 10 (suppressed 8 similar messages)",
+        ]
+
+    def test_short_circuiting_chain(self, buffered, clock):
+        logger, handler = buffered
+        rate_limit = RateLimitFilter(rate=1, burst=1, clock=clock)
+        sampling = SamplingFilter(n=2)
+        log = ThrottledLoggerAdapter(logger, rate_limit, sampling)
+        log.warning("message")
+        # dropped by the rate limit, never seen by the sampling filter
+        log.warning("message")
+        clock.now = 1
+        # admitted by the rate limit, spending its token, dropped by sampling
+        log.warning("message")
+        assert messages(handler) == ["message"]
+        assert rate_limit.suppressed == 1 and sampling.suppressed == 1
+        assert rate_limit.admit(rate_limit.key(logger.name, 0, "message", ())) is None
+
+    def test_abstract_admit(self):
+        class Incomplete(KeyedFilter):
+            pass
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+    def test_disabled_level(self, buffered, clock):
+        logger, handler = buffered
+        rate_limit = RateLimitFilter(rate=1, burst=1, clock=clock)
+        log = ThrottledLoggerAdapter(logger, rate_limit)
+        logger.setLevel(logging.INFO)
+        log.debug("ignored")
+        assert len(rate_limit) == 0
+
+    def test_caller(self, buffered, clock):
+        logger, handler = buffered
+        log = ThrottledLoggerAdapter(logger, RateLimitFilter(clock=clock))
+        line = currentframe().f_lineno
+        log.warning("warning")
+        log.log(logging.INFO, "info")
+        log.info("info", stacklevel=1)
+        for record in handler.buffer:
+            assert record.pathname == __file__
+            assert record.funcName == "test_caller"
+        assert [record.lineno for record in handler.buffer] == [
+            line + 1,
+            line + 2,
+            line + 3,
+        ]
+
+    def test_bad_arguments(self, buffered, clock, monkeypatch):
+        # bad calls are reported by Handler.handleError, not raised
+        monkeypatch.setattr(logging, "raiseExceptions", False)
+        logger, handler = buffered
+        log = ThrottledLoggerAdapter(
+            logger, RateLimitFilter(rate=1, burst=1, clock=clock)
+        )
+        for _ in range(2):
+            log.warning("%d items", "abc")
+        clock.now = 1
+        log.warning("%d items", "abc")
+        assert handler.buffer[0].args == ("abc",)
+        assert handler.buffer[1].getMessage() == (
+            "%d items ('abc',) (suppressed 1 similar messages)"
+        )
+
+    def test_filters_out_of_scope(self, buffered):
+        logger, handler = buffered
+        log = ThrottledLoggerAdapter(logger, SamplingFilter(n=2, name="other"))
+        assert not log.filters
+
+
+class TestDictConfig:
+    def test_load_config(self, tmp_path):
+        pytest.importorskip("yaml")
+        config = tmp_path / "logging.yaml"
+        config.write_text(
+            """
+version: 1
+disable_existing_loggers: false
+filters:
+  rate_limit:
+    (): cafeteria.logging.filters.RateLimitFilter
+    rate: 5
+    burst: 2
+    max_keys: 128
+  duplicates:
+    (): cafeteria.logging.filters.DuplicateFilter
+    interval: 30
+handlers:
+  buffer:
+    class: logging.handlers.BufferingHandler
+    capacity: 1000
+    filters: [duplicates]
+loggers:
+  test.filters.yaml:
+    level: DEBUG
+    propagate: false
+    handlers: [buffer]
+    filters: [rate_limit]
+"""
+        )
+        LoggingManager.load_config(str(config))
+        logger = logging.getLogger("test.filters.yaml")
+        try:
+            (rate_limit,) = logger.filters
+            assert isinstance(rate_limit, RateLimitFilter)
+            assert (rate_limit.rate, rate_limit.burst) == (5, 2)
+            assert rate_limit.max_keys == 128
+            (handler,) = logger.handlers
+            assert isinstance(handler.filters[0], DuplicateFilter)
+
+            for _ in range(5):
+                logger.error("hot loop")
+            assert messages(handler) == ["hot loop"]
+            assert rate_limit.suppressed == 3
+        finally:
+            logger.handlers = []
+            logger.filters = []
@@ -0,0 +1,144 @@
+import io
+import logging
+from threading import Event
+
+import pytest
+
+from cafeteria.logging import LoggingManager
+from cafeteria.logging.queued import OverflowPolicy, QueuedLogging
+
+
+class CountingStream(io.StringIO):
+    def __init__(self):
+        super(CountingStream, self).__init__()
+        self.writes = 0
+
+    def write(self, s):
+        self.writes += 1
+        return super(CountingStream, self).write(s)
+
+
+class BlockedHandler(logging.Handler):
+    """
+    A handler blocking the listener until released.
+    """
+
+    def __init__(self):
+        super(BlockedHandler, self).__init__()
+        self.entered = Event()
+        self.released = Event()
+        self.records = []
+
+    def emit(self, record):
+        self.entered.set()
+        self.released.wait(5)
+        self.records.append(record.getMessage())
+
+
+def record(message):
+    return logging.LogRecord("test", logging.INFO, __file__, 1, message, (), None)
+
+
+def fill(queued, blocked, count):
+    """
+    Block the listener on a first record, then queue count records.
+    """
+    queued.handler.handle(record("first"))
+    assert blocked.entered.wait(5)
+    for index in range(count):
+        queued.handler.handle(record(str(index)))
+
+
+class TestQueuedLogging:
+    def test_batched_writes(self):
+        stream = CountingStream()
+        handler = logging.StreamHandler(stream)
+        blocked = BlockedHandler()
+        queued = QueuedLogging([blocked, handler], maxsize=100)
+        queued.start()
+        fill(queued, blocked, 10)
+        blocked.released.set()
+        queued.stop()
+        assert stream.getvalue().splitlines() == ["first"] + [
+            str(index) for index in range(10)
+        ]
+        # one write for the first record, one for the batch queued behind it
+        assert stream.writes == 2
+        metrics = queued.metrics()
+        assert metrics["processed"] == 11
+        assert metrics["batches"] == 2
+        assert metrics["depth"] == 0
+
+    def test_handler_level(self):
+        stream = io.StringIO()
+        handler = logging.StreamHandler(stream)
+        handler.setLevel(logging.WARNING)
+        queued = QueuedLogging([handler])
+        queued.start()
+        queued.handler.handle(record("info"))
+        queued.stop()
+        assert stream.getvalue() == ""
+
+    @pytest.mark.parametrize(
+        "overflow,expected",
+        [
+            (OverflowPolicy.DROP, ["first", "0", "1"]),
+            ("drop_oldest", ["first", "3", "4"]),
+        ],
+    )
+    def test_drop(self, overflow, expected):
+        blocked = BlockedHandler()
+        queued = QueuedLogging([blocked], maxsize=2, overflow=overflow)
+        queued.start()
+        fill(queued, blocked, 5)
+        assert queued.depth == 2
+        assert queued.dropped == 3
+        blocked.released.set()
+        queued.stop()
+        assert blocked.records == expected
+
+    def test_block_timeout(self):
+        blocked = BlockedHandler()
+        queued = QueuedLogging([blocked], maxsize=1, timeout=0.01)
+        queued.start()
+        fill(queued, blocked, 2)
+        assert queued.dropped == 1
+        blocked.released.set()
+        queued.stop()
+        assert blocked.records == ["first", "0"]
+
+
+class TestLoggingManagerAsync:
+    @pytest.fixture
+    def root(self):
+        root = logging.getLogger()
+        handlers, level = root.handlers[:], root.level
+        for handler in handlers:
+            root.removeHandler(handler)
+        yield root
+        LoggingManager.disable_async()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        for handler in handlers:
+            root.addHandler(handler)
+        root.setLevel(level)
+
+    def test_enable_disable(self, root):
+        stream = io.StringIO()
+        handler = logging.StreamHandler(stream)
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+
+        queued = LoggingManager.enable_async(maxsize=10)
+        assert LoggingManager.enable_async() is queued
+        assert queued.handler in root.handlers
+        assert handler not in root.handlers
+        LoggingManager.set_level(logging.WARNING)
+        assert handler.level == logging.WARNING
+        logging.getLogger("queued").warning("message")
+
+        LoggingManager.disable_async()
+        assert handler in root.handlers
+        assert queued.handler not in root.handlers
+        assert stream.getvalue() == "message\n"
+        assert not queued.running
@@ -0,0 +1,153 @@
+import gc
+import logging
+import random
+from threading import Thread
+from time import sleep
+
+import pytest
+
+from cafeteria.logging import timing
+from cafeteria.logging.timing import (
+    Histogram,
+    TimingEmitter,
+    TimingRegistry,
+    timed,
+)
+
+
+@pytest.fixture
+def enabled():
+    timing.enable()
+    yield
+    timing.disable()
+
+
+class TestHistogram:
+    def test_buckets(self):
+        histogram = Histogram(precision_bits=5)
+        for value in [0, 1, 63, 64, 1000, 123456789]:
+            index = histogram.index_of(value)
+            assert abs(histogram.value_at(index) - value) <= value / 32
+        indices = [histogram.index_of(value) for value in range(10000)]
+        assert indices == sorted(indices)
+
+    def test_quantiles(self):
+        histogram = Histogram()
+        values = list(range(1, 10001))
+        random.Random(0).shuffle(values)
+        for value in values:
+            histogram.record(value)
+        snapshot = histogram.snapshot()
+        assert snapshot.count == 10000
+        assert snapshot.mean == pytest.approx(5000.5)
+        for q, expected in [(0.5, 5000), (0.99, 9900), (0.999, 9990)]:
+            assert snapshot.quantile(q) == pytest.approx(expected, rel=1 / 32)
+        assert snapshot.p99 == snapshot.quantile(0.99)
+        assert snapshot.min == 1
+        assert snapshot.max == pytest.approx(10000, rel=1 / 32)
+
+    def test_empty(self):
+        snapshot = Histogram().snapshot()
+        assert snapshot.count == 0
+        assert snapshot.p50 == 0
+        with pytest.raises(ValueError):
+            snapshot.quantile(2)
+
+    def test_reset(self):
+        histogram = Histogram()
+        histogram.record(10)
+        assert histogram.snapshot(reset=True).count == 1
+        assert histogram.snapshot().count == 0
+        histogram.record(1000)
+        snapshot = histogram.snapshot()
+        assert snapshot.count == 1
+        assert snapshot.total == 1000
+
+    def test_threads(self):
+        histogram = Histogram()
+
+        def worker():
+            for value in range(10000):
+                histogram.record(value)
+
+        threads = [Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        snapshot = histogram.snapshot()
+        assert snapshot.count == 40000
+        assert snapshot.total == 4 * sum(range(10000))
+
+    def test_ended_threads_merged(self):
+        histogram = Histogram()
+        histogram.record(1)
+        reset = histogram.snapshot(reset=True)
+        for value in range(50):
+            thread = Thread(target=histogram.record, args=(value,))
+            thread.start()
+            thread.join()
+        gc.collect()
+        assert len(histogram._shards) == 1
+        snapshot = histogram.snapshot()
+        assert (reset.count, snapshot.count) == (1, 50)
+        assert snapshot.total == sum(range(50))
+        assert (snapshot.min, snapshot.max) == (0, 49)
+
+
+class TestTimed:
+    def test_disabled(self):
+        registry = TimingRegistry()
+
+        @timed("call", registry)
+        def call():
+            return 1
+
+        assert call() == 1
+        with timed("block", registry):
+            pass
+        assert all(s.count == 0 for s in registry.snapshot().values())
+
+    def test_enabled(self, enabled):
+        registry = TimingRegistry()
+
+        @timed("call", registry)
+        def call(value):
+            return value
+
+        assert call(2) == 2
+        assert call.__name__ == "call"
+        with pytest.raises(ZeroDivisionError):
+            with timed("block", registry):
+                1 / 0
+        snapshots = registry.snapshot()
+        assert snapshots["call"].count == 1
+        assert snapshots["block"].count == 1
+        assert snapshots["block"].total > 0
+
+
+class TestTimingEmitter:
+    def test_emit(self, enabled, caplog):
+        registry = TimingRegistry()
+        with timed("request", registry):
+            pass
+        registry.histogram("idle")
+        emitter = TimingEmitter(registry, level=logging.DEBUG)
+        with caplog.at_level(logging.DEBUG, logger=timing.__name__):
+            snapshots = emitter.emit()
+        assert snapshots["request"].count == 1
+        assert len(caplog.records) == 1
+        assert caplog.records[0].getMessage().startswith("request count=1 ")
+        assert registry.histogram("request").snapshot().count == 0
+
+    def test_background(self, enabled, caplog):
+        registry = TimingRegistry()
+        with timed("request", registry):
+            pass
+        with caplog.at_level(logging.DEBUG, logger=timing.__name__):
+            with TimingEmitter(registry, interval=0.01, level=logging.DEBUG):
+                for _ in range(100):
+                    if caplog.records:
+                        break
+                    sleep(0.01)
+        assert caplog.records
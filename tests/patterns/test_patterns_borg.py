@@ -0,0 +1,105 @@
+from threading import Barrier, Thread
+from time import sleep
+
+from cafeteria.datastructs.dict import SnapshotBorgDict
+from cafeteria.patterns.borg import Borg, BorgStateManager, SnapshotBorg
+
+
+def run_threads(target, count=16):
+    threads = [Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class TestBorgStateManager:
+    def test_concurrent_first_instantiation(self):
+        for _ in range(20):
+            calls = []
+
+            class SlowBorg(Borg):
+                @classmethod
+                def init_state(cls):
+                    calls.append(1)
+                    sleep(0.001)
+                    return {}
+
+            barrier = Barrier(16)
+            states = []
+
+            def create():
+                barrier.wait()
+                states.append(SlowBorg().__dict__)
+
+            run_threads(create)
+            assert len(calls) == 1
+            assert all(state is states[0] for state in states)
+
+    def test_separate_class_states(self):
+        class Parent(Borg):
+            pass
+
+        class Child(Parent):
+            pass
+
+        Parent().value = 1
+        Child().value = 2
+        assert Parent().value == 1
+        assert BorgStateManager.get_state(Child) == {"value": 2}
+
+
+class TestSnapshotBorg:
+    def test_shared_state(self):
+        class Config(SnapshotBorg):
+            pass
+
+        a, b = Config(), Config()
+        snapshot = a.snapshot
+        a.value = 1
+        b.update(other=2)
+        assert (b.value, a.other) == (1, 2)
+        assert snapshot == {}
+
+        del b.value
+        assert not hasattr(a, "value")
+
+    def test_concurrent_writes(self):
+        class Counters(SnapshotBorg):
+            pass
+
+        writers = iter(range(8))
+
+        def write():
+            borg, writer = Counters(), next(writers)
+            for i in range(100):
+                borg.update({(writer, i): i})
+
+        run_threads(write, count=8)
+        assert len(Counters().snapshot) == 800
+
+
+class TestSnapshotBorgDict:
+    def test_dict_api(self):
+        class Registry(SnapshotBorgDict):
+            pass
+
+        Registry(a=1)["b"] = 2
+        registry = Registry()
+        assert registry == {"a": 1, "b": 2}
+        assert registry.a == 1
+        assert registry.pop("a") == 1
+        del registry["b"]
+        assert len(registry) == 0
+
+    def test_keys_named_as_attributes(self):
+        class Registry(SnapshotBorgDict):
+            pass
+
+        registry = Registry(snapshot=1, _snapshot_state=2)
+        assert len(registry) == 2
+        assert registry["snapshot"] == 1 and registry["_snapshot_state"] == 2
+        registry["update"] = 3
+        registry.update(a=1)
+        assert registry == {"snapshot": 1, "_snapshot_state": 2, "update": 3, "a": 1}
+        assert registry.a == 1 and callable(registry.update)
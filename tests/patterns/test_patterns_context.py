@@ -0,0 +1,506 @@
+import asyncio
+from itertools import count
+from threading import Barrier, Thread
+
+import pytest
+
+from cafeteria.patterns.context import (
+    AsyncSessionManager,
+    AsyncSessionPool,
+    SessionManager,
+    SessionPool,
+    _PooledSession,
+)
+
+
+class FakeSession:
+    ids = count()
+
+    def __init__(self, *args, **kwargs):
+        self.id = next(self.ids)
+        self.args = args
+        self.kwargs = kwargs
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class TestSessionManager:
+    def test_context(self):
+        manager = SessionManager(FakeSession, 1, key="value")
+        with manager as session:
+            assert session.args == (1,)
+            assert session.kwargs == {"key": "value"}
+        assert session.closed
+        assert manager.session is None
+
+
+class TestSessionPool:
+    def test_reuse(self):
+        pool = SessionPool(FakeSession, "dsn", max_size=2)
+        with pool as first:
+            assert first.args == ("dsn",)
+        with pool as second:
+            assert second is first
+        assert not first.closed
+        stats = pool.stats
+        assert stats.creations == 1
+        assert stats.checkouts == 2
+        assert stats.in_use == 0
+        assert stats.idle == 1
+
+    def test_nested_context(self):
+        pool = SessionPool(FakeSession, max_size=2)
+        with pool as outer:
+            with pool as inner:
+                assert inner is not outer
+                assert pool.stats.in_use == 2
+            assert pool.stats.in_use == 1
+        assert pool.stats.in_use == 0
+
+    def test_min_size(self):
+        pool = SessionPool(FakeSession, min_size=2, max_size=4)
+        assert pool.stats.creations == 2
+        assert pool.stats.idle == 2
+
+    def test_invalid_sizes(self):
+        with pytest.raises(ValueError):
+            SessionPool(FakeSession, min_size=3, max_size=2)
+
+    def test_timeout(self):
+        pool = SessionPool(FakeSession, max_size=1)
+        session = pool.acquire()
+        with pytest.raises(TimeoutError):
+            pool.acquire(timeout=0.01)
+        pool.release(session)
+        assert pool.acquire(timeout=0.01) is session
+        stats = pool.stats
+        assert stats.timeouts == 1
+        assert stats.max_wait_time >= 0.01
+
+    def test_blocking_checkout(self):
+        pool = SessionPool(FakeSession, max_size=1)
+        session = pool.acquire()
+        result = []
+        thread = Thread(target=lambda: result.append(pool.acquire()))
+        thread.start()
+        thread.join(0.05)
+        assert thread.is_alive()
+        pool.release(session)
+        thread.join(5)
+        assert result == [session]
+
+    def test_idle_eviction(self, clock):
+        pool = SessionPool(
+            FakeSession, min_size=1, max_size=3, idle_timeout=10, clock=clock
+        )
+        a, b, c = pool.acquire(), pool.acquire(), pool.acquire()
+        for session in (a, b, c):
+            pool.release(session)
+        clock.now = 11
+        pool.maintain()
+        assert [a.closed, b.closed, c.closed] == [True, True, False]
+        stats = pool.stats
+        assert stats.size == 1
+        assert stats.evictions == 2
+
+    def test_max_lifetime(self, clock):
+        pool = SessionPool(FakeSession, max_lifetime=60, clock=clock)
+        first = pool.acquire()
+        pool.release(first)
+        clock.now = 61
+        second = pool.acquire()
+        assert second is not first
+        assert first.closed
+        clock.now = 200
+        pool.release(second)
+        assert second.closed
+        assert pool.stats.size == 0
+
+    def test_validate(self):
+        pool = SessionPool(FakeSession, validate=lambda session: session.id % 2)
+        sessions = [pool.acquire() for _ in range(2)]
+        for session in sessions:
+            pool.release(session)
+        session = pool.acquire()
+        assert session.id % 2
+        stats = pool.stats
+        assert stats.validation_failures <= 1
+        assert stats.size == stats.in_use + stats.idle
+
+    def test_release_discard(self):
+        pool = SessionPool(FakeSession)
+        session = pool.acquire()
+        pool.release(session, discard=True)
+        assert session.closed
+        assert pool.stats.size == 0
+        with pytest.raises(ValueError):
+            pool.release(session)
+
+    def test_factory_failure(self):
+        def factory():
+            raise OSError("connection refused")
+
+        pool = SessionPool(factory, max_size=1)
+        for _ in range(2):
+            with pytest.raises(OSError):
+                pool.acquire()
+        assert pool.stats.size == 0
+
+    def test_maintain_failure(self):
+        calls = count()
+
+        def factory():
+            if next(calls) == 1:
+                raise OSError("connection refused")
+            return FakeSession()
+
+        pool = SessionPool(factory, max_size=3)
+        pool.min_size = 3
+        with pytest.raises(OSError):
+            pool.maintain()
+        assert pool.stats.size == 1
+        sessions = [pool.acquire(timeout=0.1) for _ in range(3)]
+        assert pool.stats.in_use == 3
+        for session in sessions:
+            pool.release(session)
+
+    def test_close(self):
+        pool = SessionPool(FakeSession, min_size=1)
+        idle = pool.acquire()
+        used = pool.acquire()
+        pool.release(idle)
+        pool.close()
+        assert idle.closed
+        assert not used.closed
+        pool.release(used)
+        assert used.closed
+        with pytest.raises(RuntimeError):
+            pool.acquire()
+
+    def test_concurrency(self):
+        threads, iterations, max_size = 8, 200, 3
+        pool = SessionPool(FakeSession, max_size=max_size)
+        barrier = Barrier(threads)
+        in_use, peak, errors = set(), [0], []
+
+        def worker():
+            barrier.wait()
+            for _ in range(iterations):
+                with pool.session() as session:
+                    if session.id in in_use:
+                        errors.append(session)
+                    in_use.add(session.id)
+                    peak[0] = max(peak[0], len(in_use))
+                    in_use.discard(session.id)
+
+        workers = [Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        stats = pool.stats
+        assert not errors
+        assert peak[0] <= max_size
+        assert stats.creations <= max_size
+        assert stats.checkouts == threads * iterations
+        assert stats.in_use == 0
+        assert stats.waiting == 0
+
+
+class FakeAsyncSession(FakeSession):
+    async def aclose(self):
+        await asyncio.sleep(0)
+        self.closed = True
+
+
+class FakeAsyncFactory:
+    """
+    An in-process async session factory, taking `delay` seconds to connect.
+    """
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.sessions = []
+        self.concurrent = self.peak = 0
+
+    async def __call__(self, *args, **kwargs):
+        self.concurrent += 1
+        self.peak = max(self.peak, self.concurrent)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise OSError("connection refused")
+        finally:
+            self.concurrent -= 1
+        session = FakeAsyncSession(*args, **kwargs)
+        self.sessions.append(session)
+        return session
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class TestAsyncSessionManager:
+    def test_async_factory(self):
+        async def main():
+            manager = AsyncSessionManager(FakeAsyncFactory(), 1, key="value")
+            async with manager as session:
+                assert session.kwargs == {"key": "value"}
+            assert session.closed
+            assert manager.session is None
+
+        run(main())
+
+    def test_sync_factory(self):
+        async def main():
+            manager = AsyncSessionManager(FakeSession)
+            await manager.open()
+            session = manager.session
+            await manager.aclose()
+            assert session.closed
+
+        run(main())
+
+
+class TestAsyncSessionPool:
+    def test_reuse(self):
+        async def main():
+            pool = AsyncSessionPool(FakeAsyncFactory(), "dsn", max_size=2)
+            async with pool as first:
+                assert first.args == ("dsn",)
+            async with pool.session() as second:
+                assert second is first
+            stats = pool.stats
+            assert stats.creations == 1
+            assert stats.checkouts == 2
+            assert stats.idle == 1
+            await pool.close()
+            assert first.closed
+
+        run(main())
+
+    def test_concurrent_warm_up(self):
+        async def main():
+            factory = FakeAsyncFactory(delay=0.01)
+            pool = AsyncSessionPool(factory, min_size=4, max_size=8)
+            await pool.open()
+            assert factory.peak == 4
+            assert pool.stats.idle == 4
+
+        run(main())
+
+    def test_warm_up_failure(self):
+        async def main():
+            pool = AsyncSessionPool(FakeAsyncFactory(fail=True), min_size=2)
+            with pytest.raises(OSError):
+                await pool.open()
+            assert pool.stats.size == 0
+
+        run(main())
+
+    def test_fifo_waiters(self):
+        async def main():
+            pool = AsyncSessionPool(FakeAsyncFactory(), max_size=1)
+            session = await pool.acquire()
+            order = []
+
+            async def waiter(name):
+                got = await pool.acquire()
+                order.append(name)
+                await pool.release(got)
+
+            tasks = []
+            for name in range(5):
+                tasks.append(asyncio.ensure_future(waiter(name)))
+                await asyncio.sleep(0)
+            assert pool.stats.waiting == 5
+            await pool.release(session)
+            await asyncio.gather(*tasks)
+            assert order == list(range(5))
+
+        run(main())
+
+    def test_timeout(self):
+        async def main():
+            pool = AsyncSessionPool(FakeAsyncFactory(), max_size=1)
+            session = await pool.acquire()
+            with pytest.raises(TimeoutError):
+                await pool.acquire(timeout=0.01)
+            stats = pool.stats
+            assert stats.timeouts == 1
+            assert stats.waiting == 0
+            await pool.release(session)
+            assert await pool.acquire(timeout=0.01) is session
+
+        run(main())
+
+    def test_cancelled_waiter(self):
+        async def main():
+            pool = AsyncSessionPool(FakeAsyncFactory(), max_size=1)
+            session = await pool.acquire()
+            cancelled = asyncio.ensure_future(pool.acquire())
+            waiting = asyncio.ensure_future(pool.acquire())
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await pool.release(session)
+            assert await waiting is session
+            assert cancelled.cancelled()
+
+        run(main())
+
+    def test_cancelled_after_handoff(self):
+        async def main():
+            pool = AsyncSessionPool(FakeAsyncFactory(), max_size=1)
+            session = await pool.acquire()
+            first = asyncio.ensure_future(pool.acquire())
+            second = asyncio.ensure_future(pool.acquire())
+            await asyncio.sleep(0)
+            # hand the session to the first waiter, then cancel it before it
+            # resumes
+            await pool.release(session)
+            first.cancel()
+            assert await second is session
+            assert first.cancelled()
+            assert pool.stats.in_use == 1
+
+        run(main())
+
+    def test_cancelled_create(self):
+        async def main():
+            pool = AsyncSessionPool(FakeAsyncFactory(delay=1), max_size=1)
+            task = asyncio.ensure_future(pool.acquire())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert pool.stats.size == 0
+
+        run(main())
+
+    def test_validate(self):
+        broken = set()
+
+        async def validate(session):
+            return session.id not in broken
+
+        async def main():
+            pool = AsyncSessionPool(FakeSession, validate=validate, max_size=1)
+            session = await pool.acquire()
+            await pool.release(session)
+            broken.add(session.id)
+            replacement = await pool.acquire()
+            assert session.closed
+            assert replacement is not session
+            stats = pool.stats
+            assert stats.validation_failures == 1
+            assert stats.size == 1
+
+        run(main())
+
+    def test_validate_not_created(self):
+        validated = []
+
+        def validate(session):
+            validated.append(session)
+            return False
+
+        async def main():
+            pool = AsyncSessionPool(FakeSession, validate=validate, max_size=2)
+            sessions = [await pool.acquire() for _ in range(2)]
+            assert not validated
+            for session in sessions:
+                await pool.release(session)
+            replacement = await pool.acquire()
+            assert validated == sessions[::-1]
+            assert replacement not in sessions
+            assert pool.stats.size == 1
+            assert pool.stats.validation_failures == 2
+
+        run(main())
+
+    def test_validation_failures_bounded(self):
+        async def main():
+            pool = AsyncSessionPool(FakeSession, max_size=2)
+
+            def validate(session):
+                # another task keeps returning broken sessions meanwhile
+                pool._size += 1
+                pool._idle.append(_PooledSession(FakeSession(), pool._clock()))
+                return False
+
+            await pool.release(await pool.acquire())
+            pool.validate = validate
+            with pytest.raises(RuntimeError):
+                await pool.acquire()
+            assert pool.stats.validation_failures == 3
+
+        run(main())
+
+    def test_release_discard_serves_waiter(self):
+        async def main():
+            factory = FakeAsyncFactory()
+            pool = AsyncSessionPool(factory, max_size=1)
+            session = await pool.acquire()
+            waiting = asyncio.ensure_future(pool.acquire())
+            await asyncio.sleep(0)
+            await pool.release(session, discard=True)
+            replacement = await waiting
+            assert session.closed
+            assert replacement is not session
+            assert pool.stats.size == 1
+
+        run(main())
+
+    def test_close(self):
+        async def main():
+            pool = AsyncSessionPool(FakeAsyncFactory(), max_size=1)
+            session = await pool.acquire()
+            waiting = asyncio.ensure_future(pool.acquire())
+            await asyncio.sleep(0)
+            await pool.aclose()
+            with pytest.raises(RuntimeError):
+                await waiting
+            await pool.release(session)
+            assert session.closed
+            assert pool.stats.size == 0
+
+        run(main())
+
+    def test_concurrency(self):
+        async def main():
+            factory = FakeAsyncFactory(delay=0.001)
+            pool = AsyncSessionPool(factory, max_size=3, timeout=5)
+            in_use = set()
+
+            async def worker():
+                for _ in range(50):
+                    async with pool as session:
+                        assert session.id not in in_use
+                        in_use.add(session.id)
+                        await asyncio.sleep(0)
+                        in_use.discard(session.id)
+
+            await asyncio.gather(*(worker() for _ in range(10)))
+            stats = pool.stats
+            assert stats.creations <= 3
+            assert stats.checkouts == 500
+            assert stats.in_use == stats.waiting == 0
+
+        run(main())
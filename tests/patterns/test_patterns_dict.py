@@ -0,0 +1,52 @@
+import pytest
+
+from cafeteria.patterns.dict import compile_path, extract_columns, get_by_path
+
+
+@pytest.fixture
+def nested_dict():
+    return {"a": {"b": {"c": 1}}, "x": 2}
+
+
+class TestCompilePath:
+    @pytest.mark.parametrize(
+        "path", [("a", "b", "c"), ("a", "b"), ("x",), ("a", "z", "c"), ("z",)]
+    )
+    def test_matches_get_by_path(self, nested_dict, path):
+        accessor = compile_path(*path)
+        assert accessor(nested_dict) == get_by_path(nested_dict, *path)
+        assert accessor(nested_dict, default=3) == get_by_path(
+            nested_dict, *path, default=3
+        )
+
+    def test_cached_by_path(self):
+        assert compile_path("a", "b") is compile_path("a", "b")
+
+    def test_empty_path(self):
+        with pytest.raises(ValueError):
+            compile_path()
+
+
+class TestExtractColumns:
+    def test_columns(self, nested_dict):
+        records = [nested_dict, {"x": 3}]
+        cs, xs = extract_columns(
+            records, ("a", "b", "c"), "x", default=0, as_arrays=False
+        )
+        assert cs == [1, 0]
+        assert xs == [2, 3]
+
+    def test_list_values(self):
+        records = [{"tags": ["a", "b"]}, {"tags": ["c"]}, {"tags": []}]
+        (tags,) = extract_columns(records, "tags", as_arrays=False)
+        assert tags == [["a", "b"], ["c"], []]
+
+    @pytest.mark.parametrize(
+        "values", [[["a", "b"], ["c"]], [[1, 2], [3, 4]], [{"k": 1}, None]]
+    )
+    def test_list_values_as_arrays(self, values):
+        numpy = pytest.importorskip("numpy")
+        (column,) = extract_columns([{"v": v} for v in values], "v")
+        assert isinstance(column, numpy.ndarray)
+        assert column.shape == (len(values),)
+        assert list(column) == values
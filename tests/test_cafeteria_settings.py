@@ -0,0 +1,185 @@
+import os
+import signal
+
+import pytest
+
+from cafeteria.datastructs.memory import GB, MB, Memory
+from cafeteria.datastructs.units.data import DataRateUnit, DataUnit
+from cafeteria.settings import Setting, Settings, SettingsError, coerce
+
+
+class AppSettings(Settings):
+    ENV_PREFIX = "APP_"
+
+    workers = Setting(4, int)
+    debug = Setting(False, bool)
+    memory_limit = Setting("512 MB", Memory, config=("limits", "memory"))
+    bandwidth = Setting("10 Mbps", DataRateUnit)
+    chunk = Setting("64 KiB", DataUnit, env="CHUNK_SIZE")
+    hosts = Setting("localhost", list)
+    name = Setting(None, env=False)
+
+
+class ExtendedSettings(AppSettings):
+    token = Setting(required=True)
+
+
+class TestCoerce:
+    @pytest.mark.parametrize(
+        "value, expected",
+        [("true", True), ("Yes", True), ("1", True), ("off", False), (0, False)],
+    )
+    def test_bool(self, value, expected):
+        assert coerce(value, bool) is expected
+
+    def test_bool_invalid(self):
+        with pytest.raises(ValueError):
+            coerce("maybe", bool)
+
+    def test_units(self):
+        assert coerce("1 GB", Memory) == GB
+        assert coerce(1024, Memory) == 1024
+        assert isinstance(coerce(1024, Memory), Memory)
+        assert coerce("1 kB", DataUnit) == 8000
+        assert coerce("1 kbps", DataRateUnit) == 1000
+
+    def test_sequences(self):
+        assert coerce("a, b,,c", list) == ["a", "b", "c"]
+        assert coerce("a,b", tuple) == ("a", "b")
+        assert coerce(["a"], list) == ["a"]
+
+    def test_passthrough(self):
+        assert coerce(None, int) is None
+        assert coerce("x", None) == "x"
+        assert coerce("2", lambda v: int(v) * 2) == 4
+
+
+class TestSettings:
+    def test_defaults(self):
+        settings = AppSettings(environ={})
+        snapshot = settings.snapshot
+        assert snapshot.workers == 4
+        assert snapshot.debug is False
+        assert snapshot.memory_limit == 512 * MB
+        assert isinstance(snapshot.memory_limit, Memory)
+        assert snapshot.bandwidth == 10**7
+        assert snapshot.chunk == 64 * 1024 * 8
+        assert snapshot.hosts == ["localhost"]
+        assert snapshot.name is None
+        assert settings.workers == 4
+
+    def test_priority(self):
+        settings = AppSettings(
+            config={"workers": 2, "debug": True, "limits": {"memory": "1 GB"}},
+            environ={"APP_WORKERS": "8", "CHUNK_SIZE": "1 MiB", "APP_NAME": "x"},
+            overrides={"debug": "no"},
+        )
+        snapshot = settings.snapshot
+        assert snapshot.workers == 8
+        assert snapshot.debug is False
+        assert snapshot.memory_limit == GB
+        assert snapshot.chunk == 2**20 * 8
+        assert snapshot.name is None
+
+    def test_none_falls_through(self):
+        settings = AppSettings(
+            config={"workers": None, "debug": True, "limits": {"memory": None}},
+            environ={"APP_DEBUG": "no"},
+            overrides={"workers": None, "debug": None},
+        )
+        snapshot = settings.snapshot
+        assert snapshot.workers == 4
+        assert snapshot.debug is False
+        assert snapshot.memory_limit == 512 * MB
+
+    @pytest.mark.parametrize("limits", ["1 GB", ["1 GB"], 1])
+    def test_config_path_errors(self, limits):
+        with pytest.raises(SettingsError) as e:
+            ExtendedSettings(
+                config={"limits": limits, "workers": "many"},
+                environ={"APP_TOKEN": "secret"},
+            )
+        assert sorted(e.value.errors) == ["memory_limit", "workers"]
+
+    def test_os_environ(self, monkeypatch):
+        monkeypatch.setitem(os.environ, "APP_WORKERS", "3")
+        assert AppSettings().snapshot.workers == 3
+
+    def test_errors(self):
+        with pytest.raises(SettingsError) as e:
+            ExtendedSettings(environ={"APP_WORKERS": "many", "APP_BANDWIDTH": "fast"})
+        assert sorted(e.value.errors) == ["bandwidth", "token", "workers"]
+
+    def test_unknown_override(self):
+        with pytest.raises(SettingsError):
+            AppSettings(environ={}, overrides={"unknown": 1})
+
+    def test_reserved_name(self):
+        with pytest.raises(TypeError):
+
+            # noinspection PyUnusedLocal
+            class Invalid(Settings):
+                refresh = Setting()
+
+    def test_inheritance(self):
+        snapshot = ExtendedSettings(environ={"APP_TOKEN": "secret"}).snapshot
+        assert snapshot.token == "secret"
+        assert snapshot.workers == 4
+        assert type(snapshot).__slots__[-1] == "token"
+        assert "token" not in AppSettings.SETTINGS
+
+    def test_immutable(self):
+        snapshot = AppSettings(environ={}).snapshot
+        with pytest.raises(AttributeError):
+            snapshot.workers = 1
+        with pytest.raises(AttributeError):
+            del snapshot.workers
+        with pytest.raises(AttributeError):
+            snapshot.other = 1
+        assert snapshot.as_dict()["workers"] == 4
+
+    def test_refresh(self):
+        environ = {"APP_WORKERS": "2"}
+        settings = AppSettings(environ=environ)
+        first = settings.snapshot
+
+        environ["APP_WORKERS"] = "6"
+        assert settings.snapshot.workers == 2
+        assert settings.refresh().workers == 6
+        assert settings.snapshot is not first
+        assert first.workers == 2
+
+        environ["APP_WORKERS"] = "invalid"
+        current = settings.snapshot
+        with pytest.raises(SettingsError):
+            settings.refresh()
+        assert settings.snapshot is current
+
+    def test_config_callable(self):
+        config = {"workers": 1}
+        settings = AppSettings(config=lambda: dict(config), environ={})
+        config["workers"] = 5
+        assert settings.snapshot.workers == 1
+        assert settings.refresh().workers == 5
+
+    def test_environ_captured(self):
+        environ = {}
+        settings = AppSettings(environ=environ)
+        environ["APP_WORKERS"] = "9"
+        assert settings.workers == 4
+
+    @pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="requires SIGUSR1")
+    def test_signal(self):
+        environ = {"APP_WORKERS": "2"}
+        settings = AppSettings(environ=environ)
+        previous = settings.install_signal_handler(signal.SIGUSR1)
+        try:
+            environ["APP_WORKERS"] = "7"
+            signal.raise_signal(signal.SIGUSR1)
+            assert settings.workers == 7
+
+            environ["APP_WORKERS"] = "invalid"
+            signal.raise_signal(signal.SIGUSR1)
+            assert settings.workers == 7
+        finally:
+            signal.signal(signal.SIGUSR1, previous)
@@ -0,0 +1,154 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from operator import neg
+from threading import Event
+from time import sleep
+
+import pytest
+
+from cafeteria.streaming import batched, chunked, pmap, windowed
+
+
+class TestBatched:
+    def test_batched(self):
+        assert list(batched(range(5), 2)) == [(0, 1), (2, 3), (4,)]
+        assert list(batched([], 2)) == []
+
+    def test_lazy(self):
+        assert next(batched(count(), 3)) == (0, 1, 2)
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            list(batched([1], 0))
+
+
+class TestChunked:
+    def test_sequences(self):
+        assert list(chunked(b"abcde", 2)) == [b"ab", b"cd", b"e"]
+        assert list(chunked([1, 2, 3], 2)) == [[1, 2], [3]]
+
+    def test_memoryview(self):
+        data = bytearray(b"abcd")
+        chunks = list(chunked(memoryview(data), 2))
+        data[0:1] = b"z"
+        assert [bytes(chunk) for chunk in chunks] == [b"zb", b"cd"]
+
+    def test_iterables(self):
+        assert list(chunked(iter(range(3)), 2)) == [[0, 1], [2]]
+        assert next(chunked(count(), 2)) == [0, 1]
+
+    def test_not_sliceable(self):
+        assert list(chunked(deque(range(3)), 2)) == [[0, 1], [2]]
+        assert list(chunked({"a": 1, "b": 2, "c": 3}, 2)) == [["a", "b"], ["c"]]
+
+
+class TestWindowed:
+    def test_windowed(self):
+        assert list(windowed(range(4), 2)) == [(0, 1), (1, 2), (2, 3)]
+        assert list(windowed(range(2), 3)) == []
+        assert list(windowed(range(3), 3)) == [(0, 1, 2)]
+
+    def test_step(self):
+        assert list(windowed(range(7), 3, step=2)) == [(0, 1, 2), (2, 3, 4), (4, 5, 6)]
+        assert list(windowed(range(8), 2, step=3)) == [(0, 1), (3, 4), (6, 7)]
+
+    def test_lazy(self):
+        assert next(windowed(count(), 2)) == (0, 1)
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            list(windowed([1], 1, step=0))
+
+
+def slow_identity(x):
+    # later items complete first
+    sleep(0.001 * (10 - x % 10))
+    return x
+
+
+class TestPmap:
+    @pytest.mark.parametrize("chunksize", [1, 3])
+    def test_ordered(self, chunksize):
+        assert list(
+            pmap(slow_identity, range(50), workers=4, chunksize=chunksize)
+        ) == list(range(50))
+
+    def test_unordered(self):
+        results = list(pmap(slow_identity, range(50), workers=4, ordered=False))
+        assert sorted(results) == list(range(50))
+
+    def test_process(self):
+        assert list(pmap(neg, range(200), executor="process", workers=2)) == [
+            -x for x in range(200)
+        ]
+
+    def test_executor_not_shut_down(self):
+        with ThreadPoolExecutor(2) as executor:
+            assert list(pmap(neg, range(5), executor=executor)) == [0, -1, -2, -3, -4]
+            assert executor.submit(neg, 1).result() == -1
+
+    def test_backpressure(self):
+        consumed = []
+
+        def produce():
+            for x in count():
+                consumed.append(x)
+                yield x
+
+        results = pmap(neg, produce(), workers=2, max_in_flight=3, chunksize=2)
+        assert next(results) == 0
+        # at most max_in_flight tasks of chunksize items are pulled ahead
+        assert len(consumed) <= 3 * 2 + 2
+        results.close()
+
+    @pytest.mark.parametrize("ordered", [True, False])
+    def test_error(self, ordered):
+        def fail(x):
+            if x == 5:
+                raise ValueError(x)
+            return x
+
+        with pytest.raises(ValueError):
+            list(pmap(fail, range(20), workers=2, ordered=ordered))
+
+    def test_error_before_earlier_results(self):
+        release = Event()
+
+        def func(x):
+            if x == 0:
+                release.wait(5)
+                return x
+            raise ValueError(x)
+
+        try:
+            with pytest.raises(ValueError):
+                next(pmap(func, range(2), workers=2))
+        finally:
+            release.set()
+
+    def test_cancel_on_close(self):
+        started = []
+        gate = Event()
+
+        def func(x):
+            started.append(x)
+            if x:
+                gate.wait(5)
+            return x
+
+        with ThreadPoolExecutor(1) as executor:
+            results = pmap(func, range(100), executor=executor, max_in_flight=10)
+            assert next(results) == 0
+            # the worker is blocked on task 1, tasks 2 to 9 are queued
+            results.close()
+            gate.set()
+        assert started in ([0], [0, 1])
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            pmap(neg, [], executor="fiber")
+        with pytest.raises(ValueError):
+            pmap(neg, [], chunksize=0)
+        with pytest.raises(ValueError):
+            pmap(neg, [], max_in_flight=-1)
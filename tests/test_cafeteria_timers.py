@@ -0,0 +1,172 @@
+import asyncio
+import gc
+import random
+import weakref
+
+import pytest
+
+from cafeteria.timers import (
+    AsyncioTimingWheel,
+    EventLoopTimingWheel,
+    TimingWheel,
+    async_sleep,
+    get_timing_wheel,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class TestTimingWheel:
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            TimingWheel(wheel_size=100)
+        with pytest.raises(ValueError):
+            TimingWheel(tick=0)
+
+    def test_fire(self, clock):
+        wheel = TimingWheel(tick=0.1, clock=clock)
+        fired = []
+        wheel.call_later(0.25, fired.append, "a")
+        wheel.call_at(0.05, fired.append, "b")
+        assert len(wheel) == 2
+        clock.now = 0.2
+        assert wheel.advance() == 1
+        assert fired == ["b"]
+        clock.now = 0.3
+        wheel.advance()
+        assert fired == ["b", "a"]
+        assert len(wheel) == 0
+
+    def test_cancel(self, clock):
+        wheel = TimingWheel(tick=1, clock=clock)
+        fired = []
+        timer = wheel.call_later(5, fired.append, 1)
+        assert timer.active
+        assert timer.cancel()
+        assert not timer.cancel()
+        assert not timer.active
+        clock.now = 10
+        wheel.advance()
+        assert fired == []
+        assert len(wheel) == 0
+
+    def test_cancel_from_callback(self, clock):
+        wheel = TimingWheel(tick=1, clock=clock)
+        fired = []
+        second = None
+
+        def first():
+            fired.append(1)
+            second.cancel()
+
+        wheel.call_later(1, first)
+        second = wheel.call_later(1, fired.append, 2)
+        clock.now = 1
+        wheel.advance()
+        assert fired == [1]
+
+    def test_callback_error(self, clock, caplog):
+        wheel = TimingWheel(tick=1, clock=clock)
+        fired = []
+        wheel.call_later(1, lambda: 1 / 0)
+        wheel.call_later(1, fired.append, 1)
+        clock.now = 1
+        wheel.advance()
+        assert fired == [1]
+        assert "Error calling timer callback" in caplog.text
+
+    @pytest.mark.parametrize("wheel_size,levels", [(2, 1), (4, 2), (8, 3), (256, 4)])
+    def test_against_reference(self, clock, wheel_size, levels):
+        rnd = random.Random(wheel_size * levels)
+        wheel = TimingWheel(tick=1, wheel_size=wheel_size, levels=levels, clock=clock)
+        fired, timers, due = [], [], []
+
+        def callback(index):
+            fired.append((index, clock.now))
+
+        for _ in range(2000):
+            if rnd.random() < 0.5:
+                delay = rnd.choice((rnd.uniform(0, 5), rnd.uniform(0, 5000)))
+                due.append(clock.now + delay)
+                timers.append(wheel.call_later(delay, callback, len(timers)))
+            elif timers and rnd.random() < 0.4:
+                rnd.choice(timers).cancel()
+            clock.now += rnd.choice((0, 0.5, 1))
+            wheel.advance()
+        while len(wheel):
+            clock.now += 1
+            wheel.advance()
+
+        assert len(fired) == len({index for index, _ in fired})
+        for index, fired_at in fired:
+            # never early, and at most a tick late plus the advance interval
+            assert due[index] <= fired_at <= due[index] + 2
+        assert not any(timer.active for timer in timers)
+
+
+class TestAsyncioTimingWheel:
+    def test_call_later(self):
+        async def main():
+            wheel = AsyncioTimingWheel(tick=0.005)
+            done = asyncio.get_running_loop().create_future()
+            start = wheel.loop.time()
+            wheel.call_later(0.02, done.set_result, True)
+            cancelled = wheel.call_later(0.01, done.set_result, False)
+            cancelled.cancel()
+            assert await asyncio.wait_for(done, 1)
+            assert wheel.loop.time() - start >= 0.02
+
+        asyncio.run(main())
+
+    def test_sleep(self):
+        async def main():
+            wheel = AsyncioTimingWheel(tick=0.005)
+            assert await wheel.sleep(0.01, "result") == "result"
+            task = asyncio.ensure_future(wheel.sleep(10))
+            await asyncio.sleep(0)
+            assert len(wheel) == 1
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert len(wheel) == 0
+
+        asyncio.run(main())
+
+    def test_async_sleep(self):
+        async def main():
+            results = await asyncio.gather(*(async_sleep(0.02, i) for i in range(100)))
+            assert results == list(range(100))
+            assert get_timing_wheel() is get_timing_wheel()
+            assert len(get_timing_wheel()) == 0
+
+        asyncio.run(main())
+
+    def test_default_wheel_released_with_loop(self):
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(async_sleep(0.01))
+        loop_ref = weakref.ref(loop)
+        wheel_ref = weakref.ref(get_timing_wheel(loop))
+        loop.close()
+        del loop
+        gc.collect()
+        assert loop_ref() is None
+        assert wheel_ref() is None
+
+    def test_abstract_event_loop_wheel(self):
+        class Incomplete(EventLoopTimingWheel):
+            def _call_later(self, delay, callback):
+                pass
+
+        with pytest.raises(TypeError):
+            Incomplete()